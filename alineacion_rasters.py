@@ -0,0 +1,166 @@
+import os
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from conversion_nc import año_de_dataset, elegir_variable, _nombre_dim
+
+# Alineación de productos L3 (clorofila 4 km, SST 9 km, ...) sobre una rejilla común.
+# Todo ocurre en espacio de arreglos: cada archivo se lleva a la rejilla destino
+# por promedio de bloques (si la rejilla destino es más gruesa) o por vecino más
+# cercano (si es más fina o no es múltiplo entero), y se acumula la media anual.
+# El resultado es un único cubo (year, lat, lon) con una variable por producto.
+
+
+class Rejilla:
+    """Rejilla regular lat/lon definida por su primer centro de celda y su paso."""
+
+    def __init__(self, lat0, dlat, nlat, lon0, dlon, nlon):
+        self.lat0, self.dlat, self.nlat = float(lat0), float(dlat), int(nlat)
+        self.lon0, self.dlon, self.nlon = float(lon0), float(dlon), int(nlon)
+
+    @classmethod
+    def desde_coordenadas(cls, lats, lons):
+        lats, lons = np.asarray(lats, dtype="float64"), np.asarray(lons, dtype="float64")
+        return cls(lats[0], (lats[-1] - lats[0]) / (len(lats) - 1), len(lats),
+                   lons[0], (lons[-1] - lons[0]) / (len(lons) - 1), len(lons))
+
+    @classmethod
+    def global_(cls, resolucion):
+        """Rejilla global con celdas de ``resolucion`` grados (norte → sur, como los L3 de la NASA)."""
+        nlat, nlon = int(round(180 / resolucion)), int(round(360 / resolucion))
+        return cls(90 - resolucion / 2, -resolucion, nlat, -180 + resolucion / 2, resolucion, nlon)
+
+    @property
+    def lats(self):
+        return self.lat0 + self.dlat * np.arange(self.nlat)
+
+    @property
+    def lons(self):
+        return self.lon0 + self.dlon * np.arange(self.nlon)
+
+
+def _media_por_bloques(valores, factor_lat, factor_lon):
+    """Media de bloques ``factor_lat × factor_lon`` ignorando NaN (recorta el borde sobrante)."""
+    nlat = valores.shape[0] // factor_lat * factor_lat
+    nlon = valores.shape[1] // factor_lon * factor_lon
+    bloques = valores[:nlat, :nlon].reshape(nlat // factor_lat, factor_lat, nlon // factor_lon, factor_lon)
+    validos = np.isfinite(bloques)
+    suma = np.where(validos, bloques, 0).sum(axis=(1, 3), dtype="float64")
+    n = validos.sum(axis=(1, 3))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, suma / n, np.nan)
+
+
+def _indices_cercanos(origen, destino):
+    """Índice en ``origen`` (coordenada regular) del centro más cercano a cada valor de ``destino``."""
+    o0 = origen[0]
+    d = (origen[-1] - origen[0]) / (len(origen) - 1)
+    idx = np.rint((destino - o0) / d).astype("int64")
+    fuera = (idx < 0) | (idx >= len(origen))
+    return np.clip(idx, 0, len(origen) - 1), fuera
+
+
+def regrillar(da, rejilla, metodo="auto"):
+    """Lleva un DataArray 2D (lat, lon) a ``rejilla`` y devuelve un arreglo float32.
+
+    ``metodo`` puede ser ``"bloques"``, ``"cercano"`` o ``"auto"`` (bloques cuando la
+    rejilla destino es un múltiplo entero más gruesa que la de origen).
+    """
+    dim_lat = _nombre_dim(da, ("lat", "latitude"))
+    dim_lon = _nombre_dim(da, ("lon", "longitude"))
+    da = da.squeeze(drop=True).transpose(dim_lat, dim_lon)
+    origen = Rejilla.desde_coordenadas(da[dim_lat].values, da[dim_lon].values)
+    valores = da.values.astype("float32")
+    fill = da.attrs.get("_FillValue", da.encoding.get("_FillValue"))
+    if fill is not None:
+        valores[valores == fill] = np.nan
+
+    factor_lat = rejilla.dlat / origen.dlat
+    factor_lon = rejilla.dlon / origen.dlon
+    enteros = (factor_lat >= 1 and factor_lon >= 1
+               and abs(factor_lat - round(factor_lat)) < 1e-6 and abs(factor_lon - round(factor_lon)) < 1e-6)
+    if metodo == "auto":
+        metodo = "bloques" if enteros and (factor_lat > 1 or factor_lon > 1) else "cercano"
+
+    if metodo == "bloques":
+        if not enteros:
+            raise ValueError("El promedio por bloques requiere un factor entero entre rejillas.")
+        fl, fo = int(round(factor_lat)), int(round(factor_lon))
+        # Desplazamiento (en celdas de origen) del primer bloque que cae en la rejilla destino
+        i0 = int(round((rejilla.lat0 - rejilla.dlat / 2 - (origen.lat0 - origen.dlat / 2)) / origen.dlat))
+        j0 = int(round((rejilla.lon0 - rejilla.dlon / 2 - (origen.lon0 - origen.dlon / 2)) / origen.dlon))
+        # Si la rejilla destino empieza antes que la de origen, se saltan sus primeras celdas
+        di, dj = -(i0 // fl) if i0 < 0 else 0, -(j0 // fo) if j0 < 0 else 0
+        gruesa = _media_por_bloques(valores[i0 + di * fl:, j0 + dj * fo:], fl, fo)
+        salida = np.full((rejilla.nlat, rejilla.nlon), np.nan, dtype="float32")
+        ni = min(gruesa.shape[0], rejilla.nlat - di)
+        nj = min(gruesa.shape[1], rejilla.nlon - dj)
+        salida[di:di + ni, dj:dj + nj] = gruesa[:ni, :nj]
+        return salida
+
+    ii, fuera_lat = _indices_cercanos(origen.lats, rejilla.lats)
+    jj, fuera_lon = _indices_cercanos(origen.lons, rejilla.lons)
+    salida = valores[np.ix_(ii, jj)]
+    salida[fuera_lat, :] = np.nan
+    salida[:, fuera_lon] = np.nan
+    return salida
+
+
+def _acumular_carpeta(carpeta, variable_objetivo, rejilla, metodo):
+    """Suma y cuenta, por año, los valores regrillados de todos los .nc de ``carpeta``."""
+    sumas = defaultdict(lambda: np.zeros((rejilla.nlat, rejilla.nlon), dtype="float64"))
+    cuentas = defaultdict(lambda: np.zeros((rejilla.nlat, rejilla.nlon), dtype="int32"))
+    for archivo in sorted(os.listdir(carpeta)):
+        if not archivo.endswith(".nc"):
+            continue
+        with xr.open_dataset(os.path.join(carpeta, archivo)) as ds:
+            año = año_de_dataset(ds, archivo)
+            valores = regrillar(ds[elegir_variable(ds, variable_objetivo)], rejilla, metodo)
+        validos = np.isfinite(valores)
+        sumas[año][validos] += valores[validos]
+        cuentas[año] += validos
+        print(f"  {archivo} ({año}) → {int(validos.sum())} celdas válidas en la rejilla común")
+    return sumas, cuentas
+
+
+def construir_cubo(productos, rejilla, metodo="auto"):
+    """Construye el cubo ambiental alineado (year, lat, lon).
+
+    ``productos`` es un diccionario ``{nombre_salida: (carpeta, variable_objetivo)}``,
+    por ejemplo ``{"Cloro_Media": ("clorofila/", "chlor_a"), "Temp_Media": ("sst/", "sst")}``.
+    Cada variable del cubo es la media anual de todos los archivos del año en esa carpeta.
+    """
+    acumulados = {}
+    for nombre, (carpeta, variable_objetivo) in productos.items():
+        print(f"\nAlineando {nombre} desde {carpeta}")
+        acumulados[nombre] = _acumular_carpeta(carpeta, variable_objetivo, rejilla, metodo)
+
+    años = sorted({a for sumas, _ in acumulados.values() for a in sumas if a is not None})
+    variables = {}
+    for nombre, (sumas, cuentas) in acumulados.items():
+        cubo = np.full((len(años), rejilla.nlat, rejilla.nlon), np.nan, dtype="float32")
+        for k, año in enumerate(años):
+            if año in sumas:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    cubo[k] = np.where(cuentas[año] > 0, sumas[año] / cuentas[año], np.nan)
+        variables[nombre] = (("year", "lat", "lon"), cubo)
+
+    return xr.Dataset(variables, coords={"year": np.asarray(años, dtype="int16"),
+                                         "lat": rejilla.lats, "lon": rejilla.lons})
+
+
+def cubo_a_tabla(cubo, año):
+    """Celdas del año con al menos una variable válida, como DataFrame (lat, lon, year, variables...)."""
+    capa = cubo.sel(year=año)
+    nombres = list(capa.data_vars)
+    valores = np.stack([capa[n].values for n in nombres])
+    ii, jj = np.nonzero(np.isfinite(valores).any(axis=0))
+    return pd.DataFrame({
+        "lat": capa["lat"].values[ii],
+        "lon": capa["lon"].values[jj],
+        "year": año,
+        **{n: valores[k, ii, jj] for k, n in enumerate(nombres)},
+    })
@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Almacén columnar de datos ambientales (reemplaza datos_modelo.csv).
+# Estructura en disco (particionado estilo Hive):
+#   datos_modelo/year=2015/tesela_lat=-40/tesela_lon=140/part-0.parquet
+# Las teselas son de TAM_TESELA grados, así un lector que solo necesita una
+# región y unos años abre únicamente los archivos que la intersectan.
+
+TAM_TESELA = 10  # grados por lado de cada tesela
+COLUMNAS_VALOR = ["Temp_Media", "Cloro_Media"]
+PARTICIONES = ["year", "tesela_lat", "tesela_lon"]
+
+
+def _teselas(valores, tam_tesela):
+    return (np.floor(np.asarray(valores, dtype="float64") / tam_tesela) * tam_tesela).astype("int16")
+
+
+def escribir_almacen(df, ruta, tam_tesela=TAM_TESELA):
+    """Escribe ``df`` (lat, lon, year, Temp_Media, Cloro_Media) particionado por año y tesela.
+
+    Los valores se guardan como float32. Las particiones que ya existían para los
+    mismos (año, tesela) se reemplazan; el resto del almacén se conserva.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as pds
+
+    # Sin año no hay partición: esas filas se descartan (los conversores pueden dejar year nulo)
+    sin_año = pd.to_numeric(df["year"], errors="coerce").isna()
+    if sin_año.any():
+        print(f"⚠️ {int(sin_año.sum())} de {len(df)} filas sin año descartadas al escribir el almacén.")
+        df = df[~sin_año.to_numpy()]
+
+    tabla = pd.DataFrame({
+        "lat": df["lat"].astype("float32"),
+        "lon": df["lon"].astype("float32"),
+        **{col: df[col].astype("float32") for col in COLUMNAS_VALOR if col in df},
+        "year": pd.to_numeric(df["year"]).astype("int16"),
+        "tesela_lat": _teselas(df["lat"], tam_tesela),
+        "tesela_lon": _teselas(df["lon"], tam_tesela),
+    })
+    os.makedirs(ruta, exist_ok=True)
+    pds.write_dataset(
+        pa.Table.from_pandas(tabla, preserve_index=False),
+        ruta,
+        format="parquet",
+        partitioning=PARTICIONES,
+        partitioning_flavor="hive",
+        existing_data_behavior="delete_matching",
+    )
+    return len(tabla)
+
+
+def firma_almacen(ruta):
+    """Nombre, tamaño y mtime de cada archivo del almacén (``None`` si no existe).
+
+    Cambia cuando el almacén se reconstruye, sin leer sus datos.
+    """
+    if not os.path.isdir(ruta):
+        return None
+    listado = []
+    for raiz, _, archivos in sorted(os.walk(ruta)):
+        for archivo in sorted(archivos):
+            st = os.stat(os.path.join(raiz, archivo))
+            listado.append((os.path.relpath(os.path.join(raiz, archivo), ruta), st.st_size, st.st_mtime_ns))
+    return listado
+
+
+def bbox_de_puntos(lat, lon, margen=0.5):
+    """Caja (lat_min, lat_max, lon_min, lon_max) que cubre los puntos con un margen en grados."""
+    return (float(np.nanmin(lat)) - margen, float(np.nanmax(lat)) + margen,
+            float(np.nanmin(lon)) - margen, float(np.nanmax(lon)) + margen)
+
+
+def cargar_almacen(ruta, años=None, bbox=None, columnas=None, tam_tesela=TAM_TESELA):
+    """Lee del almacén solo las particiones de ``años`` que intersectan ``bbox``.
+
+    Los filtros sobre ``year`` y las teselas descartan directorios completos sin
+    abrirlos; el filtro fino sobre lat/lon usa las estadísticas de cada grupo de filas.
+    Lanza ``FileNotFoundError`` si el almacén no existe.
+    """
+    import pyarrow.dataset as pds
+
+    if not os.path.isdir(ruta):
+        raise FileNotFoundError(ruta)
+    dataset = pds.dataset(ruta, format="parquet", partitioning="hive")
+
+    filtro = None
+
+    def _y(expr):
+        return expr if filtro is None else filtro & expr
+
+    if años is not None:
+        filtro = _y(pds.field("year").isin([int(a) for a in años]))
+    if bbox is not None:
+        lat_min, lat_max, lon_min, lon_max = bbox
+        filtro = _y((pds.field("tesela_lat") >= int(_teselas(lat_min, tam_tesela)))
+                    & (pds.field("tesela_lat") <= int(_teselas(lat_max, tam_tesela)))
+                    & (pds.field("tesela_lon") >= int(_teselas(lon_min, tam_tesela)))
+                    & (pds.field("tesela_lon") <= int(_teselas(lon_max, tam_tesela))))
+        filtro = _y((pds.field("lat") >= lat_min) & (pds.field("lat") <= lat_max)
+                    & (pds.field("lon") >= lon_min) & (pds.field("lon") <= lon_max))
+
+    if columnas is None:
+        columnas = ["lat", "lon", "year"] + [c for c in COLUMNAS_VALOR if c in dataset.schema.names]
+    return dataset.to_table(columns=columnas, filter=filtro).to_pandas()
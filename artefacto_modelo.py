@@ -0,0 +1,149 @@
+import json
+import struct
+
+import numpy as np
+
+# Artefacto compacto del modelo de trayectoria (sin sklearn ni pickle).
+# El pipeline ajustado (SimpleImputer -> StandardScaler -> MultiOutputRegressor
+# de modelos lineales) se aplana en un archivo binario versionado:
+#
+#   b"TIBM" | versión (uint16) | largo de cabecera (uint32) | cabecera JSON | relleno
+#   | medias del imputador (n_features)
+#   | medias del escalador (n_features) | escalas del escalador (n_features)
+#   | coeficientes (n_targets × n_features) | interceptos (n_targets)
+#
+# Los arreglos son float64 little-endian alineados a 8 bytes, así que la inferencia
+# puede mapear el archivo en memoria con NumPy y arrancar en milisegundos.
+
+MAGIA = b"TIBM"
+VERSION = 1
+ARTIFACT_FILENAME = 'modelo_trayectoria_lineal.tibm'
+
+
+def _pasos_pipeline(pipeline):
+    """Extrae imputador, escalador, columnas y estimadores de un pipeline de modelo.py.
+
+    También acepta un pipeline plano imputer -> scaler -> regressor sin ColumnTransformer
+    (como los de evaluacion_modelos.py); las columnas salen entonces de ``feature_names_in_``.
+    """
+    if "preprocessor" in pipeline.named_steps:
+        nombre, transformador, columnas = pipeline.named_steps["preprocessor"].transformers_[0]
+    else:
+        transformador, columnas = pipeline, pipeline.feature_names_in_
+    imputador = transformador.named_steps["imputer"]
+    escalador = transformador.named_steps["scaler"]
+    regresor = pipeline.named_steps["regressor"]
+    estimadores = getattr(regresor, "estimators_", [regresor])
+    return list(columnas), imputador, escalador, estimadores
+
+
+def exportar(pipeline, ruta=ARTIFACT_FILENAME, targets=("lon_futura", "lat_futura")):
+    """Escribe el artefacto compacto a partir del pipeline sklearn ajustado.
+
+    ``SimpleImputer`` descarta las columnas sin ningún dato (media NaN) antes del
+    escalador, así que esas columnas no influyen en la predicción y el artefacto
+    las omite: sus ``features`` son solo las que llegan al regresor.
+    """
+    columnas, imputador, escalador, estimadores = _pasos_pipeline(pipeline)
+    medias_imputador = np.asarray(imputador.statistics_, dtype="float64")
+    if not getattr(imputador, "keep_empty_features", False):
+        conservadas = ~np.isnan(medias_imputador)
+        columnas = [c for c, ok in zip(columnas, conservadas) if ok]
+        medias_imputador = medias_imputador[conservadas]
+    coef = np.vstack([np.atleast_2d(e.coef_) for e in estimadores]).astype("<f8")
+    intercepto = np.concatenate([np.atleast_1d(e.intercept_) for e in estimadores]).astype("<f8")
+    escribir(ruta, columnas, list(targets), medias_imputador, escalador.mean_, escalador.scale_, coef, intercepto)
+    return ruta
+
+
+def escribir(ruta, features, targets, medias_imputador, medias, escalas, coef, intercepto):
+    """Escribe un artefacto con los parámetros dados (también lo usa el entrenamiento incremental)."""
+    nf, nt = len(features), len(targets)
+    formas = {"medias del imputador": (np.shape(medias_imputador), (nf,)), "medias": (np.shape(medias), (nf,)),
+              "escalas": (np.shape(escalas), (nf,)), "coeficientes": (np.shape(coef), (nt, nf)),
+              "interceptos": (np.shape(intercepto), (nt,))}
+    for nombre, (forma, esperada) in formas.items():
+        if tuple(forma) != esperada:
+            raise ValueError(f"Forma de {nombre} {tuple(forma)} no coincide con {esperada} "
+                             f"({nf} features, {nt} targets).")
+    cabecera = json.dumps({"features": list(features), "targets": list(targets)}).encode("utf-8")
+    prefijo = MAGIA + struct.pack("<HI", VERSION, len(cabecera)) + cabecera
+    relleno = b"\0" * (-len(prefijo) % 8)
+    with open(ruta, "wb") as f:
+        f.write(prefijo + relleno)
+        for arreglo in (medias_imputador, medias, escalas, coef, intercepto):
+            f.write(np.ascontiguousarray(arreglo, dtype="<f8").tobytes())
+
+
+class ModeloCompacto:
+    """Inferencia solo con NumPy sobre un artefacto mapeado en memoria."""
+
+    def __init__(self, ruta=ARTIFACT_FILENAME):
+        with open(ruta, "rb") as f:
+            magia = f.read(4)
+            if magia != MAGIA:
+                raise ValueError(f"{ruta} no es un artefacto de modelo ({magia!r}).")
+            version, largo = struct.unpack("<HI", f.read(6))
+            if version != VERSION:
+                raise ValueError(f"Versión de artefacto no soportada: {version}")
+            cabecera = json.loads(f.read(largo))
+        self.features = cabecera["features"]
+        self.targets = cabecera["targets"]
+        nf, nt = len(self.features), len(self.targets)
+        inicio = 10 + largo
+        inicio += -inicio % 8
+        datos = np.memmap(ruta, dtype="<f8", mode="r", offset=inicio, shape=(3 * nf + nt * nf + nt,))
+        self.medias_imputador = datos[:nf]
+        self.medias = datos[nf:2 * nf]
+        self.escalas = datos[2 * nf:3 * nf]
+        self.coef = datos[3 * nf:3 * nf + nt * nf].reshape(nt, nf)
+        self.intercepto = datos[3 * nf + nt * nf:]
+
+    def predict(self, X):
+        """Predice a partir de un arreglo (n, n_features) o de un DataFrame con ``features``."""
+        if hasattr(X, "columns"):
+            X = X[self.features].to_numpy(dtype="float64")
+        X = np.array(X, dtype="float64", ndmin=2)
+        faltantes = np.isnan(X)
+        if faltantes.any():
+            X[faltantes] = np.broadcast_to(self.medias_imputador, X.shape)[faltantes]
+        return ((X - self.medias) / self.escalas) @ self.coef.T + self.intercepto
+
+
+def cargar_modelo(ruta):
+    """Carga un artefacto ``.tibm`` sin sklearn o, para cualquier otra extensión, el pipeline joblib."""
+    if ruta.endswith(".tibm"):
+        return ModeloCompacto(ruta)
+    import joblib
+
+    return joblib.load(ruta)
+
+
+def features_del_modelo(modelo):
+    """Columnas de entrada, en orden: ``features`` del artefacto o ``feature_names_in_`` del pipeline."""
+    if isinstance(modelo, ModeloCompacto):
+        return list(modelo.features)
+    nombres = getattr(modelo, "feature_names_in_", None)
+    if nombres is None:
+        raise ValueError("El modelo no declara sus columnas de entrada (entrénalo con un DataFrame).")
+    return [str(n) for n in nombres]
+
+
+def predecir_arreglo(modelo, X, features=None):
+    """Una única llamada a ``predict`` para todas las filas de ``X`` (columnas en el orden de ``features``).
+
+    ``features`` por defecto son las del modelo (``features_del_modelo``).
+    """
+    if isinstance(modelo, ModeloCompacto):
+        return modelo.predict(X)
+    import pandas as pd
+
+    return np.asarray(modelo.predict(pd.DataFrame(X, columns=features or features_del_modelo(modelo))))
+
+
+def verificar(pipeline, modelo, X, tolerancia=1e-9):
+    """Comprueba que el artefacto reproduce las predicciones del pipeline sklearn en ``X``."""
+    esperado = np.asarray(pipeline.predict(X))
+    obtenido = modelo.predict(X)
+    diferencia = float(np.max(np.abs(esperado - obtenido))) if len(esperado) else 0.0
+    return diferencia <= tolerancia * max(1.0, float(np.max(np.abs(esperado)))), diferencia
@@ -0,0 +1,200 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import datos_sinteticos
+from instrumentacion import rss_maximo_mb
+
+# Suite de rendimiento de todas las etapas del pipeline sobre datos sintéticos.
+# Cada etapa se cronometra (mejor de ``repeticiones``) y, en una ejecución aparte
+# con tracemalloc, se mide su pico de memoria asignada; también se anota el máximo
+# de RSS del proceso al terminarla. Los resultados se guardan en JSON para poder
+# compararlos entre ejecuciones:
+#
+#   python benchmarks.py --escala mediana --salida benchmark.json
+#   python benchmarks.py --escala mediana --salida nuevo.json --comparar benchmark.json
+
+FEATURES = ['lon', 'lat', 'Temp_Media', 'Cloro_Media']
+TARGETS = ['lon_futura', 'lat_futura']
+
+
+def medir(nombre, funcion, repeticiones=1, memoria=True):
+    """Ejecuta ``funcion`` y devuelve (resultado, métricas de la etapa).
+
+    ``funcion`` devuelve una tupla (resultado, dict de conteos) que se añade a las métricas.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado, conteos = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    metricas = {"etapa": nombre, "segundos": min(tiempos), "segundos_medio": float(np.mean(tiempos)),
+                "repeticiones": repeticiones, **conteos}
+    filas = conteos.get("filas_entrada", conteos.get("filas_salida"))
+    if filas is not None:
+        metricas["filas_por_s"] = filas / max(metricas["segundos"], 1e-9)
+    if memoria:
+        tracemalloc.start()
+        resultado, _ = funcion()
+        metricas["pico_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    metricas["rss_max_mb"] = rss_maximo_mb()
+    print(f"  {nombre:<28} {metricas['segundos']:8.3f} s"
+          + (f"  pico {metricas['pico_mb']:8.1f} MB" if memoria else ""))
+    return resultado, metricas
+
+
+def ejecutar(datos, trabajo, repeticiones=1, memoria=True):
+    """Corre todas las etapas sobre ``datos`` (salida de ``datos_sinteticos.generar``) en ``trabajo``."""
+    from alineacion_rasters import Rejilla, construir_cubo, cubo_a_tabla
+    from almacen_ambiental import bbox_de_puntos, cargar_almacen, escribir_almacen
+    from artefacto_modelo import ModeloCompacto, exportar
+    from conversion_nc import convertir_carpeta
+    from evaluacion_modelos import CANDIDATOS
+    from muestreo_puntos import construir_muestreador, unir_ambiente
+    from trayectorias import cargar_marcas, remuestrear_trayectorias
+
+    carpetas = datos["carpetas"]
+    almacen = os.path.join(trabajo, "datos_modelo")
+    etapas = []
+
+    def conversion():
+        salida = os.path.join(trabajo, "clorofila.parquet")
+        if os.path.exists(salida):
+            os.remove(salida)
+        filas = convertir_carpeta(carpetas["clorofila"], salida, "chlor_a", "chlorophyll")
+        return None, {"filas_salida": int(filas)}
+
+    def union_ambiental():
+        import xarray as xr
+
+        with xr.open_dataset(datos["temperatura"][0]) as ds:
+            resolucion = float(abs(ds["lat"].values[1] - ds["lat"].values[0]))
+        cubo = construir_cubo({"Cloro_Media": (carpetas["clorofila"], "chlor_a"),
+                               "Temp_Media": (carpetas["temperatura"], "sst")}, Rejilla.global_(resolucion))
+        shutil.rmtree(almacen, ignore_errors=True)
+        filas = sum(escribir_almacen(cubo_a_tabla(cubo, int(a)), almacen) for a in cubo["year"].values)
+        return None, {"celdas_rejilla": int(cubo.sizes["lat"] * cubo.sizes["lon"]), "filas_salida": int(filas)}
+
+    def interpolacion():
+        marcas = cargar_marcas(datos["marcas"])
+        df = remuestrear_trayectorias(marcas)
+        return df, {"filas_entrada": len(marcas), "filas_salida": len(df)}
+
+    def union_trayectorias(df_traj):
+        def etapa():
+            df_env = cargar_almacen(almacen, años=df_traj["year"].unique(),
+                                    bbox=bbox_de_puntos(df_traj["lat"], df_traj["lon"]))
+            df, tasa = unir_ambiente(df_traj, construir_muestreador(df_env, ["Temp_Media", "Cloro_Media"]))
+            return df, {"filas_ambiente": len(df_env), "filas_salida": len(df), "tasa_acierto": float(tasa)}
+        return etapa
+
+    def entrenamiento(df):
+        def etapa():
+            modelo = CANDIDATOS["lineal"]()
+            modelo.fit(df[FEATURES], df[TARGETS])
+            return modelo, {"filas_entrada": len(df)}
+        return etapa
+
+    def prediccion(modelo, X):
+        def etapa():
+            return modelo.predict(X), {"filas_entrada": len(X)}
+        return etapa
+
+    CANDIDATOS["lineal"]()  # importa sklearn fuera de la medición
+    print("\n--- Etapas ---")
+    for nombre, funcion in [("conversion_nc", conversion), ("union_ambiental", union_ambiental)]:
+        etapas.append(medir(nombre, funcion, repeticiones, memoria)[1])
+    df_traj, m = medir("interpolacion", interpolacion, repeticiones, memoria)
+    etapas.append(m)
+    df_ml, m = medir("union_trayectorias_ambiente", union_trayectorias(df_traj), repeticiones, memoria)
+    etapas.append(m)
+
+    df_ml["lon_futura"] = df_ml.groupby("id_tiburon")["lon"].shift(-1)
+    df_ml["lat_futura"] = df_ml.groupby("id_tiburon")["lat"].shift(-1)
+    df_ml = df_ml.dropna(subset=TARGETS)
+    modelo, m = medir("entrenamiento", entrenamiento(df_ml), repeticiones, memoria)
+    etapas.append(m)
+
+    artefacto = exportar(modelo, os.path.join(trabajo, "modelo.tibm"), TARGETS)
+    etapas.append(medir("prediccion_sklearn", prediccion(modelo, df_ml[FEATURES]), repeticiones, memoria)[1])
+    etapas.append(medir("prediccion_compacta", prediccion(ModeloCompacto(artefacto),
+                                                          df_ml[FEATURES].to_numpy(dtype="float64")),
+                        repeticiones, memoria)[1])
+    return etapas
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, anterior):
+    """Imprime el cociente de tiempos por etapa entre dos resultados (>1 = más lento)."""
+    previas = {e["etapa"]: e for e in anterior["etapas"]}
+    print(f"\n--- Comparación con {anterior['meta'].get('commit')} ({anterior['meta'].get('fecha')}) ---")
+    if anterior["meta"].get("escala") != actual["meta"].get("escala"):
+        print(f"ADVERTENCIA: Escalas distintas ({anterior['meta'].get('escala')} vs {actual['meta'].get('escala')}).")
+    for e in actual["etapas"]:
+        p = previas.get(e["etapa"])
+        if p is None:
+            continue
+        cociente = e["segundos"] / max(p["segundos"], 1e-9)
+        marca = "⚠️" if cociente > 1.2 else "✅"
+        print(f"  {marca} {e['etapa']:<28} {p['segundos']:8.3f} s → {e['segundos']:8.3f} s (×{cociente:.2f})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mide tiempo y memoria de cada etapa con datos sintéticos.")
+    parser.add_argument("--escala", choices=list(datos_sinteticos.ESCALAS), default="pequeña")
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--sin-memoria", action="store_true", help="No medir el pico con tracemalloc (más rápido)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--trabajo", help="Carpeta de trabajo (por defecto, una temporal que se borra al final)")
+    parser.add_argument("--salida", default="benchmark.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar")
+    args = parser.parse_args()
+
+    trabajo = args.trabajo or tempfile.mkdtemp(prefix="benchmark_tiburon_")
+    try:
+        print(f"Generando datos sintéticos (escala {args.escala}) en {trabajo}")
+        datos = datos_sinteticos.generar(os.path.join(trabajo, "entradas"), args.escala, args.semilla)
+        etapas = ejecutar(datos, trabajo, args.repeticiones, not args.sin_memoria)
+    finally:
+        if not args.trabajo:
+            shutil.rmtree(trabajo, ignore_errors=True)
+
+    resultado = {
+        "meta": {
+            "fecha": pd.Timestamp.now().isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "escala": args.escala,
+            "parametros": datos_sinteticos.ESCALAS[args.escala],
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "etapas": etapas,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
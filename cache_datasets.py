@@ -0,0 +1,147 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import xarray as xr
+
+# Caché LRU de datasets NetCDF para los visualizadores.
+# Los archivos se abren solo cuando se piden por primera vez; como mucho quedan
+# ``max_abiertos`` abiertos y el menos usado se cierra al desalojarlo, así que
+# una carpeta con años de archivos diarios no agota los descriptores.
+# Además se guardan en memoria las últimas ``max_capas`` capas 2D (archivo,
+# variable, índice de tiempo) ya leídas, y un hilo en segundo plano puede
+# precargar la siguiente capa o el siguiente archivo mientras se mira el actual.
+# Un dataset que se está leyendo (``usar``) no se cierra al desalojar: se cierra
+# cuando termina la lectura y vuelve a sobrar.
+
+
+def listar_nc(carpeta):
+    """Nombres de los .nc de ``carpeta`` en orden, sin abrir ninguno."""
+    return sorted(f for f in os.listdir(carpeta) if f.endswith(".nc"))
+
+
+class CacheDatasets:
+    """Datasets abiertos bajo demanda con desalojo LRU y precarga en segundo plano."""
+
+    def __init__(self, max_abiertos=8, max_capas=16, precargar=True):
+        self.max_abiertos = max_abiertos
+        self.max_capas = max_capas
+        self._abiertos = OrderedDict()
+        self._capas = OrderedDict()
+        self._lock = threading.RLock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="precarga") if precargar else None
+        self._en_curso = {}
+        self._en_uso = {}  # ruta -> lecturas en marcha
+
+    # --- Datasets ---
+
+    def obtener(self, ruta, reservar=False):
+        """Dataset de ``ruta``, abriéndolo si hace falta (perezoso: no lee los datos).
+
+        Con ``reservar`` queda marcado en uso hasta ``liberar(ruta)``; mejor usar ``usar``.
+        """
+        with self._lock:
+            ds = self._abiertos.get(ruta)
+            if ds is not None:
+                self._abiertos.move_to_end(ruta)
+                if reservar:
+                    self._en_uso[ruta] = self._en_uso.get(ruta, 0) + 1
+                return ds
+        ds = xr.open_dataset(ruta)
+        with self._lock:
+            if ruta in self._abiertos:  # otro hilo lo abrió mientras tanto
+                ds.close()
+                self._abiertos.move_to_end(ruta)
+                ds = self._abiertos[ruta]
+            else:
+                self._abiertos[ruta] = ds
+            if reservar:
+                self._en_uso[ruta] = self._en_uso.get(ruta, 0) + 1
+            self._desalojar()
+            return ds
+
+    def liberar(self, ruta):
+        with self._lock:
+            self._en_uso[ruta] -= 1
+            if not self._en_uso[ruta]:
+                del self._en_uso[ruta]
+            self._desalojar()
+
+    @contextmanager
+    def usar(self, ruta):
+        """Dataset de ``ruta`` que no se cierra mientras dure el bloque ``with``."""
+        ds = self.obtener(ruta, reservar=True)
+        try:
+            yield ds
+        finally:
+            self.liberar(ruta)
+
+    def _desalojar(self):
+        # Se cierran los menos usados que nadie está leyendo (puede quedar alguno de más un rato);
+        # el último pedido nunca, porque se acaba de devolver
+        for ruta in list(self._abiertos)[:-1]:
+            if len(self._abiertos) <= self.max_abiertos:
+                break
+            if ruta not in self._en_uso:
+                self._abiertos.pop(ruta).close()
+
+    # --- Capas 2D ---
+
+    def capa(self, ruta, variable, t_index=None):
+        """Capa de ``variable`` (en ``t_index`` si tiene tiempo) cargada en memoria."""
+        clave = (ruta, variable, t_index)
+        with self._lock:
+            da = self._capas.get(clave)
+            if da is not None:
+                self._capas.move_to_end(clave)
+                return da
+            futuro = self._en_curso.get(clave)
+        if futuro is not None:
+            return futuro.result()
+        return self._leer_capa(clave)
+
+    def _leer_capa(self, clave):
+        ruta, variable, t_index = clave
+        with self.usar(ruta) as ds:
+            da = ds[variable]
+            if t_index is not None and "time" in da.dims:
+                da = da.isel(time=t_index)
+            da = da.load()
+        with self._lock:
+            self._capas[clave] = da
+            self._capas.move_to_end(clave)
+            while len(self._capas) > self.max_capas:
+                self._capas.popitem(last=False)
+        return da
+
+    # --- Precarga ---
+
+    def precargar(self, ruta, variable=None, t_index=None):
+        """Abre ``ruta`` (y lee la capa indicada) en segundo plano; no bloquea."""
+        if self._pool is None or not os.path.exists(ruta):
+            return
+        clave = (ruta, variable, t_index)
+        with self._lock:
+            if clave in self._en_curso or clave in self._capas or (variable is None and ruta in self._abiertos):
+                return
+            tarea = self._leer_capa if variable is not None else (lambda c: self.obtener(c[0]))
+            futuro = self._pool.submit(tarea, clave)
+            self._en_curso[clave] = futuro
+        futuro.add_done_callback(lambda _: self._terminar(clave))
+
+    def _terminar(self, clave):
+        with self._lock:
+            self._en_curso.pop(clave, None)
+
+    def cerrar(self):
+        """Detiene la precarga y cierra todos los datasets abiertos."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            for ds in self._abiertos.values():
+                ds.close()
+            self._abiertos.clear()
+            self._capas.clear()
+            self._en_uso.clear()
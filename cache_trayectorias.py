@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+from filtro_argos import VELOCIDAD_MAX_MS
+from trayectorias import COLUMNAS_TRAYECTORIA, PASO_6H, cargar_marcas, remuestrear_trayectorias
+
+# Caché en disco de trayectorias remuestreadas, direccionada por contenido.
+# La clave combina el hash del CSV de origen con los parámetros de interpolación,
+# así que cambiar un archivo o un parámetro invalida solo las entradas afectadas.
+# Cuando la caché supera ``max_bytes`` se eliminan las entradas usadas hace más tiempo.
+
+CARPETA_CACHE = ".cache_trayectorias"
+MAX_BYTES = 512 * 2**20
+
+
+def hash_archivo(ruta, tam_bloque=2**20):
+    """SHA-256 del contenido de ``ruta``."""
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class CacheTrayectorias:
+    """Entradas Parquet por (hash de archivo, parámetros) con desalojo LRU por tamaño."""
+
+    def __init__(self, carpeta=CARPETA_CACHE, max_bytes=MAX_BYTES):
+        self.carpeta = carpeta
+        self.max_bytes = max_bytes
+        os.makedirs(carpeta, exist_ok=True)
+        self._ruta_indice = os.path.join(carpeta, "indice.json")
+        self.indice = {}
+        if os.path.exists(self._ruta_indice):
+            with open(self._ruta_indice, encoding="utf-8") as f:
+                self.indice = json.load(f)
+
+    @staticmethod
+    def clave(ruta, **parametros):
+        firma = json.dumps({"archivo": hash_archivo(ruta), **parametros}, sort_keys=True)
+        return hashlib.sha256(firma.encode()).hexdigest()[:32]
+
+    def _ruta(self, clave):
+        return os.path.join(self.carpeta, clave + ".parquet")
+
+    def obtener(self, clave):
+        """DataFrame guardado para ``clave`` o ``None`` si no está en caché."""
+        ruta = self._ruta(clave)
+        if clave not in self.indice or not os.path.exists(ruta):
+            self.indice.pop(clave, None)
+            return None
+        self.indice[clave]["acceso"] = time.time()
+        return pd.read_parquet(ruta)
+
+    def guardar(self, clave, df):
+        ruta = self._ruta(clave)
+        df.to_parquet(ruta, index=False)
+        self.indice[clave] = {"bytes": os.path.getsize(ruta), "acceso": time.time()}
+        self._desalojar()
+
+    def _desalojar(self):
+        total = sum(e["bytes"] for e in self.indice.values())
+        for clave in sorted(self.indice, key=lambda c: self.indice[c]["acceso"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.indice.pop(clave)["bytes"]
+            if os.path.exists(self._ruta(clave)):
+                os.remove(self._ruta(clave))
+
+    def persistir(self):
+        """Guarda el índice (tamaños y últimos accesos) de forma atómica."""
+        with open(self._ruta_indice + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.indice, f)
+        os.replace(self._ruta_indice + ".tmp", self._ruta_indice)
+
+
+def remuestrear_con_cache(rutas, ids=None, cache=None, paso=PASO_6H, tipo_posicion="linear",
+                          tipo_profundidad="nearest", crs_metrico="EPSG:3857", velocidad_max=VELOCIDAD_MAX_MS):
+    """Como ``remuestrear_trayectorias(cargar_marcas(rutas, ids), ...)`` pero reutilizando la caché.
+
+    Solo los archivos nuevos o modificados se leen e interpolan (en un único lote).
+    """
+    cache = cache or CacheTrayectorias()
+    ids = ids or [f"TIBURON_{i + 1}" for i in range(len(rutas))]
+    parametros = {"paso": paso, "tipo_posicion": tipo_posicion, "tipo_profundidad": tipo_profundidad,
+                  "crs": crs_metrico, "columnas": COLUMNAS_TRAYECTORIA, "velocidad_max": velocidad_max}
+
+    # Tramos por id; al final se concatenan en el orden de ``ids`` sin importar cuáles
+    # venían de la caché (el orden define la partición entrenamiento/prueba de modelo.py)
+    partes, pendientes = {}, []
+    for shark_id, ruta in zip(ids, rutas):
+        if not os.path.exists(ruta):
+            pendientes.append((shark_id, ruta, None))  # cargar_marcas reporta el archivo faltante
+            continue
+        clave = CacheTrayectorias.clave(ruta, **parametros)
+        df = cache.obtener(clave)
+        if df is None:
+            pendientes.append((shark_id, ruta, clave))
+        else:
+            partes[shark_id] = df.assign(id_tiburon=shark_id)
+    print(f"--- Caché de trayectorias: {len(partes)} reutilizadas, {len(pendientes)} por procesar ---")
+
+    if pendientes:
+        nuevas = remuestrear_trayectorias(
+            cargar_marcas([r for _, r, _ in pendientes], [s for s, _, _ in pendientes]),
+            paso=paso, tipo_posicion=tipo_posicion, tipo_profundidad=tipo_profundidad, crs_metrico=crs_metrico,
+            velocidad_max=velocidad_max,
+        )
+        por_id = dict(tuple(nuevas.groupby("id_tiburon", sort=False)))
+        for shark_id, _, clave in pendientes:
+            df = por_id.get(shark_id, nuevas.iloc[:0])
+            if clave is not None:
+                cache.guardar(clave, df.drop(columns="id_tiburon"))
+            partes[shark_id] = df
+    cache.persistir()
+
+    partes = [partes[s] for s in ids if s in partes and not partes[s].empty]
+    if not partes:
+        return pd.DataFrame(columns=COLUMNAS_TRAYECTORIA)
+    return pd.concat(partes, ignore_index=True)[COLUMNAS_TRAYECTORIA]
@@ -0,0 +1,343 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+# Tamaño por defecto de los bloques (celdas de latitud × celdas de longitud).
+# La memoria pico de la conversión depende de este valor, no del tamaño de la rejilla.
+TAM_BLOQUE = (512, 512)
+
+
+def extraer_año(nombre_archivo):
+    """Detecta el año a partir del nombre del archivo."""
+    match = re.search(r"20\d{2}", nombre_archivo)
+    return int(match.group()) if match else None
+
+
+def año_de_dataset(ds, nombre_archivo):
+    """Año de un archivo: primero ``time_coverage_start`` y, si falta, el nombre del archivo."""
+    inicio = ds.attrs.get("time_coverage_start")
+    if inicio:
+        match = re.match(r"\d{4}", str(inicio))
+        if match:
+            return int(match.group())
+    return extraer_año(nombre_archivo)
+
+
+def fecha_de_dataset(ds, nombre_archivo):
+    """Fecha de inicio de un archivo: ``time_coverage_start``, una fecha AAAAMMDD del nombre o el 1 de enero del año."""
+    inicio = ds.attrs.get("time_coverage_start")
+    if inicio:
+        try:
+            fecha = pd.Timestamp(str(inicio))
+            return fecha.tz_convert(None) if fecha.tzinfo else fecha
+        except ValueError:
+            pass
+    match = re.search(r"(20\d{2})(\d{2})(\d{2})", nombre_archivo)
+    if match:
+        try:
+            return pd.Timestamp(*map(int, match.groups()))
+        except ValueError:
+            pass
+    año = año_de_dataset(ds, nombre_archivo)
+    return pd.Timestamp(año, 1, 1) if año else None
+
+
+def elegir_variable(ds, variable_objetivo):
+    """Devuelve la variable pedida o, si no existe, la primera variable del archivo."""
+    if variable_objetivo in ds.data_vars:
+        return variable_objetivo
+    variable = list(ds.data_vars.keys())[0]
+    print(f"⚠️ Variable '{variable_objetivo}' no encontrada, usando '{variable}'.")
+    return variable
+
+
+def _nombre_dim(da, opciones):
+    for nombre in opciones:
+        if nombre in da.dims:
+            return nombre
+    raise KeyError(f"No se encontró ninguna de las dimensiones {opciones} en {da.dims}")
+
+
+class EscritorIncremental:
+    """Escribe bloques de filas al final de un CSV o Parquet sin retenerlos en memoria.
+
+    El formato se elige por la extensión: ``.parquet`` escribe un grupo de filas
+    por bloque; cualquier otra extensión se trata como CSV.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.filas = 0
+        self._parquet = ruta.endswith(".parquet")
+        self._writer = None
+        self._abierto = False
+
+    def escribir(self, df):
+        if df.empty:
+            return
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            tabla = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.ruta, tabla.schema)
+            elif not tabla.schema.equals(self._writer.schema):
+                # Todos los grupos de filas deben tener el esquema del primero
+                tabla = tabla.cast(self._writer.schema)
+            self._writer.write_table(tabla)
+        else:
+            df.to_csv(self.ruta, mode="a" if self._abierto else "w", header=not self._abierto, index=False)
+        self._abierto = True
+        self.filas += len(df)
+
+    def cerrar(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def recorrer_bloques(da, nombre_columna, tam_bloque=TAM_BLOQUE):
+    """Recorre ``da`` por bloques lat/lon y genera DataFrames solo con las celdas válidas.
+
+    Cada bloque se lee del disco por separado, se enmascara (``_FillValue`` y NaN)
+    y se descarta antes de leer el siguiente.
+    """
+    dim_lat = _nombre_dim(da, ("lat", "latitude"))
+    dim_lon = _nombre_dim(da, ("lon", "longitude"))
+    otras = [d for d in da.dims if d not in (dim_lat, dim_lon)]
+    da = da.transpose(*otras, dim_lat, dim_lon)
+
+    lats = da[dim_lat].values
+    lons = da[dim_lon].values
+    fill = da.attrs.get("_FillValue", da.encoding.get("_FillValue"))
+    tam_lat, tam_lon = tam_bloque
+
+    for indice in np.ndindex(*[da.sizes[d] for d in otras]):
+        plano = da.isel(dict(zip(otras, indice)))
+        for i0 in range(0, len(lats), tam_lat):
+            for j0 in range(0, len(lons), tam_lon):
+                bloque = plano.isel({dim_lat: slice(i0, i0 + tam_lat), dim_lon: slice(j0, j0 + tam_lon)}).values
+                validos = np.isfinite(bloque)
+                if fill is not None:
+                    validos &= bloque != fill
+                ii, jj = np.nonzero(validos)
+                yield bloque.size, bloque.nbytes, pd.DataFrame({
+                    "latitude": lats[i0 + ii],
+                    "longitude": lons[j0 + jj],
+                    nombre_columna: bloque[ii, jj],
+                })
+
+
+def convertir_archivo(ruta, escritor, variable_objetivo, nombre_columna, tam_bloque=TAM_BLOQUE):
+    """Convierte un archivo .nc en filas (latitude, longitude, valor, year, fecha) escritas por bloques.
+
+    ``fecha`` es el inicio del periodo del archivo (compuesto diario, 8 días, mensual...),
+    para poder unir por fecha y no solo por año.
+
+    Devuelve un diccionario con el año del archivo, las celdas leídas, los puntos
+    válidos y el tiempo empleado.
+    """
+    inicio = time.perf_counter()
+    celdas = puntos = bytes_leidos = 0
+    with xr.open_dataset(ruta) as ds:
+        año = año_de_dataset(ds, os.path.basename(ruta))
+        fecha = fecha_de_dataset(ds, os.path.basename(ruta))
+        da = ds[elegir_variable(ds, variable_objetivo)]
+        for n_celdas, n_bytes, df in recorrer_bloques(da, nombre_columna, tam_bloque):
+            celdas += n_celdas
+            bytes_leidos += n_bytes
+            if df.empty:
+                continue
+            df["year"] = pd.array([año] * len(df), dtype="Int16")
+            df["fecha"] = fecha
+            escritor.escribir(df)
+            puntos += len(df)
+    return {"año": año, "celdas": celdas, "puntos": puntos, "bytes": bytes_leidos,
+            "segundos": time.perf_counter() - inicio}
+
+
+def _reportar(etiqueta, stats):
+    seg = max(stats["segundos"], 1e-9)
+    print(f"  {etiqueta} {stats['puntos']} puntos válidos de {stats['celdas']} celdas "
+          f"en {stats['segundos']:.2f} s ({stats['celdas'] / seg / 1e6:.2f} M celdas/s, "
+          f"{stats['bytes'] / seg / 2**20:.1f} MB/s)")
+
+
+def convertir_carpeta(carpeta, archivo_salida, variable_objetivo, nombre_columna, tam_bloque=TAM_BLOQUE):
+    """Convierte todos los .nc de ``carpeta`` a un único archivo de salida escrito en streaming.
+
+    Devuelve el número total de puntos válidos escritos.
+    """
+    total = {"celdas": 0, "puntos": 0, "bytes": 0, "segundos": 0.0}
+    with EscritorIncremental(archivo_salida) as escritor:
+        for archivo in sorted(os.listdir(carpeta)):
+            if not archivo.endswith(".nc"):
+                continue
+            print(f"\nProcesando: {archivo}")
+            stats = convertir_archivo(os.path.join(carpeta, archivo), escritor, variable_objetivo,
+                                      nombre_columna, tam_bloque=tam_bloque)
+            _reportar("→", stats)
+            for clave in total:
+                total[clave] += stats[clave]
+    if total["puntos"]:
+        _reportar("\nTotal:", total)
+    return total["puntos"]
+
+
+# === CONVERSIÓN PARALELA Y REANUDABLE ===
+
+ARCHIVO_MANIFIESTO = "manifiesto.json"
+VERSION_FRAGMENTO = 2  # súbela si cambian las columnas de los fragmentos (2: columna ``fecha``)
+# Tipos con los que se unen los fragmentos (las columnas de valor van como float64): un fragmento
+# CSV relee ``year`` como float si tiene nulos y ``fecha`` como texto
+TIPOS_FRAGMENTO = {"latitude": "float64", "longitude": "float64", "year": "Int16"}
+
+
+def firma_archivo(ruta):
+    """Nombre, tamaño y fecha de modificación con los que se reconoce un archivo ya convertido."""
+    st = os.stat(ruta)
+    return {"archivo": os.path.basename(ruta), "tamaño": st.st_size, "mtime": st.st_mtime}
+
+
+def cargar_manifiesto(carpeta_fragmentos):
+    ruta = os.path.join(carpeta_fragmentos, ARCHIVO_MANIFIESTO)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)["archivos"]
+
+
+def guardar_manifiesto(carpeta_fragmentos, manifiesto):
+    """Reescribe el manifiesto de forma atómica para que una interrupción no lo corrompa."""
+    ruta = os.path.join(carpeta_fragmentos, ARCHIVO_MANIFIESTO)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"archivos": manifiesto}, f, ensure_ascii=False, indent=1)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def _pendiente(entrada, firma, carpeta_fragmentos):
+    if entrada is None or entrada.get("version") != VERSION_FRAGMENTO:
+        return True
+    if (entrada["tamaño"], entrada["mtime"]) != (firma["tamaño"], firma["mtime"]):
+        return True
+    return not os.path.exists(os.path.join(carpeta_fragmentos, entrada["fragmento"]))
+
+
+def _convertir_fragmento(ruta, carpeta_fragmentos, extension, variable_objetivo, nombre_columna, tam_bloque):
+    """Tarea de un proceso: convierte un archivo .nc a su propio fragmento de salida."""
+    base = os.path.splitext(os.path.basename(ruta))[0]
+    fragmento = base + extension
+    destino = os.path.join(carpeta_fragmentos, fragmento)
+    temporal = os.path.join(carpeta_fragmentos, base + ".parcial" + extension)
+    with EscritorIncremental(temporal) as escritor:
+        stats = convertir_archivo(ruta, escritor, variable_objetivo, nombre_columna, tam_bloque)
+    if stats["puntos"]:
+        os.replace(temporal, destino)
+    else:
+        # Archivo sin celdas válidas: se registra igualmente para no reprocesarlo.
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        open(destino, "w").close()
+    return {**firma_archivo(ruta), **stats, "fragmento": fragmento, "version": VERSION_FRAGMENTO}
+
+
+def convertir_carpeta_paralelo(carpeta, carpeta_fragmentos, variable_objetivo, nombre_columna,
+                               procesos=None, formato="csv", tam_bloque=TAM_BLOQUE):
+    """Reparte los .nc de ``carpeta`` entre un pool de procesos; cada uno escribe su fragmento.
+
+    ``manifiesto.json`` en ``carpeta_fragmentos`` registra cada archivo terminado
+    (nombre, tamaño, mtime, año y puntos). Los archivos cuya firma no ha cambiado
+    se saltan, así que una ejecución interrumpida se reanuda donde quedó.
+    Devuelve el manifiesto actualizado.
+    """
+    os.makedirs(carpeta_fragmentos, exist_ok=True)
+    manifiesto = cargar_manifiesto(carpeta_fragmentos)
+    extension = "." + formato
+
+    # Archivos que ya no están en la carpeta: su fragmento no debe llegar a la unión
+    borrados = [a for a in manifiesto if not os.path.exists(os.path.join(carpeta, a))]
+    for archivo in borrados:
+        fragmento = os.path.join(carpeta_fragmentos, manifiesto.pop(archivo)["fragmento"])
+        if os.path.exists(fragmento):
+            os.remove(fragmento)
+    if borrados:
+        print(f"{len(borrados)} archivos eliminados de la carpeta se quitaron del manifiesto.")
+        guardar_manifiesto(carpeta_fragmentos, manifiesto)
+
+    pendientes = []
+    for archivo in sorted(os.listdir(carpeta)):
+        if not archivo.endswith(".nc"):
+            continue
+        ruta = os.path.join(carpeta, archivo)
+        if _pendiente(manifiesto.get(archivo), firma_archivo(ruta), carpeta_fragmentos):
+            pendientes.append(ruta)
+    print(f"{len(pendientes)} archivos pendientes, {len(manifiesto)} en el manifiesto.")
+
+    inicio = time.perf_counter()
+    celdas = 0
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = {pool.submit(_convertir_fragmento, ruta, carpeta_fragmentos, extension,
+                               variable_objetivo, nombre_columna, tam_bloque): ruta for ruta in pendientes}
+        for futuro in as_completed(futuros):
+            try:
+                entrada = futuro.result()
+            except Exception as e:
+                print(f"❌ ERROR procesando {os.path.basename(futuros[futuro])}: {e}")
+                continue
+            manifiesto[entrada["archivo"]] = entrada
+            guardar_manifiesto(carpeta_fragmentos, manifiesto)
+            celdas += entrada["celdas"]
+            _reportar(f"{entrada['archivo']} →", entrada)
+
+    if pendientes:
+        seg = max(time.perf_counter() - inicio, 1e-9)
+        print(f"Conversión paralela: {len(pendientes)} archivos en {seg:.2f} s "
+              f"({celdas / seg / 1e6:.2f} M celdas/s)")
+    return manifiesto
+
+
+def _esquema_fijo(df):
+    """``df`` con los tipos de ``TIPOS_FRAGMENTO`` (``fecha`` como datetime, el resto float64)."""
+    tipos = {c: TIPOS_FRAGMENTO.get(c, "float64") for c in df.columns if c != "fecha"}
+    df = df.astype(tipos)
+    if "fecha" in df:
+        df["fecha"] = pd.to_datetime(df["fecha"]).astype("datetime64[ns]")
+    return df
+
+
+def unir_fragmentos(carpeta_fragmentos, archivo_salida, filas_por_bloque=1_000_000):
+    """Concatena en streaming los fragmentos del manifiesto en un único archivo de salida.
+
+    Cada bloque se lleva a un esquema fijo (``TIPOS_FRAGMENTO``), así fragmentos
+    escritos en formatos o versiones distintas se pueden unir en un mismo Parquet.
+    Devuelve el número de filas escritas.
+    """
+    manifiesto = cargar_manifiesto(carpeta_fragmentos)
+    with EscritorIncremental(archivo_salida) as escritor:
+        for nombre in sorted(manifiesto):
+            entrada = manifiesto[nombre]
+            if not entrada["puntos"]:
+                continue
+            ruta = os.path.join(carpeta_fragmentos, entrada["fragmento"])
+            if ruta.endswith(".parquet"):
+                import pyarrow.parquet as pq
+
+                for lote in pq.ParquetFile(ruta).iter_batches(batch_size=filas_por_bloque):
+                    escritor.escribir(_esquema_fijo(lote.to_pandas()))
+            else:
+                for df in pd.read_csv(ruta, chunksize=filas_por_bloque):
+                    escritor.escribir(_esquema_fijo(df))
+    return escritor.filas
@@ -1,60 +1,106 @@
-import pandas as pd
-import numpy as np # Necesario para usar np.nan
+import numpy as np
 
-# --- Nombres de tus archivos (AJUSTA ESTOS NOMBRES) ---
-archivo_clorofila = "C:/Users/User/Downloads/NASA/clorofila_2013_2017.csv"
-archivo_temperatura = "C:/Users/User/Downloads/NASA/temperatura_superficial_2013_2017.csv"
-archivo_salida = 'datos_modelo.csv'
+from alineacion_rasters import Rejilla, construir_cubo, cubo_a_tabla
+from almacen_ambiental import escribir_almacen
+from cubo_temporal import ARCHIVO_CUBO_TEMPORAL, construir_cubo_temporal
+from rasgos_oceanograficos import ARCHIVO_RASGOS, RASGOS, VENTANA, calcular_rasgos
+from instrumentacion import etapa
+
+# --- Carpetas de archivos .nc (AJUSTA ESTAS RUTAS) ---
+carpeta_clorofila = "C:/Users/User/Downloads/NASA/SeaChlorophyll"
+carpeta_temperatura = "C:/Users/User/Downloads/NASA/SeaTemps"
+archivo_cubo = 'cubo_ambiental.nc'  # Cubo alineado (year, lat, lon) con ambas variables
+archivo_salida = 'datos_modelo'  # Almacén Parquet particionado por año y tesela lat/lon
+archivo_cubo_temporal = ARCHIVO_CUBO_TEMPORAL  # Cubo (time, lat, lon) con un paso por archivo .nc (None = no crearlo)
+archivo_rasgos = ARCHIVO_RASGOS  # Capas de frentes y gradientes calculadas sobre el cubo (None = no crearlas)
+ventana_rasgos = VENTANA  # Celdas por lado del vecindario de los rasgos
+resolucion = 1 / 12  # Grados de la rejilla común (9 km, la del producto más grueso)
+metodo = "auto"  # "bloques" (promedio), "cercano" (vecino más cercano) o "auto"
 # --------------------------------------------------------
 
-# 1. Cargar los datasets
-try:
-    df_clorofila = pd.read_csv(archivo_clorofila)
-    df_temperatura = pd.read_csv(archivo_temperatura)
-except FileNotFoundError as e:
-    print(f"Error: No se pudo encontrar el archivo. Asegúrate de que los nombres son correctos y el archivo está en la ubicación esperada. Detalle: {e}")
-    exit()
-
-# 2. Renombrar las columnas para que Pandas sepa cómo unirlas
-# Supongo que las columnas del primer archivo son: lat, lon, clorofila, año
-# Y las del segundo son: lat, lon, temperatura, año
-
-# Aseguramos que los nombres de las columnas que queremos unir sean idénticos
-columnas_clave = ['latitude', 'longitude', 'year']
-# Renombramos las columnas del valor de interés si tienen un nombre diferente
-df_clorofila = df_clorofila.rename(columns={'clorofila': 'concentracion_clorofila'})
-df_temperatura = df_temperatura.rename(columns={'temperatura': 'temperatura'})
-# NOTA: Ajusta 'clorofila' y 'temperatura' en las líneas anteriores si en tus CSV tienen otros nombres.
-
-# 3. Combinar los datasets
-# Usaremos pd.merge() con un método 'outer' (unión externa)
-# Esto asegura que MANTENEMOS TODAS las filas de AMBOS archivos.
-# Si una combinación (lat, lon, año) existe en uno pero no en el otro,
-# el valor de la columna faltante se rellenará automáticamente con NaN.
-
-df_combinado = pd.merge(
-    df_clorofila,
-    df_temperatura,
-    on=columnas_clave, # Columnas comunes para la unión
-    how='outer'        # 'outer' es clave: mantiene todas las filas y usa NaN para faltantes
-)
-
-# 4. (Opcional) Ver un resumen de los datos combinados
-print("Primeras 5 filas del archivo combinado:")
-print(df_combinado.head())
-
-print("\nConteo de valores NaN (datos faltantes) por columna:")
-print(df_combinado.isnull().sum())
-
-# 5. Guardar el nuevo archivo CSV
-# Pandas escribe NaN como una cadena vacía en el CSV por defecto,
-# pero si quieres una representación más explícita (como 'NaN' o 'Null') en el archivo,
-# puedes usar el parámetro 'na_rep'. Para modelos, la representación por defecto de Pandas (NaN) está bien.
-
-# Para asegurar la representación de 'NaN' en el archivo, que es lo que quieres:
-df_combinado.to_csv(archivo_salida, index=False, na_rep='NaN') 
-# na_rep='NaN' asegura que el texto "NaN" aparece en el CSV donde falta un dato.
-# index=False evita guardar la columna de índice de Pandas.
-
-print(f"\n✅ Proceso completado. Archivo combinado guardado como: {archivo_salida}")
-print("El archivo resultante contiene las columnas:", df_combinado.columns.tolist())
\ No newline at end of file
+
+def alinear_productos(carpeta_clorofila, carpeta_temperatura, resolucion=resolucion, metodo=metodo):
+    """Lleva clorofila y temperatura a una rejilla común y devuelve el cubo anual (year, lat, lon)."""
+    # 1. Definir la rejilla común
+    # Clorofila (4 km) y temperatura (9 km) no comparten rejilla, así que unirlas por
+    # igualdad exacta de lat/lon deja la mayoría de filas sin pareja. En su lugar, ambos
+    # productos se llevan a la misma rejilla regular en espacio de arreglos.
+    rejilla = Rejilla.global_(resolucion)
+    print(f"Rejilla común: {rejilla.nlat} × {rejilla.nlon} celdas de {resolucion:.4f}°")
+
+    # 2. Regrillar y promediar por año cada producto
+    with etapa("alineacion_rasters", metodo=metodo, celdas_rejilla=rejilla.nlat * rejilla.nlon) as r:
+        cubo = construir_cubo({
+            'Cloro_Media': (carpeta_clorofila, 'chlor_a'),
+            'Temp_Media': (carpeta_temperatura, 'sst'),
+        }, rejilla, metodo=metodo)
+        r.anotar(años=len(cubo['year']),
+                 celdas_validas={v: int(np.isfinite(cubo[v].values).sum()) for v in cubo.data_vars})
+    return cubo
+
+
+def guardar_cubo_temporal(carpeta_clorofila, carpeta_temperatura, archivo_cubo_temporal=archivo_cubo_temporal,
+                          resolucion=resolucion, metodo=metodo):
+    """Escribe el cubo con un paso de tiempo por archivo (sin promediar por año); devuelve sus fechas."""
+    rejilla = Rejilla.global_(resolucion)
+    with etapa("cubo_temporal", salida=archivo_cubo_temporal, celdas_rejilla=rejilla.nlat * rejilla.nlon) as r:
+        fechas = construir_cubo_temporal({
+            'Cloro_Media': (carpeta_clorofila, 'chlor_a'),
+            'Temp_Media': (carpeta_temperatura, 'sst'),
+        }, rejilla, archivo_cubo_temporal, metodo=metodo)
+        r.anotar(pasos=len(fechas))
+    return fechas
+
+
+def guardar_rasgos(archivo_cubo, archivo_rasgos=archivo_rasgos, ventana=ventana_rasgos):
+    """Calcula las capas de gradientes, anomalías y desviaciones locales de ``archivo_cubo``."""
+    with etapa("rasgos_oceanograficos", entrada=archivo_cubo, salida=archivo_rasgos, ventana=ventana) as r:
+        pasos = calcular_rasgos(archivo_cubo, archivo_rasgos, ventana)
+        r.anotar(pasos=pasos, capas=len(RASGOS))
+    return pasos
+
+
+def guardar_cubo_y_almacen(cubo, archivo_cubo=archivo_cubo, archivo_salida=archivo_salida):
+    """Escribe el cubo NetCDF y el almacén Parquet; devuelve las filas escritas en el almacén."""
+    # 4. Guardar el cubo y el almacén ambiental
+    # El cubo conserva la estructura de rejilla (útil para muestrear por índice);
+    # el almacén Parquet guarda solo las celdas con dato, particionado por año y tesela.
+    with etapa("escritura_almacen", salida=archivo_salida) as r:
+        cubo.to_netcdf(archivo_cubo)
+
+        filas = 0
+        for año in cubo['year'].values:
+            filas += escribir_almacen(cubo_a_tabla(cubo, int(año)), archivo_salida)
+        r.anotar(filas_salida=filas)
+    return filas
+
+
+if __name__ == "__main__":
+    try:
+        cubo = alinear_productos(carpeta_clorofila, carpeta_temperatura, resolucion, metodo)
+    except FileNotFoundError as e:
+        print(f"Error: No se pudo encontrar la carpeta. Asegúrate de que las rutas son correctas. Detalle: {e}")
+        exit()
+
+    # 3. (Opcional) Ver un resumen del cubo alineado
+    print("\nCubo ambiental alineado:")
+    print(cubo)
+
+    print("\nCeldas con dato por variable y año:")
+    for var in cubo.data_vars:
+        print(f"  {var}: {dict(zip(cubo['year'].values.tolist(), np.isfinite(cubo[var].values).sum(axis=(1, 2)).tolist()))}")
+
+    filas = guardar_cubo_y_almacen(cubo, archivo_cubo, archivo_salida)
+
+    if archivo_cubo_temporal:
+        fechas = guardar_cubo_temporal(carpeta_clorofila, carpeta_temperatura, archivo_cubo_temporal, resolucion, metodo)
+        print(f"Cubo temporal guardado en {archivo_cubo_temporal}: {len(fechas)} pasos ({fechas[0].date()} → {fechas[-1].date()})")
+
+    if archivo_rasgos:
+        # Sobre el cubo temporal si existe (rasgos por fecha); si no, sobre el anual
+        origen = archivo_cubo_temporal or archivo_cubo
+        pasos = guardar_rasgos(origen, archivo_rasgos, ventana_rasgos)
+        print(f"Rasgos de frentes ({', '.join(RASGOS)}) guardados en {archivo_rasgos}: {pasos} pasos")
+
+    print(f"\n✅ Proceso completado. Cubo guardado en {archivo_cubo} y {filas} filas en el almacén: {archivo_salida}")
+    print("Variables del cubo:", list(cubo.data_vars))
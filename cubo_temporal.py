@@ -0,0 +1,200 @@
+import os
+
+import netCDF4
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from alineacion_rasters import regrillar
+from conversion_nc import elegir_variable, fecha_de_dataset
+
+# Cubo ambiental con resolución temporal (time, lat, lon) en disco.
+# A diferencia de ``construir_cubo`` (una media por año), cada archivo .nc
+# (compuesto diario, de 8 días, mensual...) se regrilla a la rejilla común y
+# ocupa su propio paso de tiempo. El NetCDF4 se escribe en trozos pequeños
+# (``TROZO`` pasos × celdas lat × celdas lon, comprimidos) para que leer un
+# punto solo descomprima el trozo que lo contiene. ``ExtractorCubo`` muestrea
+# millones de puntos (fecha, lat, lon) agrupándolos por trozo: cada trozo
+# necesario se lee una sola vez y nunca se carga un año entero en memoria.
+
+ARCHIVO_CUBO_TEMPORAL = "cubo_temporal.nc"
+TROZO = (4, 64, 64)  # pasos de tiempo × celdas de latitud × celdas de longitud
+UNIDADES_TIEMPO = "days since 1970-01-01 00:00:00"
+_EPOCA = np.datetime64("1970-01-01T00:00:00", "ns")
+_DIA_NS = 86_400 * 10**9
+
+
+def _a_dias(fechas):
+    return (np.asarray(fechas, dtype="datetime64[ns]") - _EPOCA).astype("int64") / _DIA_NS
+
+
+def _fin_de_dataset(ds):
+    """Fin del periodo del archivo (``time_coverage_end``) o ``None`` si no lo declara."""
+    fin = ds.attrs.get("time_coverage_end")
+    try:
+        fin = pd.Timestamp(str(fin)) if fin else None
+    except ValueError:
+        return None
+    return fin.tz_convert(None) if fin is not None and fin.tzinfo else fin
+
+
+def pasos_de_carpeta(carpeta, variable_objetivo):
+    """Lista ``[(fecha, fin, ruta, variable)]`` de los .nc de ``carpeta`` (solo lee metadatos)."""
+    pasos = []
+    for archivo in sorted(os.listdir(carpeta)):
+        if not archivo.endswith(".nc"):
+            continue
+        ruta = os.path.join(carpeta, archivo)
+        with xr.open_dataset(ruta) as ds:
+            fecha = fecha_de_dataset(ds, archivo)
+            fin = _fin_de_dataset(ds)
+            variable = elegir_variable(ds, variable_objetivo)
+        if fecha is None:
+            print(f"⚠️ {archivo}: no se pudo determinar la fecha. Saltando.")
+            continue
+        pasos.append((fecha, fin, ruta, variable))
+    return pasos
+
+
+def construir_cubo_temporal(productos, rejilla, ruta_salida=ARCHIVO_CUBO_TEMPORAL, metodo="auto", trozo=TROZO):
+    """Escribe el cubo (time, lat, lon) de ``productos`` en ``ruta_salida`` y devuelve las fechas.
+
+    ``productos`` tiene la misma forma que en ``construir_cubo``. El eje de tiempo es
+    la unión de las fechas de inicio de todos los archivos; si dos archivos de un
+    producto comparten fecha se promedian. Se procesa un bloque de ``trozo[0]`` pasos
+    a la vez, así que la memoria pico es la de ``trozo[0]`` capas de la rejilla.
+    """
+    pasos = {nombre: pasos_de_carpeta(carpeta, variable) for nombre, (carpeta, variable) in productos.items()}
+    fechas = sorted({fecha for lista in pasos.values() for fecha, _, _, _ in lista})
+    if not fechas:
+        raise ValueError("No se encontró ningún archivo .nc con fecha en las carpetas de entrada.")
+    indice = {fecha: k for k, fecha in enumerate(fechas)}
+    n_t = len(fechas)
+    # Fin de cada paso (el mayor ``time_coverage_end`` de sus archivos; NaN si ninguno lo declara)
+    fines = np.full(n_t, np.nan)
+    for lista in pasos.values():
+        for fecha, fin, _, _ in lista:
+            if fin is not None:
+                fines[indice[fecha]] = np.fmax(fines[indice[fecha]], _a_dias([fin])[0])
+    ct, ci, cj = min(trozo[0], n_t), min(trozo[1], rejilla.nlat), min(trozo[2], rejilla.nlon)
+
+    temporal = ruta_salida + ".tmp"
+    with netCDF4.Dataset(temporal, "w") as nc:
+        nc.createDimension("time", n_t)
+        nc.createDimension("lat", rejilla.nlat)
+        nc.createDimension("lon", rejilla.nlon)
+        tiempo = nc.createVariable("time", "f8", ("time",))
+        tiempo.units, tiempo.calendar = UNIDADES_TIEMPO, "standard"
+        tiempo[:] = _a_dias(pd.DatetimeIndex(fechas))
+        fin = nc.createVariable("time_fin", "f8", ("time",), fill_value=np.nan)
+        fin.units, fin.long_name = UNIDADES_TIEMPO, "fin del periodo de cada paso"
+        fin[:] = fines
+        nc.createVariable("lat", "f8", ("lat",))[:] = rejilla.lats
+        nc.createVariable("lon", "f8", ("lon",))[:] = rejilla.lons
+        for nombre in productos:
+            nc.createVariable(nombre, "f4", ("time", "lat", "lon"), zlib=True, complevel=1, shuffle=True,
+                              chunksizes=(ct, ci, cj), fill_value=np.float32(np.nan))
+
+        # Bloques de ``ct`` pasos: cada escritura cubre trozos completos, sin reescrituras
+        for k0 in range(0, n_t, ct):
+            k1 = min(k0 + ct, n_t)
+            for nombre, lista in pasos.items():
+                suma = np.zeros((k1 - k0, rejilla.nlat, rejilla.nlon), dtype="float32")
+                cuenta = np.zeros(suma.shape, dtype="uint8")
+                for fecha, _, ruta, variable in lista:
+                    k = indice[fecha]
+                    if not k0 <= k < k1:
+                        continue
+                    with xr.open_dataset(ruta) as ds:
+                        valores = regrillar(ds[variable], rejilla, metodo)
+                    validos = np.isfinite(valores)
+                    suma[k - k0][validos] += valores[validos]
+                    cuenta[k - k0] += validos
+                    print(f"  {os.path.basename(ruta)} ({fecha.date()}) → {int(validos.sum())} celdas válidas")
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    nc[nombre][k0:k1] = np.where(cuenta > 0, suma / cuenta, np.nan)
+    os.replace(temporal, ruta_salida)
+    return fechas
+
+
+class ExtractorCubo:
+    """Muestrea un cubo temporal en puntos (fecha, lat, lon) leyendo solo los trozos necesarios.
+
+    Cada punto toma el paso vigente: el último que empezó en o antes de su fecha,
+    siempre que la fecha no pase del fin de su periodo (``time_fin``) o, si el paso
+    no lo declara, de ``desfase_max_dias`` tras su inicio (por defecto 1,5 veces el
+    paso típico del cubo). Tiene la misma interfaz que los muestreadores de
+    ``muestreo_puntos``, pero su eje temporal es la columna ``fecha``.
+    """
+
+    columna_tiempo = "fecha"
+
+    def __init__(self, ruta, variables=None, desfase_max_dias=None):
+        self._nc = netCDF4.Dataset(ruta)
+        self._nc.set_auto_mask(False)
+        self.dias = np.asarray(self._nc["time"][:], dtype="float64")
+        self.fines = (np.asarray(self._nc["time_fin"][:], dtype="float64") if "time_fin" in self._nc.variables
+                      else np.full(len(self.dias), np.nan))
+        lats = np.asarray(self._nc["lat"][:], dtype="float64")
+        lons = np.asarray(self._nc["lon"][:], dtype="float64")
+        self.lat0, self.nlat = lats[0], len(lats)
+        self.lon0, self.nlon = lons[0], len(lons)
+        self.dlat = (lats[-1] - lats[0]) / (len(lats) - 1) if len(lats) > 1 else 1.0
+        self.dlon = (lons[-1] - lons[0]) / (len(lons) - 1) if len(lons) > 1 else 1.0
+        self.variables = variables or [v for v, var in self._nc.variables.items()
+                                       if var.dimensions == ("time", "lat", "lon")]
+        trozo = self._nc[self.variables[0]].chunking()
+        self.trozo = tuple(trozo) if trozo != "contiguous" else (1, self.nlat, self.nlon)
+        if desfase_max_dias is None:
+            desfase_max_dias = 1.5 * float(np.median(np.diff(self.dias))) if len(self.dias) > 1 else 1.0
+        self.desfase_max_dias = desfase_max_dias
+        self.fines = np.where(np.isnan(self.fines), self.dias + desfase_max_dias, self.fines)
+        self.trozos_leidos = 0
+
+    def indices(self, lat, lon, tiempo):
+        """Índices (paso, fila, columna) de cada punto y máscara de puntos con dato vigente."""
+        i = np.rint((np.asarray(lat, dtype="float64") - self.lat0) / self.dlat).astype("int64")
+        j = np.rint((np.asarray(lon, dtype="float64") - self.lon0) / self.dlon).astype("int64")
+        dias = _a_dias(tiempo)
+        k = np.searchsorted(self.dias, dias, side="right") - 1
+        kc = np.clip(k, 0, len(self.dias) - 1)
+        dentro = ((k >= 0) & (dias <= self.fines[kc])
+                  & (i >= 0) & (i < self.nlat) & (j >= 0) & (j < self.nlon))
+        return kc, np.clip(i, 0, self.nlat - 1), np.clip(j, 0, self.nlon - 1), dentro
+
+    def muestrear(self, lat, lon, tiempo):
+        """Devuelve ``({variable: valores}, aciertos)`` para todos los puntos a la vez."""
+        k, i, j, dentro = self.indices(lat, lon, tiempo)
+        valores = {v: np.full(len(dentro), np.nan) for v in self.variables}
+        sel = np.flatnonzero(dentro)
+        if not len(sel):
+            return valores, np.zeros(len(dentro), dtype=bool)
+
+        # Agrupar los puntos por trozo: cada trozo se lee (y descomprime) una sola vez
+        ct, ci, cj = self.trozo
+        n_i, n_j = -(-self.nlat // ci), -(-self.nlon // cj)
+        trozo = (k[sel] // ct * n_i + i[sel] // ci) * n_j + j[sel] // cj
+        orden = np.argsort(trozo, kind="stable")
+        sel, trozo = sel[orden], trozo[orden]
+        limites = np.r_[0, np.flatnonzero(np.diff(trozo)) + 1, len(sel)]
+        for a, b in zip(limites[:-1], limites[1:]):
+            puntos = sel[a:b]
+            k0, i0, j0 = k[puntos[0]] // ct * ct, i[puntos[0]] // ci * ci, j[puntos[0]] // cj * cj
+            for v in self.variables:
+                bloque = self._nc[v][k0:k0 + ct, i0:i0 + ci, j0:j0 + cj]
+                valores[v][puntos] = bloque[k[puntos] - k0, i[puntos] - i0, j[puntos] - j0]
+            self.trozos_leidos += 1
+
+        aciertos = np.zeros(len(dentro), dtype=bool)
+        for v in self.variables:
+            aciertos |= np.isfinite(valores[v])
+        return valores, aciertos
+
+    def cerrar(self):
+        self._nc.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
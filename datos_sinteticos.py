@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+# Generador de datos sintéticos con la misma forma que las entradas reales
+# (que no están en el repositorio): CSV de marcas estilo Argos (date, lat, lon, lc)
+# y rásteres anuales de clorofila (chlor_a) y temperatura superficial (sst) en
+# NetCDF. Sirve para probar y medir el pipeline a distintas escalas.
+#
+#   python datos_sinteticos.py --escala mediana --salida datos_sinteticos
+
+# Escalas predefinidas: marcas, fijaciones por marca, años y resolución de los rásteres (grados)
+ESCALAS = {
+    "pequeña": {"marcas": 5, "fijaciones": 500, "años": [2015], "res_clorofila": 0.5, "res_temperatura": 1.0},
+    "mediana": {"marcas": 20, "fijaciones": 3000, "años": [2014, 2015], "res_clorofila": 0.25, "res_temperatura": 0.5},
+    "grande": {"marcas": 100, "fijaciones": 10000, "años": [2013, 2014, 2015, 2016],
+               "res_clorofila": 1 / 24, "res_temperatura": 1 / 12},
+}
+
+CLASES_LC = np.array(["3", "2", "1", "0", "A", "B"])
+PROB_LC = np.array([0.15, 0.2, 0.2, 0.15, 0.15, 0.15])
+
+
+def generar_marcas(carpeta, marcas=10, fijaciones=1000, años=(2015,), semilla=0):
+    """Escribe ``marcas`` CSV de seguimiento con una caminata aleatoria por marca.
+
+    Los intervalos entre fijaciones son irregulares (exponenciales, media ~6 h) y
+    ``lc`` sigue las clases Argos (3, 2, 1, 0, A, B). Devuelve las rutas en orden.
+    """
+    rng = np.random.default_rng(semilla)
+    os.makedirs(carpeta, exist_ok=True)
+    rutas = []
+    for i in range(marcas):
+        año = int(años[i % len(años)])
+        inicio = pd.Timestamp(f"{año}-01-01") + pd.to_timedelta(rng.uniform(0, 180), unit="D")
+        fechas = inicio + pd.to_timedelta(np.cumsum(rng.exponential(6.0, fijaciones)), unit="h")
+        lat0, lon0 = rng.uniform(-50, 50), rng.uniform(-180, 180)
+        # Caminata con deriva por marca; la latitud se acota y la longitud se envuelve
+        pasos = rng.normal(rng.normal(0, 0.02, 2), 0.1, (fijaciones, 2))
+        lat = np.clip(lat0 + np.cumsum(pasos[:, 0]), -75, 75)
+        lon = (lon0 + np.cumsum(pasos[:, 1]) + 180) % 360 - 180
+        ruta = os.path.join(carpeta, f"sintetico_{año}_{100000 + i}pnas_atn.csv")
+        pd.DataFrame({
+            "date": fechas.strftime("%Y-%m-%d %H:%M:%S"),
+            "lat": lat,
+            "lon": lon,
+            "lc": rng.choice(CLASES_LC, fijaciones, p=PROB_LC),
+        }).to_csv(ruta, index=False)
+        rutas.append(ruta)
+    return rutas
+
+
+def _campo(variable, lats, lons, año, rng):
+    """Campo plausible: SST decrece con la latitud; clorofila lognormal, mayor en latitudes altas."""
+    lat2d, lon2d = np.meshgrid(lats, lons, indexing="ij")
+    ondas = np.sin(np.radians(lon2d) * 3 + año) * np.cos(np.radians(lat2d) * 2)
+    if variable == "sst":
+        valores = 28 * np.cos(np.radians(lat2d)) ** 2 - 1.5 + 2 * ondas + rng.normal(0, 0.3, lat2d.shape)
+    else:
+        valores = np.exp(-1.5 + 1.2 * np.abs(lat2d) / 90 + 0.5 * ondas + rng.normal(0, 0.3, lat2d.shape))
+    # Máscara de "tierra" fija entre años, más ~10 % de huecos por nubes en clorofila
+    tierra = (np.sin(np.radians(lon2d) * 2) * np.cos(np.radians(lat2d) * 3)) > 0.8
+    if variable == "chlor_a":
+        tierra |= rng.random(lat2d.shape) < 0.1
+    return np.where(tierra, np.nan, valores).astype("float32")
+
+
+def generar_rasters(carpeta, variable="chlor_a", años=(2015,), resolucion=0.25, semilla=0):
+    """Escribe un NetCDF anual global de ``variable`` (``chlor_a`` o ``sst``) por año.
+
+    Las latitudes van de norte a sur, como en los productos L3 de la NASA, y cada
+    archivo lleva ``time_coverage_start``. Devuelve las rutas en orden.
+    """
+    rng = np.random.default_rng(semilla)
+    os.makedirs(carpeta, exist_ok=True)
+    lats = (90 - resolucion * (np.arange(int(round(180 / resolucion))) + 0.5)).astype("float32")
+    lons = (-180 + resolucion * (np.arange(int(round(360 / resolucion))) + 0.5)).astype("float32")
+    producto = "CHL" if variable == "chlor_a" else "SST"
+    rutas = []
+    for año in años:
+        ds = xr.Dataset({variable: (("lat", "lon"), _campo(variable, lats, lons, año, rng))},
+                        coords={"lat": lats, "lon": lons},
+                        attrs={"time_coverage_start": f"{año}-01-01T00:00:00Z",
+                               "time_coverage_end": f"{año}-12-31T23:59:59Z"})
+        ruta = os.path.join(carpeta, f"SINTETICO.{año}0101_{año}1231.L3m.YR.{producto}.{variable}.nc")
+        ds.to_netcdf(ruta, encoding={variable: {"zlib": True, "complevel": 1}})
+        rutas.append(ruta)
+    return rutas
+
+
+def generar(carpeta, escala="pequeña", semilla=0):
+    """Genera marcas, clorofila y temperatura de una escala en ``carpeta``.
+
+    Devuelve un diccionario con las carpetas y rutas creadas.
+    """
+    cfg = ESCALAS[escala]
+    carpetas = {k: os.path.join(carpeta, k) for k in ("tiburon", "clorofila", "temperatura")}
+    return {
+        "carpetas": carpetas,
+        "marcas": generar_marcas(carpetas["tiburon"], cfg["marcas"], cfg["fijaciones"], cfg["años"], semilla),
+        "clorofila": generar_rasters(carpetas["clorofila"], "chlor_a", cfg["años"], cfg["res_clorofila"], semilla),
+        "temperatura": generar_rasters(carpetas["temperatura"], "sst", cfg["años"], cfg["res_temperatura"], semilla + 1),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Genera marcas Argos y rásteres NetCDF sintéticos.")
+    parser.add_argument("--escala", choices=list(ESCALAS), default="pequeña")
+    parser.add_argument("--salida", default="datos_sinteticos")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    datos = generar(args.salida, args.escala, args.semilla)
+    print(f"✅ {len(datos['marcas'])} marcas, {len(datos['clorofila'])} rásteres de clorofila y "
+          f"{len(datos['temperatura'])} de temperatura en {args.salida}")
@@ -0,0 +1,125 @@
+import numpy as np
+import xarray as xr
+
+from pronostico import _normalizar, paso_modelo
+
+# Pronóstico por conjuntos (Monte Carlo) que produce rásteres de probabilidad.
+# Cada miembro sigue el modelo y en cada paso suma un residuo sorteado de los
+# residuos del conjunto de prueba (pares lon/lat, para conservar su correlación).
+# Las posiciones se acumulan directamente en un histograma lat/lon, por lotes de
+# miembros: la memoria depende del tamaño del lote, no del número de miembros.
+
+RESIDUALS_FILENAME = 'residuos_modelo.npy'
+
+
+class RejillaHistograma:
+    """Rejilla regular donde se cuentan las visitas de los miembros."""
+
+    def __init__(self, lat_min, lat_max, lon_min, lon_max, resolucion=0.25):
+        self.lat_min, self.lon_min = lat_min, lon_min
+        self.resolucion = resolucion
+        self.nlat = int(np.ceil((lat_max - lat_min) / resolucion))
+        self.nlon = int(np.ceil((lon_max - lon_min) / resolucion))
+
+    @property
+    def celdas(self):
+        return self.nlat * self.nlon
+
+    @property
+    def lats(self):
+        return self.lat_min + self.resolucion * (np.arange(self.nlat) + 0.5)
+
+    @property
+    def lons(self):
+        return self.lon_min + self.resolucion * (np.arange(self.nlon) + 0.5)
+
+    def celda(self, lon, lat):
+        """Índice plano de celda para cada punto (-1 si cae fuera de la rejilla)."""
+        i = np.floor((lat - self.lat_min) / self.resolucion).astype("int64")
+        j = np.floor((lon - self.lon_min) / self.resolucion).astype("int64")
+        dentro = (i >= 0) & (i < self.nlat) & (j >= 0) & (j < self.nlon)
+        return np.where(dentro, i * self.nlon + j, -1)
+
+
+def pronostico_ensamble(modelo, lon0, lat0, pasos, residuos, rejilla, year=None, muestreador=None,
+                        miembros=1000, tam_lote=256, semilla=42, ids=None):
+    """Ocupación esperada por tiburón en ``rejilla`` durante los próximos ``pasos`` pasos.
+
+    Devuelve un ``xr.Dataset`` con ``probabilidad_por_tiburon`` (id_tiburon, lat, lon),
+    la fracción de (miembro, paso) que cayó en cada celda, y ``probabilidad_forrajeo``
+    (lat, lon), su promedio entre tiburones.
+    """
+    rng = np.random.default_rng(semilla)
+    residuos = np.asarray(residuos, dtype="float64")
+    lon0 = np.asarray(lon0, dtype="float64")
+    lat0 = np.asarray(lat0, dtype="float64")
+    n = len(lon0)
+    year = np.broadcast_to(np.asarray(year if year is not None else 0, dtype="int64"), lon0.shape)
+    conteos = np.zeros(n * rejilla.celdas, dtype="int64")
+
+    for inicio in range(0, miembros, tam_lote):
+        m = min(tam_lote, miembros - inicio)
+        # Estado del lote: n tiburones × m miembros, aplanado
+        tiburon = np.repeat(np.arange(n), m)
+        lon, lat, y = lon0[tiburon], lat0[tiburon], year[tiburon]
+        for _ in range(pasos):
+            lon, lat = paso_modelo(modelo, lon, lat, y, muestreador)
+            ruido = residuos[rng.integers(len(residuos), size=len(lon))]
+            lon, lat = _normalizar(lon + ruido[:, 0], lat + ruido[:, 1])
+            celda = rejilla.celda(lon, lat)
+            validos = celda >= 0
+            # Solo se tocan las celdas visitadas: O(tiburones × miembros) por paso, no O(rejilla)
+            visitadas, veces = np.unique(tiburon[validos] * rejilla.celdas + celda[validos], return_counts=True)
+            conteos[visitadas] += veces
+
+    probabilidad = (conteos / (miembros * pasos)).reshape(n, rejilla.nlat, rejilla.nlon).astype("float32")
+    ids = ids if ids is not None else [f"TIBURON_{i + 1}" for i in range(n)]
+    return xr.Dataset(
+        {
+            "probabilidad_por_tiburon": (("id_tiburon", "lat", "lon"), probabilidad),
+            "probabilidad_forrajeo": (("lat", "lon"), probabilidad.mean(axis=0)),
+        },
+        coords={"id_tiburon": np.asarray(ids, dtype=str), "lat": rejilla.lats, "lon": rejilla.lons},
+        attrs={"miembros": miembros, "pasos": pasos},
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    import pandas as pd
+
+    from almacen_ambiental import bbox_de_puntos, cargar_almacen
+    from artefacto_modelo import cargar_modelo
+    from muestreo_puntos import construir_muestreador
+
+    parser = argparse.ArgumentParser(description="Rásteres de probabilidad de forrajeo por Monte Carlo.")
+    parser.add_argument("posiciones", help="CSV con id_tiburon, lon, lat y year de la posición inicial")
+    parser.add_argument("--pasos", type=int, default=20)
+    parser.add_argument("--miembros", type=int, default=1000)
+    parser.add_argument("--tam-lote", type=int, default=256, help="Miembros simulados a la vez (acota la memoria)")
+    parser.add_argument("--resolucion", type=float, default=0.25, help="Grados por celda del ráster")
+    parser.add_argument("--margen", type=float, default=10.0, help="Grados alrededor de las posiciones iniciales")
+    parser.add_argument("--modelo", default="modelo_trayectoria_lineal.joblib", help="Pipeline .joblib o artefacto .tibm")
+    parser.add_argument("--residuos", default=RESIDUALS_FILENAME)
+    parser.add_argument("--almacen", default="datos_modelo")
+    parser.add_argument("--salida", default="probabilidad_forrajeo/probabilidad_forrajeo.nc")
+    args = parser.parse_args()
+
+    inicio = pd.read_csv(args.posiciones)
+    bbox = bbox_de_puntos(inicio["lat"], inicio["lon"], margen=args.margen)
+    try:
+        muestreador = construir_muestreador(cargar_almacen(args.almacen, años=inicio["year"].unique(), bbox=bbox),
+                                            ["Temp_Media", "Cloro_Media"])
+    except FileNotFoundError:
+        print("ADVERTENCIA: Almacén ambiental no encontrado. El ambiente se imputará en cada paso.")
+        muestreador = None
+
+    rejilla = RejillaHistograma(bbox[0], bbox[1], bbox[2], bbox[3], args.resolucion)
+    ds = pronostico_ensamble(cargar_modelo(args.modelo), inicio["lon"], inicio["lat"], args.pasos,
+                             np.load(args.residuos), rejilla, inicio["year"], muestreador,
+                             miembros=args.miembros, tam_lote=args.tam_lote, ids=inicio["id_tiburon"].astype(str))
+    os.makedirs(os.path.dirname(args.salida) or ".", exist_ok=True)
+    ds.to_netcdf(args.salida)
+    print(f"✅ Ráster de probabilidad ({rejilla.nlat} × {rejilla.nlon}) guardado en {args.salida}")
@@ -0,0 +1,270 @@
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from almacen_ambiental import bbox_de_puntos, cargar_almacen, firma_almacen
+from artefacto_modelo import ARTIFACT_FILENAME, escribir
+from cache_trayectorias import CacheTrayectorias, hash_archivo, remuestrear_con_cache
+from muestreo_puntos import construir_muestreador, unir_ambiente
+
+# Entrenamiento fuera de memoria del modelo lineal de trayectoria.
+# En vez de concatenar todas las marcas y llamar a ``fit`` una vez (modelo.py),
+# las marcas se procesan por lotes y cada lote unido al ambiente se escribe como
+# Parquet en disco. Luego el modelo se ajusta en dos pasadas por bloques de filas:
+#
+#   1. estadísticas: medias del imputador y medias/escalas del escalador
+#      (combinación de Chan de media y suma de cuadrados por bloque);
+#   2. ecuaciones normales: se acumulan ZᵀZ y ZᵀY con las features ya
+#      imputadas y estandarizadas, y al final se resuelve el sistema.
+#
+# El resultado es el mismo pipeline SimpleImputer -> StandardScaler -> LinearRegression
+# que entrena modelo.py, exportado directamente al artefacto compacto (.tibm).
+# Tras cada bloque se guarda un punto de control, así una ejecución interrumpida
+# continúa donde quedó. La memoria pico depende de ``filas_por_bloque``, no del total.
+#
+#   python entrenamiento_incremental.py --carpeta data_challenge/tiburon/
+
+FEATURES = ['lon', 'lat', 'Temp_Media', 'Cloro_Media']
+TARGETS = ['lon_futura', 'lat_futura']
+CARPETA_LOTES = "lotes_entrenamiento"
+ARCHIVO_CONTROL = "control_entrenamiento.npz"
+FRACCION_PRUEBA = 0.2
+
+
+# === LOTES DE FEATURES EN DISCO ===
+
+def _lote_de_features(rutas, ids, almacen, cache, paso, distancia_max_km):
+    """Trayectorias de un lote de marcas unidas al ambiente, con sus objetivos."""
+    df = remuestrear_con_cache(rutas, ids, cache=cache, paso=paso)
+    if df.empty:
+        return None
+    try:
+        df_env = cargar_almacen(almacen, años=df['year'].unique(), bbox=bbox_de_puntos(df['lat'], df['lon']))
+        df, _ = unir_ambiente(df, construir_muestreador(df_env, ['Temp_Media', 'Cloro_Media'], distancia_max_km))
+    except (FileNotFoundError, ValueError):
+        # Sin almacén o sin celdas en la zona del lote: ambiente NaN, como en modelo.py
+        df['Temp_Media'] = np.nan
+        df['Cloro_Media'] = np.nan
+    df['lon_futura'] = df.groupby('id_tiburon')['lon'].shift(-1)
+    df['lat_futura'] = df.groupby('id_tiburon')['lat'].shift(-1)
+    df = df.dropna(subset=TARGETS)
+    # Igual que train_test_split(shuffle=False): el último 20 % de cada lote es de prueba
+    df['prueba'] = np.arange(len(df)) >= len(df) - int(np.ceil(len(df) * FRACCION_PRUEBA))
+    return df[FEATURES + TARGETS + ['id_tiburon', 'year', 'prueba']]
+
+
+def firma_lote(rutas, ids, **parametros):
+    """Hash del contenido de las marcas de un lote, sus ids y los parámetros que lo generan (almacén incluido)."""
+    fuentes = [(shark_id, hash_archivo(r) if os.path.exists(r) else None) for shark_id, r in zip(ids, rutas)]
+    firma = json.dumps({"fuentes": fuentes, **parametros}, sort_keys=True)
+    return hashlib.sha256(firma.encode()).hexdigest()[:16]
+
+
+def escribir_lotes(rutas, ids=None, carpeta=CARPETA_LOTES, almacen="datos_modelo", marcas_por_lote=4,
+                   paso=6 * 3600, distancia_max_km=10.0, rehacer=False):
+    """Escribe un Parquet por cada ``marcas_por_lote`` marcas y devuelve la lista de archivos.
+
+    Cada lote se nombra con la firma de sus marcas de origen y del almacén ambiental
+    (``firma_lote``): un lote ya escrito solo se reutiliza si se generó con exactamente
+    esas marcas, ese almacén y esos parámetros, aunque un archivo nuevo desplace a los
+    demás de lote. Los lotes que ya no
+    corresponden a ninguna marca se eliminan. ``rehacer`` fuerza a escribirlos todos.
+    """
+    ids = ids or [f"TIBURON_{i + 1}" for i in range(len(rutas))]
+    os.makedirs(carpeta, exist_ok=True)
+    cache = CacheTrayectorias()
+    # Reconstruir el almacén cambia su firma e invalida todos los lotes
+    contenido_almacen = firma_almacen(almacen)
+    archivos = []
+    for k, inicio in enumerate(range(0, len(rutas), marcas_por_lote)):
+        firma = firma_lote(rutas[inicio:inicio + marcas_por_lote], ids[inicio:inicio + marcas_por_lote],
+                           almacen=os.path.abspath(almacen), contenido_almacen=contenido_almacen, paso=paso,
+                           distancia_max_km=distancia_max_km)
+        destino = os.path.join(carpeta, f"lote_{k:05d}_{firma}.parquet")
+        if rehacer or not os.path.exists(destino):
+            df = _lote_de_features(rutas[inicio:inicio + marcas_por_lote], ids[inicio:inicio + marcas_por_lote],
+                                   almacen, cache, paso, distancia_max_km)
+            if df is None or df.empty:
+                continue
+            df.to_parquet(destino + ".tmp", index=False)
+            os.replace(destino + ".tmp", destino)
+            print(f"--- Lote {k}: {len(df)} filas escritas en {destino} ---")
+        archivos.append(destino)
+    for viejo in glob.glob(os.path.join(carpeta, "lote_*.parquet")):
+        if viejo not in archivos:
+            os.remove(viejo)
+    return archivos
+
+
+def _bloques(archivos, filas_por_bloque):
+    """Recorre los lotes en bloques de a lo sumo ``filas_por_bloque`` filas: (índice, X, Y, prueba)."""
+    import pyarrow.parquet as pq
+
+    indice = 0
+    for archivo in archivos:
+        for rb in pq.ParquetFile(archivo).iter_batches(batch_size=filas_por_bloque,
+                                                       columns=FEATURES + TARGETS + ['prueba']):
+            df = rb.to_pandas()
+            yield (indice, df[FEATURES].to_numpy(dtype="float64"), df[TARGETS].to_numpy(dtype="float64"),
+                   df['prueba'].to_numpy(dtype=bool))
+            indice += 1
+
+
+# === PUNTOS DE CONTROL ===
+
+def _firma(archivos, filas_por_bloque):
+    # El nombre de cada lote incluye la firma de sus marcas de origen
+    estado = [(os.path.basename(a), os.path.getsize(a), os.path.getmtime(a)) for a in archivos]
+    return json.dumps({"archivos": estado, "filas_por_bloque": filas_por_bloque})
+
+
+def _guardar_control(ruta, firma, **estado):
+    with open(ruta + ".tmp", "wb") as f:
+        np.savez(f, firma=np.array(firma), **estado)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def _cargar_control(ruta, firma):
+    if not os.path.exists(ruta):
+        return None
+    with np.load(ruta) as control:
+        if str(control["firma"]) != firma:
+            print("ADVERTENCIA: Los lotes cambiaron desde el último punto de control. Se reinicia el entrenamiento.")
+            return None
+        return {k: control[k] for k in control.files if k != "firma"}
+
+
+# === ENTRENAMIENTO EN DOS PASADAS ===
+
+def entrenar(archivos, filas_por_bloque=200_000, ruta_control=ARCHIVO_CONTROL):
+    """Ajusta imputador, escalador y regresión lineal recorriendo los lotes por bloques.
+
+    Devuelve un diccionario con los parámetros del modelo y las métricas de prueba.
+    """
+    nf, nt = len(FEATURES), len(TARGETS)
+    firma = _firma(archivos, filas_por_bloque)
+    estado = _cargar_control(ruta_control, firma) or {
+        "etapa": np.array(1),
+        "siguiente": np.array(0),
+        "n": np.array(0.0),  # filas de entrenamiento
+        "cuenta": np.zeros(nf), "media": np.zeros(nf), "m2": np.zeros(nf),  # valores no nulos
+        "zz": np.zeros((nf + 1, nf + 1)), "zy": np.zeros((nf + 1, nt)),
+        "n_prueba": np.array(0.0), "sse": np.zeros(nt), "suma_y": np.zeros(nt), "suma_y2": np.zeros(nt),
+    }
+    if int(estado["siguiente"]):
+        print(f"--- Reanudando la pasada {int(estado['etapa'])} desde el bloque {int(estado['siguiente'])} ---")
+
+    def parametros():
+        medias = np.where(estado["cuenta"] > 0, estado["media"], np.nan)
+        # Tras imputar con la media, la varianza solo recibe aporte de los valores observados
+        varianza = estado["m2"] / max(float(estado["n"]), 1)
+        escalas = np.where(varianza > 0, np.sqrt(varianza), 1.0)  # igual que StandardScaler
+        return medias, escalas
+
+    if int(estado["etapa"]) == 1:
+        for i, X, _, prueba in _bloques(archivos, filas_por_bloque):
+            if i < int(estado["siguiente"]):
+                continue
+            X = X[~prueba]
+            validos = ~np.isnan(X)
+            nb = validos.sum(axis=0)
+            media_b = np.where(nb > 0, np.nansum(X, axis=0) / np.maximum(nb, 1), 0.0)
+            m2_b = np.nansum((X - media_b) ** 2, axis=0)
+            total = estado["cuenta"] + nb
+            delta = media_b - estado["media"]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                estado["media"] = np.where(total > 0, estado["media"] + delta * nb / total, 0.0)
+                estado["m2"] = estado["m2"] + m2_b + np.where(total > 0, delta ** 2 * estado["cuenta"] * nb / total, 0.0)
+            estado["cuenta"] = total
+            estado["n"] = estado["n"] + len(X)
+            estado["siguiente"] = np.array(i + 1)
+            _guardar_control(ruta_control, firma, **estado)
+        estado["etapa"], estado["siguiente"] = np.array(2), np.array(0)
+        _guardar_control(ruta_control, firma, **estado)
+        print(f"--- Pasada 1 completa: estadísticas de {int(estado['n'])} filas de entrenamiento ---")
+
+    if not float(estado["n"]):
+        raise ValueError("No hay filas de entrenamiento en los lotes.")
+    medias, escalas = parametros()
+    medias_imputador = np.nan_to_num(medias)
+
+    def estandarizar(X):
+        X = np.where(np.isnan(X), medias_imputador, X)
+        return np.column_stack([(X - medias_imputador) / escalas, np.ones(len(X))])
+
+    if int(estado["etapa"]) == 2:
+        for i, X, Y, prueba in _bloques(archivos, filas_por_bloque):
+            if i < int(estado["siguiente"]):
+                continue
+            Z = estandarizar(X[~prueba])
+            estado["zz"] = estado["zz"] + Z.T @ Z
+            estado["zy"] = estado["zy"] + Z.T @ Y[~prueba]
+            estado["siguiente"] = np.array(i + 1)
+            _guardar_control(ruta_control, firma, **estado)
+        estado["etapa"], estado["siguiente"] = np.array(3), np.array(0)
+        _guardar_control(ruta_control, firma, **estado)
+        print("--- Pasada 2 completa: ecuaciones normales acumuladas ---")
+
+    # Mínimos cuadrados de norma mínima, como LinearRegression ante columnas constantes
+    w = np.linalg.lstsq(estado["zz"], estado["zy"], rcond=None)[0]
+    coef, intercepto = w[:-1].T, w[-1]
+
+    if int(estado["etapa"]) == 3:
+        for i, X, Y, prueba in _bloques(archivos, filas_por_bloque):
+            if i < int(estado["siguiente"]) or not prueba.any():
+                continue
+            Yp = Y[prueba]
+            error = Yp - (estandarizar(X[prueba])[:, :-1] @ coef.T + intercepto)
+            estado["n_prueba"] = estado["n_prueba"] + len(Yp)
+            estado["sse"] = estado["sse"] + (error ** 2).sum(axis=0)
+            estado["suma_y"] = estado["suma_y"] + Yp.sum(axis=0)
+            estado["suma_y2"] = estado["suma_y2"] + (Yp ** 2).sum(axis=0)
+            estado["siguiente"] = np.array(i + 1)
+            _guardar_control(ruta_control, firma, **estado)
+        estado["etapa"], estado["siguiente"] = np.array(4), np.array(0)
+        _guardar_control(ruta_control, firma, **estado)
+
+    n_prueba = max(float(estado["n_prueba"]), 1)
+    ss_tot = estado["suma_y2"] - estado["suma_y"] ** 2 / n_prueba
+    return {
+        "medias_imputador": medias_imputador, "medias": medias_imputador, "escalas": escalas,
+        "coef": coef, "intercepto": intercepto,
+        "rmse": np.sqrt(estado["sse"] / n_prueba),
+        "r2": 1 - estado["sse"] / np.where(ss_tot > 0, ss_tot, np.nan),
+        "filas_entrenamiento": int(estado["n"]), "filas_prueba": int(estado["n_prueba"]),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Entrenamiento incremental (fuera de memoria) del modelo de trayectoria.")
+    parser.add_argument("--carpeta", default="data_challenge/tiburon/", help="Carpeta con los CSV de las marcas")
+    parser.add_argument("--almacen", default="datos_modelo")
+    parser.add_argument("--lotes", default=CARPETA_LOTES, help="Carpeta donde se escriben los lotes de features")
+    parser.add_argument("--marcas-por-lote", type=int, default=4)
+    parser.add_argument("--filas-por-bloque", type=int, default=200_000, help="Filas en memoria por actualización")
+    parser.add_argument("--rehacer-lotes", action="store_true", help="Vuelve a generar los lotes aunque existan")
+    parser.add_argument("--salida", default=ARTIFACT_FILENAME)
+    args = parser.parse_args()
+
+    # Mismo orden que la lista de modelo.py, para que los id_tiburon coincidan
+    rutas = sorted(glob.glob(os.path.join(args.carpeta, "*.csv")))
+    if not rutas:
+        print(f"ERROR FATAL: No hay archivos de tiburón en {args.carpeta}. Terminando.")
+        exit()
+
+    archivos = escribir_lotes(rutas, carpeta=args.lotes, almacen=args.almacen,
+                              marcas_por_lote=args.marcas_por_lote, rehacer=args.rehacer_lotes)
+    resultado = entrenar(archivos, args.filas_por_bloque)
+    escribir(args.salida, FEATURES, TARGETS, resultado["medias_imputador"], resultado["medias"],
+             resultado["escalas"], resultado["coef"], resultado["intercepto"])
+
+    print(f"\n--- Evaluación ({resultado['filas_entrenamiento']} filas de entrenamiento, "
+          f"{resultado['filas_prueba']} de prueba) ---")
+    for t, rmse, r2 in zip(TARGETS, resultado["rmse"], resultado["r2"]):
+        print(f"  {t}: RMSE {rmse:.4f} grados, R² {r2:.4f}")
+    print(f"\n✅ Artefacto compacto guardado como {args.salida}")
@@ -0,0 +1,231 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Validación cruzada agrupada por tiburón y comparación de regresores.
+# Cada pliegue deja fuera tiburones completos (nunca se parte una trayectoria
+# entre entrenamiento y prueba) y respeta el orden temporal: los tiburones se
+# ordenan por año de marcado, se dividen en bloques consecutivos y el pliegue k
+# entrena con los bloques 0..k y evalúa en el bloque k+1 (ventana creciente).
+#
+# Las matrices X/Y y los índices de los pliegues se publican una sola vez en
+# memoria compartida; cada proceso del pool las mapea sin copiarlas y solo recibe
+# (candidato, pliegue) como tarea.
+#
+#   python evaluacion_modelos.py --lotes lotes_entrenamiento --pliegues 4
+
+FEATURES = ['lon', 'lat', 'Temp_Media', 'Cloro_Media']
+TARGETS = ['lon_futura', 'lat_futura']
+
+
+# === CANDIDATOS ===
+# Se construyen dentro de cada proceso (no se serializan estimadores entre procesos).
+
+def _pipeline(regresor):
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    return Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='mean')),
+        ('scaler', StandardScaler()),
+        ('regressor', regresor),
+    ])
+
+
+def _lineal():
+    from sklearn.linear_model import LinearRegression
+    from sklearn.multioutput import MultiOutputRegressor
+    return _pipeline(MultiOutputRegressor(LinearRegression()))
+
+
+def _ridge():
+    from sklearn.linear_model import Ridge
+    return _pipeline(Ridge(alpha=1.0))
+
+
+def _knn():
+    from sklearn.neighbors import KNeighborsRegressor
+    return _pipeline(KNeighborsRegressor(n_neighbors=10, weights='distance'))
+
+
+def _gradient_boosting():
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.multioutput import MultiOutputRegressor
+    return _pipeline(MultiOutputRegressor(HistGradientBoostingRegressor(max_iter=200, random_state=42)))
+
+
+def _random_forest():
+    from sklearn.ensemble import RandomForestRegressor
+    # n_jobs=1: el paralelismo lo pone el pool, no cada bosque
+    return _pipeline(RandomForestRegressor(n_estimators=100, min_samples_leaf=5, n_jobs=1, random_state=42))
+
+
+CANDIDATOS = {
+    "lineal": _lineal,
+    "ridge": _ridge,
+    "knn": _knn,
+    "gradient_boosting": _gradient_boosting,
+    "random_forest": _random_forest,
+}
+
+
+# === PLIEGUES AGRUPADOS ===
+
+def pliegues_por_tiburon(grupos, orden, n_pliegues=4):
+    """Pliegues (entrenamiento, prueba) de ventana creciente sobre tiburones completos.
+
+    ``grupos`` es el id de tiburón de cada fila y ``orden`` una clave temporal por
+    fila (p. ej. el año); los tiburones se ordenan por el mínimo de su clave.
+    Devuelve una lista de pares de arreglos de índices de filas.
+    """
+    inicio = pd.Series(orden).groupby(np.asarray(grupos)).min()
+    tiburones = inicio.sort_values(kind='stable').index.to_numpy()
+    if len(tiburones) < n_pliegues + 1:
+        raise ValueError(f"Se necesitan al menos {n_pliegues + 1} tiburones para {n_pliegues} pliegues "
+                         f"(hay {len(tiburones)}).")
+    bloque = pd.Series(np.arange(len(tiburones)) * (n_pliegues + 1) // len(tiburones), index=tiburones)
+    bloque_fila = bloque.loc[np.asarray(grupos)].to_numpy()
+    return [(np.flatnonzero(bloque_fila <= k), np.flatnonzero(bloque_fila == k + 1)) for k in range(n_pliegues)]
+
+
+# === MEMORIA COMPARTIDA ===
+
+class ArreglosCompartidos:
+    """Publica arreglos NumPy en un único bloque de memoria compartida.
+
+    ``descriptor`` (nombre del bloque y forma/tipo/desplazamiento de cada arreglo)
+    es lo único que viaja a los procesos; ``abrir`` devuelve vistas sin copia.
+    """
+
+    def __init__(self, **arreglos):
+        arreglos = {k: np.ascontiguousarray(v) for k, v in arreglos.items()}
+        total = sum(a.nbytes for a in arreglos.values())
+        self.memoria = shared_memory.SharedMemory(create=True, size=max(total, 1))
+        self.descriptor = {"nombre": self.memoria.name, "arreglos": {}}
+        desplazamiento = 0
+        for k, a in arreglos.items():
+            np.ndarray(a.shape, a.dtype, buffer=self.memoria.buf, offset=desplazamiento)[...] = a
+            self.descriptor["arreglos"][k] = (a.shape, a.dtype.str, desplazamiento)
+            desplazamiento += a.nbytes
+
+    @staticmethod
+    def abrir(descriptor):
+        memoria = shared_memory.SharedMemory(name=descriptor["nombre"])
+        vistas = {k: np.ndarray(forma, np.dtype(tipo), buffer=memoria.buf, offset=d)
+                  for k, (forma, tipo, d) in descriptor["arreglos"].items()}
+        return memoria, vistas
+
+    def liberar(self):
+        self.memoria.close()
+        self.memoria.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.liberar()
+
+
+_memoria = None
+_vistas = None
+
+
+def _inicializar(descriptor):
+    global _memoria, _vistas
+    _memoria, _vistas = ArreglosCompartidos.abrir(descriptor)
+
+
+def _evaluar(candidato, pliegue):
+    """Ajusta ``candidato`` en el pliegue dado y mide error y tiempos (se ejecuta en el pool)."""
+    from sklearn.metrics import mean_squared_error, r2_score
+
+    X, Y = _vistas["X"], _vistas["Y"]
+    prueba = _vistas["indices"][_vistas["limites"][pliegue, 2]:_vistas["limites"][pliegue, 3]]
+    entrenamiento = _vistas["indices"][_vistas["limites"][pliegue, 0]:_vistas["limites"][pliegue, 1]]
+    modelo = CANDIDATOS[candidato]()
+
+    inicio = time.perf_counter()
+    modelo.fit(X[entrenamiento], Y[entrenamiento])
+    t_ajuste = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    prediccion = modelo.predict(X[prueba])
+    t_prediccion = time.perf_counter() - inicio
+
+    fila = {"candidato": candidato, "pliegue": pliegue,
+            "filas_entrenamiento": len(entrenamiento), "filas_prueba": len(prueba),
+            "ajuste_s": t_ajuste, "prediccion_s": t_prediccion,
+            "filas_por_s": len(prueba) / max(t_prediccion, 1e-9)}
+    for j, t in enumerate(TARGETS):
+        fila[f"rmse_{t}"] = float(np.sqrt(mean_squared_error(Y[prueba, j], prediccion[:, j])))
+        fila[f"r2_{t}"] = float(r2_score(Y[prueba, j], prediccion[:, j]))
+    return fila
+
+
+def evaluar_candidatos(df, candidatos=None, n_pliegues=4, procesos=None):
+    """Evalúa cada candidato en cada pliegue agrupado, en paralelo. Devuelve un DataFrame."""
+    candidatos = list(candidatos or CANDIDATOS)
+    pliegues = pliegues_por_tiburon(df['id_tiburon'].to_numpy(), df['year'].to_numpy(), n_pliegues)
+
+    # Los índices de todos los pliegues van concatenados; ``limites`` marca cada tramo
+    indices, limites, pos = [], [], 0
+    for entrenamiento, prueba in pliegues:
+        indices += [entrenamiento, prueba]
+        limites.append([pos, pos + len(entrenamiento), pos + len(entrenamiento), pos + len(entrenamiento) + len(prueba)])
+        pos += len(entrenamiento) + len(prueba)
+
+    with ArreglosCompartidos(X=df[FEATURES].to_numpy(dtype="float64"), Y=df[TARGETS].to_numpy(dtype="float64"),
+                             indices=np.concatenate(indices).astype("int64"),
+                             limites=np.asarray(limites, dtype="int64")) as compartidos:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar,
+                                 initargs=(compartidos.descriptor,)) as pool:
+            futuros = [pool.submit(_evaluar, c, k) for c in candidatos for k in range(len(pliegues))]
+            filas = []
+            for f in futuros:
+                fila = f.result()
+                print(f"  {fila['candidato']:<18} pliegue {fila['pliegue']}: "
+                      f"RMSE lon {fila['rmse_lon_futura']:.4f}, lat {fila['rmse_lat_futura']:.4f} "
+                      f"({fila['ajuste_s']:.2f} s ajuste)")
+                filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+def resumen(resultados):
+    """Media por candidato de las métricas de todos los pliegues, ordenada por RMSE."""
+    columnas = [c for c in resultados.columns if c.startswith(("rmse_", "r2_"))] + ["ajuste_s", "prediccion_s", "filas_por_s"]
+    tabla = resultados.groupby("candidato")[columnas].mean()
+    tabla["rmse_medio"] = tabla[[f"rmse_{t}" for t in TARGETS]].mean(axis=1)
+    return tabla.sort_values("rmse_medio")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validación cruzada agrupada por tiburón de varios regresores.")
+    parser.add_argument("--lotes", default="lotes_entrenamiento",
+                        help="Carpeta con los lotes de features de entrenamiento_incremental.py")
+    parser.add_argument("--pliegues", type=int, default=4)
+    parser.add_argument("--candidatos", nargs="+", choices=list(CANDIDATOS), default=list(CANDIDATOS))
+    parser.add_argument("--procesos", type=int, default=None)
+    parser.add_argument("--salida", default="evaluacion_modelos.csv")
+    args = parser.parse_args()
+
+    archivos = sorted(glob.glob(os.path.join(args.lotes, "*.parquet")))
+    if not archivos:
+        print(f"ERROR FATAL: No hay lotes de features en {args.lotes}. Ejecuta entrenamiento_incremental.py primero.")
+        exit()
+    df = pd.concat([pd.read_parquet(a, columns=FEATURES + TARGETS + ['id_tiburon', 'year']) for a in archivos],
+                   ignore_index=True)
+    print(f"--- {len(df)} filas de {df['id_tiburon'].nunique()} tiburones; "
+          f"{len(args.candidatos)} candidatos × {args.pliegues} pliegues ---")
+
+    resultados = evaluar_candidatos(df, args.candidatos, args.pliegues, args.procesos)
+    resultados.to_csv(args.salida, index=False)
+    print("\n--- Resumen por candidato (media de los pliegues) ---")
+    print(resumen(resultados).to_string(float_format=lambda v: f"{v:.4f}"))
+    print(f"\n✅ Resultados por pliegue guardados en {args.salida}")
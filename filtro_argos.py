@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+# Filtro de calidad de marcas Argos antes del remuestreo.
+# Cada marca tiene un peso según su clase de localización (``lc``): las clases con
+# peso 0 (Z: posición inválida) se descartan directamente y las demás se evalúan
+# con un filtro de velocidad tipo McConnell: para cada marca se calcula la media
+# cuadrática (RMS) de las velocidades de gran círculo hacia sus dos marcas
+# anteriores y sus dos siguientes del mismo tiburón. Un salto imposible también
+# eleva el RMS de sus vecinas, así que en cada pasada, de las marcas que superan
+# ``velocidad_max``, solo se descarta la de mayor puntuación de su vecindario y se
+# recalcula. La puntuación es el RMS multiplicado por ``2 - peso``: ante un
+# conflicto pierde la marca de clase menos precisa (A, B) antes que una buena.
+# Cada pasada trabaja con arreglos de todos los tiburones a la vez, sin bucles por
+# marca.
+
+VELOCIDAD_MAX_MS = 3.0  # m/s; por encima de lo que un tiburón sostiene entre dos marcas
+PESOS_CLASE = {"3": 1.0, "2": 1.0, "1": 1.0, "0": 0.75, "A": 0.5, "B": 0.25, "Z": 0.0}
+PESO_DESCONOCIDO = 0.5  # clases vacías o no reconocidas
+MAX_PASADAS = 50
+RADIO_TIERRA_M = 6_371_000.0
+
+
+def pesos_de_clase(lc, pesos=PESOS_CLASE):
+    """Peso de cada marca según su clase ``lc`` (acepta 3/"3"/3.0 y letras en cualquier caso)."""
+    # Se resuelve una vez por clase distinta (unas pocas), no por marca
+    codigos, clases = pd.factorize(np.asarray(lc, dtype=object))
+    pesos_clase = []
+    for clase in clases:
+        numero = pd.to_numeric(clase, errors="coerce")
+        clave = str(int(numero)) if pd.notna(numero) and float(numero).is_integer() else str(clase).strip().upper()
+        pesos_clase.append(pesos.get(clave, PESO_DESCONOCIDO))
+    # El código -1 (clase vacía) cae en la última posición: el peso desconocido
+    return np.asarray(pesos_clase + [PESO_DESCONOCIDO], dtype="float64")[codigos]
+
+
+def distancia_haversine(lat1, lon1, lat2, lon2):
+    """Distancia de gran círculo en metros (arreglos de grados)."""
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _vecinas(anterior, siguiente, posiciones):
+    """Índices de las vecinas -2, -1, +1, +2 de cada posición (-1 si no hay), saltando las descartadas."""
+    a1, s1 = anterior[posiciones], siguiente[posiciones]
+    a2 = np.where(a1 >= 0, anterior[np.maximum(a1, 0)], -1)
+    s2 = np.where(s1 >= 0, siguiente[np.maximum(s1, 0)], -1)
+    return a2, a1, s1, s2
+
+
+def _rms_velocidades(t, lat, lon, anterior, siguiente, posiciones):
+    """RMS de las velocidades de cada marca de ``posiciones`` hacia sus vecinas ±1 y ±2 (NaN si no tiene)."""
+    suma, cuenta = np.zeros(len(posiciones)), np.zeros(len(posiciones))
+    for vecina in _vecinas(anterior, siguiente, posiciones):
+        dt = np.abs(t[vecina] - t[posiciones])
+        # Pares con el mismo instante no dicen nada de la velocidad
+        valido = (vecina >= 0) & (dt > 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            distancia = distancia_haversine(lat[posiciones], lon[posiciones], lat[vecina], lon[vecina])
+            suma += np.where(valido, (distancia / dt) ** 2, 0.0)
+        cuenta += valido
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.sqrt(suma / cuenta)
+
+
+def _rms_inicial(grupo, t, lat, lon):
+    """Como ``_rms_velocidades`` para todas las marcas a la vez: cada par se calcula una sola vez."""
+    n = len(t)
+    suma, cuenta = np.zeros(n), np.zeros(n)
+    for k in (1, 2):
+        if n <= k:
+            break
+        dt = t[k:] - t[:-k]
+        valido = (grupo[k:] == grupo[:-k]) & (dt > 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            v2 = np.where(valido, (distancia_haversine(lat[:-k], lon[:-k], lat[k:], lon[k:]) / dt) ** 2, 0.0)
+        suma[:-k] += v2
+        suma[k:] += v2
+        cuenta[:-k] += valido
+        cuenta[k:] += valido
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.sqrt(suma / cuenta)
+
+
+def filtrar_marcas(df, velocidad_max=VELOCIDAD_MAX_MS, pesos=PESOS_CLASE, max_pasadas=MAX_PASADAS):
+    """Descarta marcas de clase inválida o con velocidades imposibles.
+
+    ``df`` tiene ``id_tiburon``, ``date``, ``lat``, ``lon`` y ``lc``. Devuelve
+    ``(marcas conservadas, reporte)``; el reporte tiene por tiburón las columnas
+    ``marcas``, ``por_clase``, ``por_velocidad`` y ``conservadas``.
+    """
+    if df.empty:
+        return df, pd.DataFrame(columns=["marcas", "por_clase", "por_velocidad", "conservadas"])
+    codigos, nombres = pd.factorize(df["id_tiburon"])
+    fechas = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[ns]")
+    orden = np.lexsort((fechas, codigos))
+    grupo = codigos[orden]
+    t = fechas[orden].astype("int64") / 1e9
+    lat = df["lat"].to_numpy(dtype="float64")[orden]
+    lon = df["lon"].to_numpy(dtype="float64")[orden]
+    peso = pesos_de_clase(df["lc"].to_numpy(dtype=object), pesos)[orden]
+    por_clase = (peso <= 0) | ~np.isfinite(lat) | ~np.isfinite(lon)
+
+    # Lista doblemente enlazada de marcas evaluables (sin enlaces entre tiburones distintos):
+    # al descartar una marca solo se reenlazan y recalculan sus vecinas
+    n = len(orden)
+    evaluable = np.flatnonzero(~por_clase)
+    anterior, siguiente = np.full(n, -1), np.full(n, -1)
+    mismo = grupo[evaluable[1:]] == grupo[evaluable[:-1]]
+    anterior[evaluable[1:][mismo]] = evaluable[:-1][mismo]
+    siguiente[evaluable[:-1][mismo]] = evaluable[1:][mismo]
+
+    rms = np.full(n, np.nan)
+    rms[evaluable] = _rms_inicial(grupo[evaluable], t[evaluable], lat[evaluable], lon[evaluable])
+    por_velocidad = np.zeros(n, dtype=bool)
+
+    def puntuacion(posiciones):
+        q = np.maximum(posiciones, 0)
+        sospechosa = (posiciones >= 0) & ~por_velocidad[q] & (rms[q] > velocidad_max)
+        return np.where(sospechosa, rms[q] * (2 - peso[q]), -np.inf)
+
+    candidatas = evaluable[rms[evaluable] > velocidad_max]
+    for _ in range(max_pasadas):
+        if not len(candidatas):
+            break
+        propia = puntuacion(candidatas)
+        a2, a1, s1, s2 = _vecinas(anterior, siguiente, candidatas)
+        # Con empate se descarta la anterior, así nunca caen dos vecinas en la misma pasada
+        maximo = ((propia > puntuacion(a2)) & (propia > puntuacion(a1))
+                  & (propia >= puntuacion(s1)) & (propia >= puntuacion(s2)))
+        descartadas = candidatas[maximo]
+        por_velocidad[descartadas] = True
+        a1, s1 = anterior[descartadas], siguiente[descartadas]
+        siguiente[a1[a1 >= 0]] = s1[a1 >= 0]
+        anterior[s1[s1 >= 0]] = a1[s1 >= 0]
+        # Solo cambia el RMS de las dos marcas vivas a cada lado de cada descartada
+        afectadas = np.concatenate(_vecinas(anterior, siguiente, a1[a1 >= 0]) + _vecinas(anterior, siguiente,
+                                                                                              s1[s1 >= 0]))
+        afectadas = np.unique(np.concatenate([afectadas, a1, s1]))
+        afectadas = afectadas[afectadas >= 0]
+        afectadas = afectadas[~por_velocidad[afectadas]]
+        rms[afectadas] = _rms_velocidades(t, lat, lon, anterior, siguiente, afectadas)
+        candidatas = np.union1d(candidatas[~maximo], afectadas)
+        candidatas = candidatas[rms[candidatas] > velocidad_max]
+
+    reporte = pd.DataFrame({"codigo": grupo, "por_clase": por_clase, "por_velocidad": por_velocidad})
+    reporte = reporte.groupby("codigo").agg(
+        marcas=("por_clase", "size"), por_clase=("por_clase", "sum"), por_velocidad=("por_velocidad", "sum"))
+    reporte.index = pd.Index(np.asarray(nombres)[reporte.index], name="id_tiburon")
+    reporte["conservadas"] = reporte["marcas"] - reporte["por_clase"] - reporte["por_velocidad"]
+    conservadas = np.sort(orden[~por_clase & ~por_velocidad])
+    return df.iloc[conservadas], reporte
+
+
+def resumen_reporte(reporte):
+    """Línea de resumen del reporte de ``filtrar_marcas``."""
+    total = int(reporte["marcas"].sum())
+    clase, velocidad = int(reporte["por_clase"].sum()), int(reporte["por_velocidad"].sum())
+    return (f"--- Filtro Argos: {clase + velocidad} de {total} marcas descartadas "
+            f"({clase} por clase, {velocidad} por velocidad) ---")
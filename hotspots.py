@@ -0,0 +1,196 @@
+import os
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from scipy.signal import fftconvolve
+
+from alineacion_rasters import Rejilla
+
+# Mapas de densidad (hotspots) de todos los puntos de trayectoria.
+# En vez de sumar un núcleo por cada punto (O(puntos × celdas)), los puntos se
+# cuentan por celda de una rejilla global (O(puntos)) y el conteo se suaviza con
+# un núcleo gaussiano mediante convolución FFT (O(celdas · log celdas)).
+# Los conteos se guardan de forma dispersa por (año, especie, celda) y son
+# aditivos: al llegar marcas nuevas solo se cuentan los puntos posteriores al
+# último ya visto de cada tiburón y se suman al estado guardado. Opcionalmente
+# cada punto pesa según su clase de profundidad (``Profundidad`` 0-3).
+#
+#   python hotspots.py data_challenge/tiburon --especies especies.csv --ponderar-profundidad
+
+ARCHIVO_HOTSPOTS = "hotspots.nc"
+ARCHIVO_ESTADO = "hotspots_estado.npz"
+RESOLUCION = 0.1  # grados por celda
+ANCHO_BANDA_KM = 50.0  # desviación estándar del núcleo gaussiano
+KM_POR_GRADO = 111.32
+ESPECIE_POR_DEFECTO = "sin_especie"
+# Más peso cerca de la superficie (3: < 250 m) que en la zona profunda (0: > 1500 m)
+PESOS_PROFUNDIDAD = {0: 0.25, 1: 0.5, 2: 0.75, 3: 1.0}
+
+
+def nucleo_gaussiano(sigma_lat, sigma_lon, n_sigmas=4):
+    """Núcleo gaussiano 2D normalizado (suma 1) con desviaciones en celdas."""
+    r_lat = max(int(np.ceil(n_sigmas * sigma_lat)), 1)
+    r_lon = max(int(np.ceil(n_sigmas * sigma_lon)), 1)
+    y = np.exp(-0.5 * (np.arange(-r_lat, r_lat + 1) / max(sigma_lat, 1e-6)) ** 2)
+    x = np.exp(-0.5 * (np.arange(-r_lon, r_lon + 1) / max(sigma_lon, 1e-6)) ** 2)
+    nucleo = np.outer(y, x)
+    return nucleo / nucleo.sum()
+
+
+class AcumuladorHotspots:
+    """Conteos dispersos por (año, especie, celda) que se actualizan por lotes de puntos."""
+
+    def __init__(self, resolucion=RESOLUCION, pesos_profundidad=None):
+        self.rejilla = Rejilla.global_(resolucion)
+        self.resolucion = resolucion
+        self.pesos_profundidad = pesos_profundidad
+        self.conteos = pd.DataFrame({"year": pd.Series(dtype="int64"), "especie": pd.Series(dtype="object"),
+                                     "i": pd.Series(dtype="int64"), "j": pd.Series(dtype="int64"),
+                                     "peso": pd.Series(dtype="float64")})
+        self.vistos = {}  # id_tiburon -> último instante ya contado (ns desde la época)
+
+    def _nuevos(self, df):
+        """Filas de ``df`` posteriores al último punto contado de su tiburón."""
+        if "id_tiburon" not in df or "fecha" not in df or not self.vistos:
+            return df
+        limite = df["id_tiburon"].map(self.vistos).fillna(np.iinfo("int64").min).to_numpy(dtype="int64")
+        return df[pd.to_datetime(df["fecha"]).to_numpy(dtype="datetime64[ns]").astype("int64") > limite]
+
+    def agregar(self, df, especies=None):
+        """Suma los puntos de ``df`` (lat, lon, year y opcionalmente especie, Profundidad, id_tiburon, fecha).
+
+        ``especies`` es un diccionario ``{id_tiburon: especie}`` para tablas sin columna
+        ``especie``. Devuelve el número de puntos nuevos contados.
+        """
+        df = self._nuevos(df)
+        if df.empty:
+            return 0
+        i = np.floor((90 - df["lat"].to_numpy(dtype="float64")) / self.resolucion).astype("int64")
+        j = np.floor((df["lon"].to_numpy(dtype="float64") + 180) / self.resolucion).astype("int64")
+        i = np.clip(i, 0, self.rejilla.nlat - 1)
+        j = np.mod(j, self.rejilla.nlon)
+        if "especie" in df:
+            especie = df["especie"].astype(str).to_numpy()
+        elif especies is not None and "id_tiburon" in df:
+            especie = df["id_tiburon"].map(especies).fillna(ESPECIE_POR_DEFECTO).astype(str).to_numpy()
+        else:
+            especie = np.full(len(df), ESPECIE_POR_DEFECTO, dtype=object)
+        peso = np.ones(len(df))
+        if self.pesos_profundidad and "Profundidad" in df:
+            peso = df["Profundidad"].map(self.pesos_profundidad).fillna(1.0).to_numpy(dtype="float64")
+
+        nuevos = pd.DataFrame({"year": df["year"].to_numpy(dtype="int64"), "especie": especie,
+                               "i": i, "j": j, "peso": peso})
+        self.conteos = (pd.concat([self.conteos, nuevos], ignore_index=True)
+                        .groupby(["year", "especie", "i", "j"], as_index=False, sort=False)["peso"].sum())
+        if "id_tiburon" in df and "fecha" in df:
+            ultimos = (pd.to_datetime(df["fecha"]).astype("datetime64[ns]").astype("int64")
+                       .groupby(df["id_tiburon"].to_numpy()).max())
+            for shark_id, t in ultimos.items():
+                self.vistos[shark_id] = max(int(t), self.vistos.get(shark_id, int(t)))
+        return len(df)
+
+    def densidades(self, ancho_banda_km=ANCHO_BANDA_KM):
+        """Dataset ``densidad`` (year, especie, lat, lon) suavizado, en puntos por celda.
+
+        La rejilla de salida cubre solo las celdas con puntos más el radio del núcleo.
+        El núcleo usa la escala de longitud de la latitud central de esa zona.
+        """
+        if self.conteos.empty:
+            raise ValueError("No hay puntos acumulados.")
+        i0, i1 = int(self.conteos["i"].min()), int(self.conteos["i"].max()) + 1
+        j0, j1 = int(self.conteos["j"].min()), int(self.conteos["j"].max()) + 1
+        lat_central = float(self.rejilla.lats[(i0 + i1) // 2])
+        sigma_lat = ancho_banda_km / KM_POR_GRADO / self.resolucion
+        sigma_lon = sigma_lat / max(np.cos(np.radians(lat_central)), 0.05)
+        nucleo = nucleo_gaussiano(sigma_lat, sigma_lon)
+        r_lat, r_lon = nucleo.shape[0] // 2, nucleo.shape[1] // 2
+        i0, i1 = max(i0 - r_lat, 0), min(i1 + r_lat, self.rejilla.nlat)
+        j0, j1 = max(j0 - r_lon, 0), min(j1 + r_lon, self.rejilla.nlon)
+
+        años = np.sort(self.conteos["year"].unique())
+        especies = sorted(self.conteos["especie"].unique())
+        densidad = np.zeros((len(años), len(especies), i1 - i0, j1 - j0), dtype="float32")
+        for (año, especie), grupo in self.conteos.groupby(["year", "especie"], sort=False):
+            a, e = int(np.searchsorted(años, año)), especies.index(especie)
+            celda = (grupo["i"].to_numpy() - i0) * (j1 - j0) + (grupo["j"].to_numpy() - j0)
+            plano = np.bincount(celda, grupo["peso"].to_numpy(), minlength=(i1 - i0) * (j1 - j0))
+            plano = plano.reshape(i1 - i0, j1 - j0)
+            densidad[a, e] = np.maximum(fftconvolve(plano, nucleo, mode="same"), 0)
+
+        return xr.Dataset(
+            {"densidad": (("year", "especie", "lat", "lon"), densidad)},
+            coords={"year": años, "especie": especies,
+                    "lat": self.rejilla.lats[i0:i1], "lon": self.rejilla.lons[j0:j1]},
+            attrs={"ancho_banda_km": ancho_banda_km, "resolucion": self.resolucion,
+                   "ponderado_profundidad": int(bool(self.pesos_profundidad))},
+        )
+
+    def guardar(self, ruta=ARCHIVO_ESTADO):
+        """Guarda conteos y marcas de agua por tiburón (para continuar con nuevas marcas)."""
+        temporal = ruta + ".tmp.npz"
+        np.savez(temporal, year=self.conteos["year"].to_numpy(), especie=self.conteos["especie"].to_numpy(dtype=str),
+                 i=self.conteos["i"].to_numpy(), j=self.conteos["j"].to_numpy(), peso=self.conteos["peso"].to_numpy(),
+                 vistos_id=np.array(list(self.vistos), dtype=str),
+                 vistos_t=np.array(list(self.vistos.values()), dtype="int64"),
+                 resolucion=self.resolucion,
+                 pesos=np.array([self.pesos_profundidad.get(k, 1.0) for k in range(4)]
+                                if self.pesos_profundidad else []))
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta=ARCHIVO_ESTADO):
+        with np.load(ruta) as estado:
+            pesos = dict(enumerate(estado["pesos"].tolist())) if len(estado["pesos"]) else None
+            acumulador = cls(float(estado["resolucion"]), pesos)
+            acumulador.conteos = pd.DataFrame({k: estado[k] for k in ("year", "i", "j", "peso")})
+            acumulador.conteos.insert(1, "especie", estado["especie"].astype(object))
+            acumulador.vistos = dict(zip(estado["vistos_id"].tolist(), estado["vistos_t"].tolist()))
+        return acumulador
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cache_trayectorias import remuestrear_con_cache
+
+    parser = argparse.ArgumentParser(description="Mapas de densidad de trayectorias por año y especie (KDE por FFT).")
+    parser.add_argument("carpeta_marcas", help="Carpeta con los CSV de marcas de los tiburones")
+    parser.add_argument("--especies", help="CSV con columnas archivo,especie (archivo sin extensión)")
+    parser.add_argument("--ponderar-profundidad", action="store_true",
+                        help="Pesar cada punto según su clase de profundidad (más peso cerca de la superficie)")
+    parser.add_argument("--resolucion", type=float, default=RESOLUCION)
+    parser.add_argument("--ancho-banda-km", type=float, default=ANCHO_BANDA_KM)
+    parser.add_argument("--estado", default=ARCHIVO_ESTADO, help="Conteos acumulados de ejecuciones anteriores")
+    parser.add_argument("--salida", default=ARCHIVO_HOTSPOTS)
+    args = parser.parse_args()
+
+    archivos = sorted(a for a in os.listdir(args.carpeta_marcas) if a.endswith(".csv"))
+    # El id es el nombre del archivo: así sigue siendo el mismo cuando se agregan tiburones nuevos
+    ids = [os.path.splitext(a)[0] for a in archivos]
+    especies = None
+    if args.especies:
+        especies = pd.read_csv(args.especies, dtype=str).set_index("archivo")["especie"].to_dict()
+
+    if os.path.exists(args.estado):
+        acumulador = AcumuladorHotspots.cargar(args.estado)
+        # Los conteos guardados solo se pueden sumar con la misma rejilla y los mismos pesos
+        if not np.isclose(acumulador.resolucion, args.resolucion):
+            raise ValueError(f"{args.estado} se acumuló con --resolucion {acumulador.resolucion}, no "
+                             f"{args.resolucion}; borra el estado o usa otro --estado.")
+        if bool(acumulador.pesos_profundidad) != args.ponderar_profundidad:
+            raise ValueError(f"{args.estado} se acumuló {'con' if acumulador.pesos_profundidad else 'sin'} "
+                             f"--ponderar-profundidad; borra el estado o usa otro --estado.")
+        print(f"--- Estado previo: {len(acumulador.conteos)} celdas, {len(acumulador.vistos)} tiburones ---")
+    else:
+        acumulador = AcumuladorHotspots(args.resolucion, PESOS_PROFUNDIDAD if args.ponderar_profundidad else None)
+
+    df = remuestrear_con_cache([os.path.join(args.carpeta_marcas, a) for a in archivos], ids)
+    nuevos = acumulador.agregar(df, especies)
+    acumulador.guardar(args.estado)
+    print(f"--- {nuevos} puntos nuevos de {len(df)} contados ---")
+
+    ds = acumulador.densidades(args.ancho_banda_km)
+    ds.to_netcdf(args.salida)
+    print(f"✅ Densidades {dict(ds['densidad'].sizes)} guardadas en {args.salida}")
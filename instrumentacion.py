@@ -0,0 +1,240 @@
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Telemetría por etapa para los scripts del pipeline.
+# Cada bloque ``with etapa("nombre") as r:`` emite al terminar una línea JSON con
+# el tiempo de pared, el pico de RSS durante la etapa, las filas de entrada/salida
+# y lo que se anote en ``r`` (p. ej. la tasa de acierto de una unión):
+#
+#   with etapa("union_ambiente", filas_entrada=len(df)) as r:
+#       df, tasa = unir_ambiente(df, muestreador)
+#       r.anotar(filas_salida=len(df), tasa_acierto=tasa)
+#
+# La telemetría está desactivada por defecto: sin ella ``etapa`` no arranca hilos ni
+# escribe nada, así que no encarece el arranque de los scripts. Se activa con
+# variables de entorno (no hace falta tocar el código):
+#   TIBURON_TELEMETRIA  "1" escribe en telemetria.jsonl, "-" en stderr y cualquier
+#                       otro valor es el archivo JSON lines de destino ("0" o sin
+#                       definir: desactivada)
+#   TIBURON_PERFIL      intervalo en ms del perfilador por muestreo (desactivado si no
+#                       se define). Añade a cada registro las funciones más frecuentes
+#                       y escribe las pilas colapsadas en perfil_<etapa>.txt
+#                       (formato de flamegraph.pl / speedscope).
+
+DESTINO_POR_DEFECTO = "telemetria.jsonl"
+INTERVALO_RSS = 0.02  # segundos entre lecturas de RSS durante una etapa
+FUNCIONES_PERFIL = 15  # funciones más muestreadas que se incluyen en el registro
+
+_EJECUCION = f"{int(time.time())}-{os.getpid()}"
+_lock = threading.Lock()
+
+
+def _memoria_windows():
+    """(RSS actual, pico de RSS) del proceso en MB con la API de Windows, o ``None``."""
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class _Contadores(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        contadores = _Contadores()
+        contadores.cb = ctypes.sizeof(contadores)
+        proceso = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(proceso, ctypes.byref(contadores), contadores.cb):
+            return None
+        return contadores.WorkingSetSize / 2**20, contadores.PeakWorkingSetSize / 2**20
+    except (ImportError, AttributeError, OSError):
+        return None
+
+
+def rss_actual_mb():
+    """RSS actual del proceso en MB (en sistemas sin /proc, el máximo histórico; ``None`` si no se puede medir)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is None:
+        memoria = _memoria_windows()
+        return memoria[0] if memoria else None
+    return rss_maximo_mb()
+
+
+def rss_maximo_mb():
+    """Máximo histórico de RSS del proceso en MB (``None`` si no se puede medir)."""
+    if resource is None:
+        memoria = _memoria_windows()
+        return memoria[1] if memoria else None
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if platform.system() == "Darwin" else rss / 2**10
+
+
+def destino_telemetria():
+    """Destino configurado en ``TIBURON_TELEMETRIA`` o ``None`` si la telemetría está desactivada."""
+    destino = os.environ.get("TIBURON_TELEMETRIA", "0")
+    if destino == "0" or not destino:
+        return None
+    return DESTINO_POR_DEFECTO if destino == "1" else destino
+
+
+def _emitir(registro):
+    destino = destino_telemetria()
+    if destino is None:
+        return
+    linea = json.dumps(registro, ensure_ascii=False, default=float) + "\n"
+    with _lock:
+        if destino == "-":
+            sys.stderr.write(linea)
+        else:
+            with open(destino, "a", encoding="utf-8") as f:
+                f.write(linea)
+
+
+class _MonitorRSS(threading.Thread):
+    """Lee el RSS periódicamente y guarda el máximo observado."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.pico = rss_actual_mb()
+        self._fin = threading.Event()
+
+    def _leer(self):
+        rss = rss_actual_mb()
+        if rss is not None:
+            self.pico = rss if self.pico is None else max(self.pico, rss)
+
+    def run(self):
+        while not self._fin.wait(INTERVALO_RSS):
+            self._leer()
+
+    def detener(self):
+        self._fin.set()
+        self.join()
+        self._leer()
+        return self.pico
+
+
+class PerfiladorMuestreo(threading.Thread):
+    """Perfilador por muestreo de un hilo: cuenta sus pilas cada ``intervalo`` segundos.
+
+    No instrumenta funciones, así que el costo depende solo del intervalo.
+    """
+
+    def __init__(self, hilo_id, intervalo=0.005):
+        super().__init__(daemon=True)
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self.muestras = 0
+        self._fin = threading.Event()
+
+    def run(self):
+        while not self._fin.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo_id)
+            if frame is None:
+                continue
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.pilas[tuple(reversed(pila))] += 1
+            self.muestras += 1
+
+    def detener(self):
+        self._fin.set()
+        self.join()
+
+    def funciones(self, n=FUNCIONES_PERFIL):
+        """Funciones con más muestras propias (hoja de la pila), con su fracción del total."""
+        propias = Counter()
+        for pila, cuenta in self.pilas.items():
+            propias[pila[-1]] += cuenta
+        total = max(self.muestras, 1)
+        return [{"funcion": f, "muestras": c, "fraccion": c / total} for f, c in propias.most_common(n)]
+
+    def guardar_colapsado(self, ruta):
+        """Escribe las pilas en formato colapsado ("a;b;c cuenta") para flamegraph/speedscope."""
+        with open(ruta, "w", encoding="utf-8") as f:
+            for pila, cuenta in self.pilas.most_common():
+                f.write(";".join(pila) + f" {cuenta}\n")
+
+
+class Registro:
+    """Datos de una etapa; ``anotar`` añade o reemplaza campos del registro final."""
+
+    def __init__(self, nombre, **datos):
+        self.datos = {"etapa": nombre, **datos}
+
+    def anotar(self, **datos):
+        self.datos.update(datos)
+
+
+@contextmanager
+def etapa(nombre, perfil=None, **datos):
+    """Mide la etapa ``nombre`` y emite su registro JSON al salir (también si falla).
+
+    ``perfil`` fuerza el perfilador (intervalo en ms) aunque no se haya definido
+    ``TIBURON_PERFIL``. Si la telemetría está desactivada y no hay perfilador, no mide nada.
+    """
+    registro = Registro(nombre, **datos)
+    intervalo_ms = perfil or os.environ.get("TIBURON_PERFIL")
+    if destino_telemetria() is None and not intervalo_ms:
+        yield registro
+        return
+    perfilador = None
+    if intervalo_ms:
+        perfilador = PerfiladorMuestreo(threading.get_ident(), float(intervalo_ms) / 1000)
+        perfilador.start()
+    monitor = _MonitorRSS()
+    monitor.start()
+    rss_inicio = monitor.pico
+    inicio = time.perf_counter()
+    error = None
+    try:
+        yield registro
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        segundos = time.perf_counter() - inicio
+        if perfilador is not None:
+            perfilador.detener()
+        pico = monitor.detener()
+        salida = {
+            "ejecucion": _EJECUCION,
+            "script": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **registro.datos,
+            "segundos": segundos,
+            "rss_inicio_mb": rss_inicio,
+            "rss_pico_mb": pico,
+            "rss_maximo_proceso_mb": rss_maximo_mb(),
+        }
+        filas = salida.get("filas_entrada", salida.get("filas_salida"))
+        if filas is not None and segundos > 0:
+            salida["filas_por_s"] = filas / segundos
+        if error is not None:
+            salida["error"] = error
+        if perfilador is not None:
+            salida["perfil_muestras"] = perfilador.muestras
+            salida["perfil"] = perfilador.funciones()
+            perfilador.guardar_colapsado(f"perfil_{nombre}.txt")
+        _emitir(salida)
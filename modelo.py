@@ -1,19 +1,28 @@
 import pandas as pd
 import numpy as np
-from scipy.interpolate import interp1d
-from pyproj import Transformer
 import os
 
+from almacen_ambiental import cargar_almacen, bbox_de_puntos
+from cubo_temporal import ARCHIVO_CUBO_TEMPORAL, ExtractorCubo
+from muestreo_puntos import construir_muestreador, unir_ambiente
+from rasgos_oceanograficos import ARCHIVO_RASGOS, RASGOS, muestreador_rasgos
+from cache_trayectorias import CacheTrayectorias, remuestrear_con_cache
+from filtro_argos import VELOCIDAD_MAX_MS
+from instrumentacion import etapa
+
 # --- Importaciones de Machine Learning ---
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LinearRegression 
+from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error, r2_score
 from sklearn.multioutput import MultiOutputRegressor
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder
-from sklearn.impute import SimpleImputer 
+from sklearn.impute import SimpleImputer
+
+# Las etapas se pueden importar (pipeline.py las encadena con caché); al ejecutar
+# ``python modelo.py`` se corren todas con la configuración de abajo.
 
 # =================================================================
 # === PARTE 1: PREPARACIÓN DEL DATAFRAME Y DEFINICIÓN DE OBJETIVOS ===
@@ -30,7 +39,7 @@ shark_files = [
     "160424_2015_141264pnas_atn.csv",
     "160424_2015_141268pnas_atn.csv",
     "160424_2015_141270pnas_atn.csv",
-    "160424_2016_106744pnas_atn.csv",       
+    "160424_2016_106744pnas_atn.csv",
     "160424_2016_106745pnas_atn.csv",
     "160424_2016_106746pnas_atn.csv",
     "160424_2016_106747pnas_atn.csv",
@@ -43,206 +52,250 @@ shark_files = [
     "160424_2016_165928pnas_atn.csv",
 ]
 
-COMBINED_FILE_PATH = "datos_modelo.csv" 
-final_trajectories = [] # Lista para almacenar el DataFrame interpolado de cada tiburón
+COMBINED_FILE_PATH = "datos_modelo" # Almacén Parquet generado por creacion_archivos.py
+CUBO_TEMPORAL = ARCHIVO_CUBO_TEMPORAL # Cubo (time, lat, lon) de creacion_archivos.py; si existe, se une por fecha
+PASO_SEGUNDOS = 6 * 3600 # Paso de la rejilla temporal de las trayectorias (6 h)
+
+CACHE_DIR = ".cache_trayectorias" # Caché de trayectorias ya interpoladas (por hash de archivo + parámetros)
+DISTANCIA_MAX_KM = 10.0 # Distancia máxima a la celda ambiental si el almacén no es una rejilla regular
+RASGOS_FILENAME = ARCHIVO_RASGOS # Capas de frentes y gradientes (rasgos_oceanograficos.py); se unen si existen
+USAR_RASGOS = False # True = entrenar también con los rasgos (la predicción debe entonces enviarlos)
+
+# Define la ruta para guardar el pipeline entrenado
+# La extensión .pkl (pickle) o .joblib es estándar
+MODEL_FILENAME = 'modelo_trayectoria_lineal.joblib'
+RESIDUALS_FILENAME = 'residuos_modelo.npy'
+
+features = ['lon', 'lat', 'Temp_Media', 'Cloro_Media'] + (RASGOS if USAR_RASGOS else [])
+targets = ['lon_futura', 'lat_futura']
+
+
+def cargar_trayectorias(rutas, ids=None, cache_dir=CACHE_DIR, paso=PASO_SEGUNDOS, velocidad_max=VELOCIDAD_MAX_MS):
+    """Remuestrea todas las marcas a la rejilla temporal, reutilizando la caché de trayectorias."""
+    # Todas las marcas se remuestrean juntas (un solo Transformer, conversión vectorizada
+    # de 'lc' e interpolación por lotes). Los archivos que no cambiaron desde la última
+    # ejecución se leen de la caché en vez de volver a interpolarse.
+    ids = ids or [f"TIBURON_{i+1}" for i in range(len(rutas))] # 🔑 IMPORTANTE: ID único por tiburón
+    with etapa("trayectorias", archivos=len(rutas)) as r:
+        df_traj_all = remuestrear_con_cache(rutas, ids, cache=CacheTrayectorias(cache_dir), paso=paso,
+                                             velocidad_max=velocidad_max)
+        r.anotar(filas_salida=len(df_traj_all))
+    return df_traj_all
 
-# Bucle para procesar cada archivo de tiburón
-for i, file_name in enumerate(shark_files):
-    shark_id = f"TIBURON_{i+1}"
-    shark_file_path = os.path.join(BASE_DIR, file_name)
+
+# =================================================================
+# === CARGA DE DATOS AMBIENTALES Y UNIÓN (MERGE) ===
+# =================================================================
+
+def unir_con_ambiente(df_traj_all, almacen=COMBINED_FILE_PATH, distancia_max_km=DISTANCIA_MAX_KM,
+                      cubo_temporal=CUBO_TEMPORAL):
+    """Añade Temp_Media y Cloro_Media a cada punto (NaN si el almacén no está disponible).
+
+    Si existe ``cubo_temporal`` se usa el valor vigente en la fecha de cada punto;
+    si no, la media anual del almacén.
+    """
+    if cubo_temporal and os.path.exists(cubo_temporal) and 'fecha' in df_traj_all:
+        # Cada punto de 6 h toma el compuesto de su fecha (no la media del año de la primera marca);
+        # solo se leen los trozos del cubo por los que pasan las trayectorias.
+        with etapa("union_ambiente", filas_entrada=len(df_traj_all), cubo=cubo_temporal) as r, \
+                ExtractorCubo(cubo_temporal, ['Temp_Media', 'Cloro_Media']) as extractor:
+            df_ml, tasa_acierto = unir_ambiente(df_traj_all, extractor)
+            r.anotar(filas_salida=len(df_ml), tasa_acierto=tasa_acierto, muestreador="ExtractorCubo",
+                     trozos_leidos=extractor.trozos_leidos)
+        print(f"--- Tasa de acierto ambiental (cubo temporal, {extractor.trozos_leidos} trozos leídos): "
+              f"{tasa_acierto:.1%} de {len(df_ml)} puntos ---")
+        return df_ml
 
     try:
-        df = pd.read_csv(shark_file_path)
-        df["date"] = pd.to_datetime(df["date"])
-        df = df.sort_values("date").reset_index(drop=True)
-
-        def parse_depth(x):
-            try:
-                return int(x)
-            except:
-                return np.nan
-        df["depth"] = df["lc"].apply(parse_depth)
-        
-        # Proyección e Interpolación (sin cambios)
-        transformer = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
-        df["x"], df["y"] = transformer.transform(df["lon"].values, df["lat"].values)
-        df["t_s"] = (df["date"] - df["date"].iloc[0]).dt.total_seconds()
-        uniq = df.drop_duplicates(subset="t_s")
-        t = uniq["t_s"].values
-        depth_filled = uniq["depth"].ffill().bfill()
-        fx = interp1d(t, uniq["x"], kind="linear", fill_value="extrapolate")
-        fy = interp1d(t, uniq["y"], kind="linear", fill_value="extrapolate")
-        fz = interp1d(t, depth_filled, kind="nearest", fill_value="extrapolate")
-        step = 6 * 3600
-        t_new = np.arange(t.min(), t.max(), step)
-        x_new, y_new, z_new = fx(t_new), fy(t_new), fz(t_new)
-        lon_new, lat_new = transformer.transform(x_new, y_new, direction="INVERSE")
-
-        df_traj = pd.DataFrame({
-            't_s': t_new,
-            'lon': lon_new,
-            'lat': lat_new,
-            'Profundidad': np.clip(np.round(z_new).astype(int), 0, 3),
-            'id_tiburon': shark_id # 🔑 IMPORTANTE: Asignar ID único
-        })
-        # Asignar el año de la primera entrada (asumiendo que el seguimiento es en un solo año)
-        df_traj['year'] = df["date"].iloc[0].year 
-        
-        final_trajectories.append(df_traj)
+        # Solo se leen las particiones (año, tesela) que cubren las trayectorias
+        df_combined = cargar_almacen(
+            almacen,
+            años=df_traj_all['year'].unique(),
+            bbox=bbox_de_puntos(df_traj_all['lat'], df_traj_all['lon'])
+        )
+        print(f"--- {len(df_combined)} celdas ambientales leídas del almacén ---")
+
+        # A. Muestrear las variables ambientales en cada punto de la trayectoria
+        # Si el almacén es una rejilla regular, la celda se obtiene por índice aritmético;
+        # si no, se busca el punto más cercano en un árbol KD (máx. distancia_max_km).
+        with etapa("union_ambiente", filas_entrada=len(df_traj_all), filas_ambiente=len(df_combined)) as r:
+            muestreador = construir_muestreador(df_combined, ['Temp_Media', 'Cloro_Media'], distancia_max_km)
+            df_ml, tasa_acierto = unir_ambiente(df_traj_all, muestreador)
+            r.anotar(filas_salida=len(df_ml), tasa_acierto=tasa_acierto, muestreador=type(muestreador).__name__)
+        print(f"--- Tasa de acierto ambiental ({type(muestreador).__name__}): {tasa_acierto:.1%} de {len(df_ml)} puntos ---")
+
+        print("--- Datos Ambientales unidos exitosamente a las trayectorias combinadas ---")
 
     except FileNotFoundError:
-        print(f"ADVERTENCIA: Archivo de tiburón {shark_id} ({file_name}) no encontrado. Saltando.")
-    except Exception as e:
-        print(f"ERROR procesando tiburón {shark_id}: {e}. Saltando.")
+        print(f"ERROR: Almacén ambiental no encontrado. Usando NaN para ambientales en todos los tiburones.")
+        df_ml = df_traj_all.copy()
+        df_ml['Temp_Media'] = np.nan
+        df_ml['Cloro_Media'] = np.nan
 
-# 1.2: Concatenar todos los DataFrames de trayectorias
-if not final_trajectories:
-    print("ERROR FATAL: No se pudo cargar ningún archivo de tiburón. Terminando.")
-    exit()
-    
-df_traj_all = pd.concat(final_trajectories, ignore_index=True)
-print(f"--- Trayectorias de {len(final_trajectories)} tiburones cargadas. Total de puntos: {len(df_traj_all)} ---")
+    except Exception as e:
+        print(f"ERROR al procesar el almacén ambiental durante la unión: {e}. Asignando NaN.")
+        df_ml = df_traj_all.copy()
+        df_ml['Temp_Media'] = np.nan
+        df_ml['Cloro_Media'] = np.nan
+    return df_ml
+
+
+def unir_rasgos(df_ml, rasgos=RASGOS_FILENAME):
+    """Añade a cada punto los rasgos de frentes (Grad_*, Anom_*, Desv_*) si existe su archivo."""
+    if not rasgos or not os.path.exists(rasgos):
+        if USAR_RASGOS:
+            print(f"ADVERTENCIA: No se encontró {rasgos}. Los rasgos quedan en NaN.")
+            df_ml = df_ml.assign(**{r: np.nan for r in RASGOS})
+        return df_ml
+    # Las capas ya están calculadas sobre toda la rejilla: aquí solo se muestrean
+    muestreador = muestreador_rasgos(rasgos)
+    with etapa("union_rasgos", filas_entrada=len(df_ml), rasgos=rasgos) as r:
+        df_ml, tasa_acierto = unir_ambiente(df_ml, muestreador)
+        r.anotar(filas_salida=len(df_ml), tasa_acierto=tasa_acierto)
+    if hasattr(muestreador, 'cerrar'):
+        muestreador.cerrar()
+    print(f"--- Rasgos de frentes unidos ({type(muestreador).__name__}): {tasa_acierto:.1%} de {len(df_ml)} puntos ---")
+    return df_ml
+
+
+def crear_objetivos(df_ml):
+    """Añade la siguiente posición de cada tiburón como objetivo y descarta filas sin ella."""
+    # B. CREAR OBJETIVOS (NUEVA POSICIÓN)
+    df_ml['lon_futura'] = df_ml.groupby('id_tiburon')['lon'].shift(-1) # <<-- SHIFT POR GRUPO
+    df_ml['lat_futura'] = df_ml.groupby('id_tiburon')['lat'].shift(-1) # <<-- SHIFT POR GRUPO
+
+    # C. Limpieza: Solo eliminamos filas donde falta el OBJETIVO (lon/lat futuras)
+    # Esto garantiza que el último punto de CADA tiburón se elimine correctamente.
+    df_ml.dropna(subset=['lon_futura', 'lat_futura'], inplace=True)
+    return df_ml
 
 
 # =================================================================
-# === CARGA DE DATOS AMBIENTALES Y UNIÓN (MERGE) ===
+# === PARTE 2: CREACIÓN DEL PIPELINE Y MODELADO (REGRESIÓN LINEAL) ===
 # =================================================================
 
-try:
-    df_combined = pd.read_csv(COMBINED_FILE_PATH, na_values=['NaN', 'NULL', ''])
-    
-    # CORRECCIÓN DE ETIQUETAS
-    df_combined = df_combined.rename(columns={
-        'latitude': 'lat',                
-        'longitude': 'lon',               
-        'concentracion_clorofila': 'Cloro_Media', 
-        'temperatura': 'Temp_Media',      
-        'year': 'year'                    
-    })
-    
-    # CLAVE PARA LA UNIÓN: Redondeo de coordenadas
-    DECIMAL_PRECISION = 2 
-    df_combined['lat'] = df_combined['lat'].round(DECIMAL_PRECISION)
-    df_combined['lon'] = df_combined['lon'].round(DECIMAL_PRECISION)
-    
-    # Crear claves redondeadas en los datos de la trayectoria
-    df_traj_all['lat_key'] = df_traj_all['lat'].round(DECIMAL_PRECISION)
-    df_traj_all['lon_key'] = df_traj_all['lon'].round(DECIMAL_PRECISION)
-
-    # A. Unir la trayectoria del tiburón con los datos ambientales
-    df_ml = pd.merge(
-        df_traj_all, # Usamos el DataFrame concatenado
-        df_combined[['lat', 'lon', 'year', 'Temp_Media', 'Cloro_Media']],
-        left_on=['lat_key', 'lon_key', 'year'],
-        right_on=['lat', 'lon', 'year'],
-        how='left',
-        suffixes=('_traj', '_env')
+def crear_pipeline():
+    """Pipeline imputación + estandarización + regresión lineal multi-salida."""
+    # 2.2: Preprocesamiento con ColumnTransformer
+    features_num = list(features)
+
+    numeric_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='mean')),
+        ('scaler', StandardScaler())
+    ])
+
+    # El ColumnTransformer ahora solo procesa las features numéricas
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', numeric_transformer, features_num),
+        ],
+        remainder='drop' # Elimina las columnas que no están en features_num (como Profundidad e id_tiburon)
     )
-    
-    # Limpieza
-    df_ml.drop(columns=['lat_key', 'lon_key', 'lat_env', 'lon_env'], inplace=True)
-    df_ml.rename(columns={'lat_traj': 'lat', 'lon_traj': 'lon'}, inplace=True)
-    
-    print("--- Datos Ambientales unidos exitosamente a las trayectorias combinadas ---")
-    
-except FileNotFoundError:
-    print(f"ERROR: Archivo CSV Combinado no encontrado. Usando NaN para ambientales en todos los tiburones.")
-    df_ml = df_traj_all.copy()
-    df_ml['Temp_Media'] = np.nan
-    df_ml['Cloro_Media'] = np.nan
-    
-except Exception as e:
-    print(f"ERROR al procesar el archivo CSV combinado durante la unión: {e}. Asignando NaN.")
-    df_ml = df_traj_all.copy()
-    df_ml['Temp_Media'] = np.nan
-    df_ml['Cloro_Media'] = np.nan
-    
-    
-# B. CREAR OBJETIVOS (NUEVA POSICIÓN)
-df_ml['lon_futura'] = df_ml.groupby('id_tiburon')['lon'].shift(-1) # <<-- SHIFT POR GRUPO
-df_ml['lat_futura'] = df_ml.groupby('id_tiburon')['lat'].shift(-1) # <<-- SHIFT POR GRUPO
-
-# C. Limpieza: Solo eliminamos filas donde falta el OBJETIVO (lon/lat futuras)
-# Esto garantiza que el último punto de CADA tiburón se elimine correctamente.
-df_ml.dropna(subset=['lon_futura', 'lat_futura'], inplace=True)
-
-print(f"\nTotal de puntos para entrenar de todos los tiburones: {len(df_ml)}")
+
+    # 2.3: Creación del Pipeline
+    return Pipeline(steps=[
+        ('preprocessor', preprocessor),
+        ('regressor', MultiOutputRegressor(LinearRegression()))
+    ])
+
 
 # =================================================================
-# === PARTE 2: CREACIÓN DEL PIPELINE Y MODELADO (REGRESIÓN LINEAL) ===
+# === PARTE 3: ENTRENAMIENTO, PREDICCIÓN Y EVALUACIÓN ===
 # =================================================================
 
-# 2.1: Definición de Features y Target
-features = ['lon', 'lat', 'Temp_Media', 'Cloro_Media']
-targets = ['lon_futura', 'lat_futura']
+def entrenar_y_evaluar(df_ml):
+    """Entrena el pipeline y lo evalúa en el 20 % final.
 
-X = df_ml[features]
-Y = df_ml[targets]
+    Devuelve (pipeline, métricas, X_test, residuos de prueba).
+    """
+    # 2.1: Definición de Features y Target
+    X = df_ml[features]
+    Y = df_ml[targets]
 
-# Nota: Mantener shuffle=False y random_state=42 para reproducibilidad
-X_train, X_test, Y_train, Y_test = train_test_split(X, Y, test_size=0.2, shuffle=False, random_state=42)
+    # Nota: Mantener shuffle=False y random_state=42 para reproducibilidad
+    X_train, X_test, Y_train, Y_test = train_test_split(X, Y, test_size=0.2, shuffle=False, random_state=42)
 
-# 2.2: Preprocesamiento con ColumnTransformer
-features_num = ['lon', 'lat', 'Temp_Media', 'Cloro_Media']
+    model_pipeline = crear_pipeline()
+    print("\n--- Pipeline Configurado para Múltiples Tiburones (Regresión Lineal) ---")
 
-numeric_transformer = Pipeline(steps=[
-    ('imputer', SimpleImputer(strategy='mean')), 
-    ('scaler', StandardScaler())
-])
+    print("\n--- Iniciando Entrenamiento del Modelo ---")
+    with etapa("entrenamiento", filas_entrada=len(X_train)):
+        model_pipeline.fit(X_train, Y_train)
+    print("--- Entrenamiento Completo ---")
 
-# El ColumnTransformer ahora solo procesa las features numéricas
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('num', numeric_transformer, features_num), 
-    ],
-    remainder='drop' # Elimina las columnas que no están en features_num (como Profundidad e id_tiburon)
-)
+    # Predicción de la NUEVA POSICIÓN
+    with etapa("evaluacion", filas_entrada=len(X_test)) as r:
+        pos_pred = model_pipeline.predict(X_test)
+        pos_pred = pd.DataFrame(pos_pred, columns=targets, index=Y_test.index)
 
-# 2.3: Creación del Pipeline
-model_pipeline = Pipeline(steps=[
-    ('preprocessor', preprocessor),
-    ('regressor', MultiOutputRegressor(LinearRegression()))
-])
+        # 3.1: Medición de Métricas
+        metricas = {
+            "rmse_lon": float(np.sqrt(mean_squared_error(Y_test['lon_futura'], pos_pred['lon_futura']))),
+            "r2_lon": float(r2_score(Y_test['lon_futura'], pos_pred['lon_futura'])),
+            "rmse_lat": float(np.sqrt(mean_squared_error(Y_test['lat_futura'], pos_pred['lat_futura']))),
+            "r2_lat": float(r2_score(Y_test['lat_futura'], pos_pred['lat_futura'])),
+        }
+        r.anotar(**metricas)
 
-print("\n--- Pipeline Configurado para Múltiples Tiburones (Regresión Lineal) ---")
+    print("\n--- Evaluación de Métricas de Precisión (Múltiples Tiburones) ---")
+    print(r"Predicción de Longitud Futura ($\text{lon}_{futura}$):")
+    print(f"  RMSE (Error de Posición): {metricas['rmse_lon']:.4f} grados")
+    print(f"  R² (Varianza Explicada): {metricas['r2_lon']:.4f}")
 
-# =================================================================
-# === PARTE 3: ENTRENAMIENTO, PREDICCIÓN Y EVALUACIÓN ===
-# =================================================================
+    print(r"\nPredicción de Latitud Futura ($\text{lat}_{futura}$):")
+    print(f"  RMSE (Error de Posición): {metricas['rmse_lat']:.4f} grados")
+    print(f"  R² (Varianza Explicada): {metricas['r2_lat']:.4f}")
 
-print("\n--- Iniciando Entrenamiento del Modelo ---")
-model_pipeline.fit(X_train, Y_train)
-print("--- Entrenamiento Completo ---")
+    # Residuos (observado - predicho) del conjunto de prueba: el pronóstico por
+    # conjuntos (ensamble.py) los sortea para perturbar cada paso de los miembros.
+    residuos = (Y_test.values - pos_pred.values).astype('float32')
+    return model_pipeline, metricas, X_test, residuos
 
-# Predicción de la NUEVA POSICIÓN
-pos_pred = model_pipeline.predict(X_test)
-pos_pred = pd.DataFrame(pos_pred, columns=targets, index=Y_test.index)
 
-# 3.1: Medición de Métricas
-rmse_lon = np.sqrt(mean_squared_error(Y_test['lon_futura'], pos_pred['lon_futura']))
-r2_lon = r2_score(Y_test['lon_futura'], pos_pred['lon_futura'])
-rmse_lat = np.sqrt(mean_squared_error(Y_test['lat_futura'], pos_pred['lat_futura']))
-r2_lat = r2_score(Y_test['lat_futura'], pos_pred['lat_futura'])
+def guardar_modelo(model_pipeline, X_test, residuos, model_filename=MODEL_FILENAME,
+                   artifact_filename=None, residuals_filename=RESIDUALS_FILENAME):
+    """Guarda el pipeline (joblib), el artefacto compacto verificado y los residuos de prueba."""
+    import joblib
 
-print("\n--- Evaluación de Métricas de Precisión (Múltiples Tiburones) ---")
-print(r"Predicción de Longitud Futura ($\text{lon}_{futura}$):")
-print(f"  RMSE (Error de Posición): {rmse_lon:.4f} grados")
-print(f"  R² (Varianza Explicada): {r2_lon:.4f}")
+    from artefacto_modelo import ARTIFACT_FILENAME, ModeloCompacto, exportar, verificar
 
-print(r"\nPredicción de Latitud Futura ($\text{lat}_{futura}$):")
-print(f"  RMSE (Error de Posición): {rmse_lat:.4f} grados")
-print(f"  R² (Varianza Explicada): {r2_lat:.4f}")
+    artifact_filename = artifact_filename or ARTIFACT_FILENAME
 
-import joblib
-import os
+    # Guardar el pipeline completo (preprocesador + modelo)
+    try:
+        joblib.dump(model_pipeline, model_filename)
+        print(f"\n✅ Modelo y Pipeline guardados exitosamente como {model_filename}")
+    except Exception as e:
+        print(f"\n❌ ERROR al guardar el modelo: {e}")
 
-# Define la ruta para guardar el pipeline entrenado
-# La extensión .pkl (pickle) o .joblib es estándar
-MODEL_FILENAME = 'modelo_trayectoria_lineal.joblib'
+    # Artefacto compacto (sin sklearn) para que prediccion.py arranque en milisegundos
+    try:
+        with etapa("exportacion", salida=artifact_filename) as r:
+            exportar(model_pipeline, artifact_filename, targets)
+            coincide, diferencia = verificar(model_pipeline, ModeloCompacto(artifact_filename), X_test)
+            r.anotar(diferencia_max=diferencia, coincide=bool(coincide))
+        estado = "✅" if coincide else "❌"
+        print(f"{estado} Artefacto compacto guardado como {artifact_filename} (diferencia máx. vs sklearn: {diferencia:.2e})")
+    except Exception as e:
+        print(f"\n❌ ERROR al exportar el artefacto compacto: {e}")
+
+    np.save(residuals_filename, residuos)
+    print(f"✅ Residuos de prueba guardados en {residuals_filename}")
+
+
+if __name__ == "__main__":
+    df_traj_all = cargar_trayectorias([os.path.join(BASE_DIR, file_name) for file_name in shark_files])
+
+    # 1.2: Verificar que haya trayectorias
+    if df_traj_all.empty:
+        print("ERROR FATAL: No se pudo cargar ningún archivo de tiburón. Terminando.")
+        exit()
+
+    n_tiburones = df_traj_all['id_tiburon'].nunique()
+    print(f"--- Trayectorias de {n_tiburones} tiburones cargadas. Total de puntos: {len(df_traj_all)} ---")
+
+    df_ml = crear_objetivos(unir_rasgos(unir_con_ambiente(df_traj_all)))
+    print(f"\nTotal de puntos para entrenar de todos los tiburones: {len(df_ml)}")
 
-# Guardar el pipeline completo (preprocesador + modelo)
-try:
-    joblib.dump(model_pipeline, MODEL_FILENAME)
-    print(f"\n✅ Modelo y Pipeline guardados exitosamente como {MODEL_FILENAME}")
-except Exception as e:
-    print(f"\n❌ ERROR al guardar el modelo: {e}")
\ No newline at end of file
+    model_pipeline, metricas, X_test, residuos = entrenar_y_evaluar(df_ml)
+    guardar_modelo(model_pipeline, X_test, residuos)
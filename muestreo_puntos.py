@@ -0,0 +1,159 @@
+import numpy as np
+
+# Muestreo vectorizado de variables ambientales en puntos de trayectoria.
+# - Rejilla regular: el índice de celda se calcula aritméticamente, sin uniones.
+# - Puntos irregulares: árbol KD por año con distancia máxima de búsqueda.
+# Ambos muestrean millones de puntos en una sola llamada y devuelven qué
+# puntos encontraron dato (``aciertos``) para poder reportar la tasa de acierto.
+
+RADIO_TIERRA_KM = 6371.0
+
+
+class MuestreadorRejilla:
+    """Muestrea capas (year, lat, lon) definidas sobre una rejilla regular.
+
+    ``capas`` es un diccionario ``{variable: arreglo (n_años, nlat, nlon)}``.
+    """
+
+    columna_tiempo = "year"
+
+    def __init__(self, lats, lons, años, capas):
+        lats, lons = np.asarray(lats, dtype="float64"), np.asarray(lons, dtype="float64")
+        self.lat0, self.nlat = lats[0], len(lats)
+        self.lon0, self.nlon = lons[0], len(lons)
+        self.dlat = (lats[-1] - lats[0]) / (len(lats) - 1) if len(lats) > 1 else 1.0
+        self.dlon = (lons[-1] - lons[0]) / (len(lons) - 1) if len(lons) > 1 else 1.0
+        self.años = np.asarray(años, dtype="int64")
+        self.capas = capas
+
+    @classmethod
+    def desde_cubo(cls, cubo, variables=None):
+        """Crea el muestreador a partir de un cubo xarray (year, lat, lon)."""
+        variables = variables or list(cubo.data_vars)
+        capas = {v: cubo[v].transpose("year", "lat", "lon").values for v in variables}
+        return cls(cubo["lat"].values, cubo["lon"].values, cubo["year"].values, capas)
+
+    @classmethod
+    def desde_tabla(cls, df, variables):
+        """Reconstruye la rejilla a partir de una tabla de celdas (lat, lon, year, variables...).
+
+        Lanza ``ValueError`` si las coordenadas no forman una rejilla regular.
+        """
+        lat = df["lat"].to_numpy(dtype="float64")
+        lon = df["lon"].to_numpy(dtype="float64")
+        lats, i = _ejes_regulares(lat)
+        lons, j = _ejes_regulares(lon)
+        años, k = np.unique(df["year"].to_numpy(dtype="int64"), return_inverse=True)
+        capas = {}
+        for v in variables:
+            capa = np.full((len(años), len(lats), len(lons)), np.nan, dtype="float32")
+            capa[k, i, j] = df[v].to_numpy(dtype="float32")
+            capas[v] = capa
+        return cls(lats, lons, años, capas)
+
+    def indices(self, lat, lon, year):
+        """Índices (año, fila, columna) de cada punto y máscara de puntos dentro de la rejilla."""
+        i = np.rint((np.asarray(lat, dtype="float64") - self.lat0) / self.dlat).astype("int64")
+        j = np.rint((np.asarray(lon, dtype="float64") - self.lon0) / self.dlon).astype("int64")
+        year = np.asarray(year, dtype="int64")
+        k = np.clip(np.searchsorted(self.años, year), 0, len(self.años) - 1)
+        dentro = (i >= 0) & (i < self.nlat) & (j >= 0) & (j < self.nlon) & (self.años[k] == year)
+        return k, np.clip(i, 0, self.nlat - 1), np.clip(j, 0, self.nlon - 1), dentro
+
+    def muestrear(self, lat, lon, year):
+        """Devuelve ``({variable: valores}, aciertos)`` para todos los puntos a la vez."""
+        k, i, j, dentro = self.indices(lat, lon, year)
+        valores = {}
+        aciertos = np.zeros(len(dentro), dtype=bool)
+        for v, capa in self.capas.items():
+            muestra = capa[k, i, j].astype("float64")
+            muestra[~dentro] = np.nan
+            valores[v] = muestra
+            aciertos |= np.isfinite(muestra)
+        return valores, aciertos
+
+
+class MuestreadorPuntos:
+    """Muestrea puntos irregulares con un árbol KD por año y una distancia máxima en km."""
+
+    columna_tiempo = "year"
+
+    def __init__(self, df, variables, distancia_max_km=10.0):
+        from scipy.spatial import cKDTree
+
+        # Se trabaja en coordenadas cartesianas sobre la esfera unitaria, así la
+        # distancia de cuerda es monótona con la distancia de gran círculo.
+        self.cuerda_max = 2 * np.sin(distancia_max_km / RADIO_TIERRA_KM / 2)
+        self.variables = variables
+        self.arboles = {}
+        for año, grupo in df.groupby("year"):
+            xyz = _a_cartesianas(grupo["lat"].to_numpy(), grupo["lon"].to_numpy())
+            valores = {v: grupo[v].to_numpy(dtype="float64") for v in variables}
+            self.arboles[int(año)] = (cKDTree(xyz), valores)
+
+    def muestrear(self, lat, lon, year):
+        """Devuelve ``({variable: valores}, aciertos)`` para todos los puntos a la vez."""
+        lat, lon, year = np.asarray(lat), np.asarray(lon), np.asarray(year, dtype="int64")
+        valores = {v: np.full(len(lat), np.nan) for v in self.variables}
+        aciertos = np.zeros(len(lat), dtype=bool)
+        for año, (arbol, valores_año) in self.arboles.items():
+            sel = np.flatnonzero(year == año)
+            if not len(sel):
+                continue
+            dist, idx = arbol.query(_a_cartesianas(lat[sel], lon[sel]), distance_upper_bound=self.cuerda_max)
+            encontrado = np.isfinite(dist)
+            sel, idx = sel[encontrado], idx[encontrado]
+            for v in self.variables:
+                valores[v][sel] = valores_año[v][idx]
+                aciertos[sel] |= np.isfinite(valores_año[v][idx])
+        return valores, aciertos
+
+
+def _a_cartesianas(lat, lon):
+    lat, lon = np.radians(np.asarray(lat, dtype="float64")), np.radians(np.asarray(lon, dtype="float64"))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def _ejes_regulares(valores, tolerancia=1e-3):
+    """Eje regular que contiene todos los ``valores`` y el índice de cada uno en él."""
+    unicos = np.unique(valores)
+    if not len(unicos):
+        raise ValueError("No hay coordenadas con las que construir la rejilla.")
+    if len(unicos) == 1:
+        return unicos, np.zeros(len(valores), dtype="int64")
+    # El paso se ajusta al rango completo para no acumular el error de coordenadas float32
+    extension = unicos[-1] - unicos[0]
+    paso = extension / np.rint(extension / np.diff(unicos).min())
+    posicion = (valores - unicos[0]) / paso
+    indice = np.rint(posicion).astype("int64")
+    if np.abs(posicion - indice).max() > tolerancia or indice.max() + 1 > 10 * len(unicos):
+        raise ValueError("Las coordenadas no forman una rejilla regular.")
+    return unicos[0] + paso * np.arange(indice.max() + 1), indice
+
+
+def construir_muestreador(df, variables, distancia_max_km=10.0):
+    """Muestreador por índice si la tabla es una rejilla regular; si no, árbol KD.
+
+    Lanza ``ValueError`` si la tabla no tiene celdas.
+    """
+    if df.empty:
+        raise ValueError("La tabla ambiental está vacía: no hay celdas que muestrear.")
+    try:
+        return MuestreadorRejilla.desde_tabla(df, variables)
+    except ValueError:
+        return MuestreadorPuntos(df, variables, distancia_max_km)
+
+
+def unir_ambiente(df_traj, muestreador):
+    """Añade las variables ambientales a ``df_traj`` y devuelve la tasa de acierto.
+
+    El tiempo de cada punto se toma de ``muestreador.columna_tiempo`` (``year`` para
+    los muestreadores anuales, ``fecha`` para ``cubo_temporal.ExtractorCubo``).
+    """
+    valores, aciertos = muestreador.muestrear(df_traj["lat"].to_numpy(), df_traj["lon"].to_numpy(),
+                                              df_traj[muestreador.columna_tiempo].to_numpy())
+    df = df_traj.copy()
+    for v, muestra in valores.items():
+        df[v] = muestra
+    return df, float(aciertos.mean()) if len(aciertos) else 0.0
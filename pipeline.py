@@ -0,0 +1,334 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+
+from instrumentacion import etapa
+
+# Ejecutor del pipeline completo como un grafo de etapas con caché:
+#
+#   convertir (opcional)     alinear ──► rasgos ──┐
+#                            interpolar ───────────┴─► unir ─► entrenar ─► exportar
+#
+# Cada etapa escribe sus artefactos en ``<trabajo>/<etapa>/<clave>/``, donde la
+# clave es el hash de sus parámetros, de sus archivos de entrada, del código de
+# los módulos que usa y de las claves de las etapas de las que depende. Si la
+# clave no cambió y sus artefactos siguen ahí, la etapa se salta; si cambió,
+# se vuelve a ejecutar ella y todo lo que depende de ella.
+#
+# La configuración se lee de uno o más JSON (los últimos sobrescriben a los primeros),
+# en lugar de editar las constantes de cada script:
+#
+#   python pipeline.py configuracion_ejemplo.json
+#   python pipeline.py configuracion_ejemplo.json local.json --hasta unir
+#   python pipeline.py configuracion_ejemplo.json --forzar entrenar
+
+CONFIGURACION_POR_DEFECTO = {
+    "trabajo": ".pipeline",
+    "carpeta_clorofila": None,
+    "carpeta_temperatura": None,
+    "convertir": False,  # la alineación lee los .nc directamente; la conversión a tabla es opcional
+    "formato_conversion": "parquet",
+    "procesos": None,
+    "resolucion": 1 / 12,
+    "metodo": "auto",
+    "carpeta_marcas": "data_challenge/tiburon/",
+    "archivos_marcas": None,  # None = todos los CSV de la carpeta, en orden alfabético
+    "paso_segundos": 6 * 3600,
+    "velocidad_max_ms": 3.0,  # filtro de marcas Argos (None = sin filtro)
+    "cache_trayectorias": ".cache_trayectorias",
+    "distancia_max_km": 10.0,
+    # Dónde se publican los artefactos finales (None = solo en la carpeta de trabajo)
+    "archivo_modelo": "modelo_trayectoria_lineal.joblib",
+    "archivo_artefacto": "modelo_trayectoria_lineal.tibm",
+    "archivo_residuos": "residuos_modelo.npy",
+    "cubo_temporal": True,  # además del cubo anual, un cubo (time, lat, lon) para unir por fecha
+    "ventana_rasgos": 5,  # celdas por lado del vecindario de los rasgos de frentes
+    "archivo_cubo": None,
+    "archivo_cubo_temporal": None,
+    "archivo_rasgos": None,
+    "almacen": None,
+}
+
+
+def cargar_configuracion(rutas):
+    """Configuración por defecto actualizada con cada JSON de ``rutas``, en orden."""
+    cfg = dict(CONFIGURACION_POR_DEFECTO)
+    for ruta in rutas:
+        with open(ruta, encoding="utf-8") as f:
+            extra = json.load(f)
+        desconocidas = set(extra) - set(CONFIGURACION_POR_DEFECTO)
+        if desconocidas:
+            raise ValueError(f"Claves de configuración desconocidas en {ruta}: {sorted(desconocidas)}")
+        cfg.update(extra)
+    return cfg
+
+
+# === FIRMAS (HASH DE ENTRADAS) ===
+
+def firma_ruta(ruta):
+    """Firma de una entrada: hash del contenido para archivos; nombre, tamaño y mtime para carpetas.
+
+    Las carpetas de NetCDF pueden pesar gigas, así que no se leen enteras.
+    """
+    from cache_trayectorias import hash_archivo
+
+    if ruta is None:
+        return None
+    if os.path.isfile(ruta):
+        return hash_archivo(ruta)
+    if os.path.isdir(ruta):
+        listado = []
+        for raiz, _, archivos in sorted(os.walk(ruta)):
+            for archivo in sorted(archivos):
+                st = os.stat(os.path.join(raiz, archivo))
+                listado.append((os.path.relpath(os.path.join(raiz, archivo), ruta), st.st_size, st.st_mtime_ns))
+        return hashlib.sha256(json.dumps(listado).encode()).hexdigest()
+    raise FileNotFoundError(f"No existe la entrada {ruta}")
+
+
+def _firma_modulos(nombres):
+    h = hashlib.sha256()
+    for nombre in nombres:
+        with open(inspect.getsourcefile(__import__(nombre)), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+# === ETAPAS ===
+
+class Etapa:
+    """Nodo del grafo: ``funcion(cfg, previas, carpeta)`` escribe en ``carpeta`` y devuelve sus artefactos.
+
+    ``parametros`` son las claves de la configuración que afectan al resultado,
+    ``entradas(cfg)`` las rutas cuyo contenido también y ``modulos`` el código usado.
+    """
+
+    def __init__(self, nombre, funcion, dependencias=(), parametros=(), entradas=None, modulos=(), activa=None):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.dependencias = list(dependencias)
+        self.parametros = list(parametros)
+        self.entradas = entradas or (lambda cfg: [])
+        self.modulos = list(modulos)
+        self.activa = activa or (lambda cfg: True)
+
+    def clave(self, cfg, claves_previas):
+        firma = {
+            "etapa": self.nombre,
+            "parametros": {p: cfg[p] for p in self.parametros},
+            "entradas": [firma_ruta(r) for r in self.entradas(cfg)],
+            "codigo": _firma_modulos(self.modulos),
+            "dependencias": {d: claves_previas[d] for d in self.dependencias},
+        }
+        return hashlib.sha256(json.dumps(firma, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _rutas_marcas(cfg):
+    if cfg["archivos_marcas"]:
+        return [os.path.join(cfg["carpeta_marcas"], a) for a in cfg["archivos_marcas"]]
+    return sorted(os.path.join(cfg["carpeta_marcas"], a) for a in os.listdir(cfg["carpeta_marcas"])
+                  if a.endswith(".csv"))
+
+
+def _convertir(cfg, previas, carpeta):
+    from conversion_nc import convertir_carpeta_paralelo, unir_fragmentos
+
+    artefactos = {}
+    for nombre, carpeta_nc, variable, columna in [("clorofila", cfg["carpeta_clorofila"], "chlor_a", "chlorophyll"),
+                                                  ("temperatura", cfg["carpeta_temperatura"], "sst", "temperature")]:
+        fragmentos = os.path.join(carpeta, f"fragmentos_{nombre}")
+        convertir_carpeta_paralelo(carpeta_nc, fragmentos, variable, columna, procesos=cfg["procesos"],
+                                   formato=cfg["formato_conversion"])
+        artefactos[nombre] = os.path.join(carpeta, f"{nombre}.{cfg['formato_conversion']}")
+        unir_fragmentos(fragmentos, artefactos[nombre])
+        shutil.rmtree(fragmentos, ignore_errors=True)
+    return artefactos
+
+
+def _alinear(cfg, previas, carpeta):
+    from creacion_archivos import alinear_productos, guardar_cubo_temporal, guardar_cubo_y_almacen
+
+    cubo = alinear_productos(cfg["carpeta_clorofila"], cfg["carpeta_temperatura"], cfg["resolucion"], cfg["metodo"])
+    artefactos = {"cubo": os.path.join(carpeta, "cubo_ambiental.nc"), "almacen": os.path.join(carpeta, "datos_modelo")}
+    guardar_cubo_y_almacen(cubo, artefactos["cubo"], artefactos["almacen"])
+    if cfg["cubo_temporal"]:
+        artefactos["cubo_temporal"] = os.path.join(carpeta, "cubo_temporal.nc")
+        guardar_cubo_temporal(cfg["carpeta_clorofila"], cfg["carpeta_temperatura"], artefactos["cubo_temporal"],
+                              cfg["resolucion"], cfg["metodo"])
+    return artefactos
+
+
+def _rasgos(cfg, previas, carpeta):
+    from creacion_archivos import guardar_rasgos
+
+    alineado = previas["alinear"]
+    artefactos = {"rasgos": os.path.join(carpeta, "rasgos_ambientales.nc")}
+    guardar_rasgos(alineado.get("cubo_temporal", alineado["cubo"]), artefactos["rasgos"], cfg["ventana_rasgos"])
+    return artefactos
+
+
+def _interpolar(cfg, previas, carpeta):
+    from modelo import cargar_trayectorias
+
+    df = cargar_trayectorias(_rutas_marcas(cfg), cache_dir=cfg["cache_trayectorias"], paso=cfg["paso_segundos"],
+                             velocidad_max=cfg["velocidad_max_ms"])
+    if df.empty:
+        raise ValueError("No se pudo cargar ningún archivo de tiburón.")
+    artefactos = {"trayectorias": os.path.join(carpeta, "trayectorias.parquet")}
+    df.to_parquet(artefactos["trayectorias"], index=False)
+    return artefactos
+
+
+def _unir(cfg, previas, carpeta):
+    import pandas as pd
+
+    from modelo import crear_objetivos, unir_con_ambiente, unir_rasgos
+
+    df = pd.read_parquet(previas["interpolar"]["trayectorias"])
+    df = unir_con_ambiente(df, previas["alinear"]["almacen"], cfg["distancia_max_km"],
+                           previas["alinear"].get("cubo_temporal"))
+    df = crear_objetivos(unir_rasgos(df, previas["rasgos"]["rasgos"]))
+    artefactos = {"features": os.path.join(carpeta, "features.parquet")}
+    df.to_parquet(artefactos["features"], index=False)
+    return artefactos
+
+
+def _entrenar(cfg, previas, carpeta):
+    import joblib
+    import numpy as np
+    import pandas as pd
+
+    from modelo import entrenar_y_evaluar
+
+    pipeline, metricas, X_test, residuos = entrenar_y_evaluar(pd.read_parquet(previas["unir"]["features"]))
+    artefactos = {k: os.path.join(carpeta, v) for k, v in [("modelo", "modelo.joblib"), ("residuos", "residuos.npy"),
+                                                          ("X_test", "X_test.parquet"), ("metricas", "metricas.json")]}
+    joblib.dump(pipeline, artefactos["modelo"])
+    np.save(artefactos["residuos"], residuos)
+    X_test.to_parquet(artefactos["X_test"])
+    with open(artefactos["metricas"], "w", encoding="utf-8") as f:
+        json.dump(metricas, f, indent=2)
+    return artefactos
+
+
+def _exportar(cfg, previas, carpeta):
+    import joblib
+    import pandas as pd
+
+    from artefacto_modelo import ModeloCompacto, exportar, verificar
+    from modelo import targets
+
+    entrenamiento = previas["entrenar"]
+    pipeline = joblib.load(entrenamiento["modelo"])
+    artefactos = {"artefacto": os.path.join(carpeta, "modelo.tibm")}
+    exportar(pipeline, artefactos["artefacto"], targets)
+    coincide, diferencia = verificar(pipeline, ModeloCompacto(artefactos["artefacto"]),
+                                     pd.read_parquet(entrenamiento["X_test"]))
+    if not coincide:
+        raise ValueError(f"El artefacto compacto no reproduce el pipeline (diferencia máx. {diferencia:.2e}).")
+    return artefactos
+
+
+ETAPAS = [
+    Etapa("convertir", _convertir, parametros=["formato_conversion"],
+          entradas=lambda cfg: [cfg["carpeta_clorofila"], cfg["carpeta_temperatura"]],
+          modulos=["conversion_nc"], activa=lambda cfg: cfg["convertir"]),
+    Etapa("alinear", _alinear, parametros=["resolucion", "metodo", "cubo_temporal"],
+          entradas=lambda cfg: [cfg["carpeta_clorofila"], cfg["carpeta_temperatura"]],
+          modulos=["alineacion_rasters", "almacen_ambiental", "creacion_archivos", "cubo_temporal"]),
+    Etapa("rasgos", _rasgos, ["alinear"], parametros=["ventana_rasgos"],
+          modulos=["creacion_archivos", "rasgos_oceanograficos"]),
+    Etapa("interpolar", _interpolar, parametros=["paso_segundos", "velocidad_max_ms"],
+          entradas=_rutas_marcas, modulos=["modelo", "trayectorias", "cache_trayectorias", "filtro_argos"]),
+    Etapa("unir", _unir, ["alinear", "rasgos", "interpolar"], parametros=["distancia_max_km"],
+          modulos=["modelo", "muestreo_puntos", "almacen_ambiental", "cubo_temporal", "rasgos_oceanograficos"]),
+    Etapa("entrenar", _entrenar, ["unir"], modulos=["modelo"]),
+    Etapa("exportar", _exportar, ["entrenar"], modulos=["artefacto_modelo", "modelo"]),
+]
+
+
+# === EJECUCIÓN ===
+
+def _publicar(cfg, resultados):
+    """Copia los artefactos finales a las rutas de la configuración (las que no sean None)."""
+    destinos = [("archivo_modelo", "entrenar", "modelo"), ("archivo_residuos", "entrenar", "residuos"),
+                ("archivo_artefacto", "exportar", "artefacto"), ("archivo_cubo", "alinear", "cubo"),
+                ("archivo_cubo_temporal", "alinear", "cubo_temporal"), ("archivo_rasgos", "rasgos", "rasgos"),
+                ("almacen", "alinear", "almacen")]
+    for clave_cfg, nombre, artefacto in destinos:
+        destino = cfg.get(clave_cfg)
+        if not destino or nombre not in resultados:
+            continue
+        origen = resultados[nombre][artefacto]
+        if os.path.isdir(origen):
+            shutil.rmtree(destino, ignore_errors=True)
+            shutil.copytree(origen, destino)
+        else:
+            shutil.copy2(origen, destino)
+        print(f"  📦 {artefacto} → {destino}")
+
+
+def ejecutar(cfg, hasta=None, forzar=()):
+    """Ejecuta (o reutiliza de la caché) las etapas hasta ``hasta`` inclusive.
+
+    ``forzar`` son nombres de etapas que se ejecutan aunque su clave esté en caché.
+    Devuelve ``{etapa: artefactos}``.
+    """
+    nombres = [e.nombre for e in ETAPAS]
+    if hasta is not None and hasta not in nombres:
+        raise ValueError(f"Etapa desconocida: {hasta}. Opciones: {nombres}")
+    objetivo = nombres.index(hasta) if hasta else len(nombres) - 1
+
+    claves, resultados, ejecutadas = {}, {}, set()
+    for e in ETAPAS[:objetivo + 1]:
+        if not e.activa(cfg):
+            continue
+        claves[e.nombre] = e.clave(cfg, claves)
+        carpeta = os.path.join(cfg["trabajo"], e.nombre, claves[e.nombre])
+        marca = os.path.join(carpeta, "hecho.json")
+        # Una etapa forzada obliga a rehacer también las que dependen de ella
+        rehacer = e.nombre in forzar or any(d in ejecutadas for d in e.dependencias)
+        if not rehacer and os.path.exists(marca):
+            with open(marca, encoding="utf-8") as f:
+                artefactos = json.load(f)
+            if all(os.path.exists(r) for r in artefactos.values()):
+                print(f"⏭️  {e.nombre}: sin cambios (clave {claves[e.nombre]})")
+                resultados[e.nombre] = artefactos
+                continue
+
+        print(f"\n▶️  {e.nombre} (clave {claves[e.nombre]})")
+        shutil.rmtree(carpeta, ignore_errors=True)
+        os.makedirs(carpeta)
+        inicio = time.perf_counter()
+        with etapa(f"pipeline_{e.nombre}", clave=claves[e.nombre]):
+            artefactos = e.funcion(cfg, {d: resultados[d] for d in e.dependencias}, carpeta)
+        with open(marca, "w", encoding="utf-8") as f:
+            json.dump(artefactos, f, indent=2)
+        resultados[e.nombre] = artefactos
+        ejecutadas.add(e.nombre)
+        print(f"✅ {e.nombre} completada en {time.perf_counter() - inicio:.2f} s")
+
+        # Solo se conserva la versión actual de cada etapa
+        for otra in os.listdir(os.path.join(cfg["trabajo"], e.nombre)):
+            if otra != claves[e.nombre]:
+                shutil.rmtree(os.path.join(cfg["trabajo"], e.nombre, otra), ignore_errors=True)
+
+    _publicar(cfg, resultados)
+    return resultados
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pipeline de datos y modelo con caché por etapa.")
+    parser.add_argument("configuracion", nargs="+", help="Uno o más JSON de configuración (los últimos mandan)")
+    parser.add_argument("--hasta", choices=[e.nombre for e in ETAPAS], help="Última etapa a ejecutar")
+    parser.add_argument("--forzar", nargs="+", default=[], choices=[e.nombre for e in ETAPAS],
+                        help="Etapas que se vuelven a ejecutar aunque estén en caché")
+    args = parser.parse_args()
+
+    resultados = ejecutar(cargar_configuracion(args.configuracion), args.hasta, args.forzar)
+    print(f"\n✅ Pipeline completo: {', '.join(resultados)}")
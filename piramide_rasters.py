@@ -0,0 +1,214 @@
+import os
+
+import numpy as np
+import xarray as xr
+
+from conversion_nc import _nombre_dim
+
+# Pirámide de resúmenes (overviews) de los rásteres para el visualizador.
+# Cada nivel promedia bloques 2 × 2 del anterior (ignorando NaN, con sumas y
+# cuentas exactas, así que el nivel k es la media de bloques 2^k × 2^k del
+# original). Los niveles 1..K de un archivo se guardan en un único NetCDF en
+# ``carpeta_piramides``; el nivel 0 es el propio archivo. Al dibujar se elige
+# el nivel más grueso que todavía tiene al menos un dato por píxel en la vista,
+# así un mapa global lee unos cientos de miles de celdas en vez de decenas de millones.
+# Las capas de hasta ``MAX_CELDAS_CAPA`` celdas (los niveles gruesos) se guardan
+# completas en la caché de capas y se recortan en memoria; las más grandes se leen
+# recortadas directamente del archivo.
+#
+#   python piramide_rasters.py carpeta_nc --salida piramides
+
+CARPETA_PIRAMIDES = "piramides"
+MIN_LADO = 256  # el último nivel tiene como mucho este número de celdas por lado
+MAX_CELDAS_CAPA = 2**21  # capas (lat × lon) que se guardan completas en la caché de capas
+
+
+def _reducir(suma, cuenta):
+    """Suma y cuenta de bloques 2 × 2 en los dos últimos ejes (rellena el borde impar)."""
+    nlat, nlon = suma.shape[-2:]
+    relleno = [(0, 0)] * (suma.ndim - 2) + [(0, nlat % 2), (0, nlon % 2)]
+    suma, cuenta = np.pad(suma, relleno), np.pad(cuenta, relleno)
+    forma = suma.shape[:-2] + (suma.shape[-2] // 2, 2, suma.shape[-1] // 2, 2)
+    return suma.reshape(forma).sum(axis=(-3, -1)), cuenta.reshape(forma).sum(axis=(-3, -1))
+
+
+def _reducir_coordenada(valores):
+    """Centro de cada par de celdas (la última queda sola si el largo es impar)."""
+    v = np.asarray(valores, dtype="float64")
+    pares = v[:len(v) // 2 * 2].reshape(-1, 2).mean(axis=1)
+    return np.concatenate([pares, v[len(v) // 2 * 2:]])
+
+
+def niveles_de_bloques(valores, lats, lons, min_lado=MIN_LADO):
+    """Genera (lats, lons, medias float32) de cada nivel 1..K para ``valores`` (..., lat, lon)."""
+    validos = np.isfinite(valores)
+    suma = np.where(validos, valores, 0).astype("float64")
+    cuenta = validos.astype("int32")
+    while max(suma.shape[-2:]) > min_lado:
+        suma, cuenta = _reducir(suma, cuenta)
+        lats, lons = _reducir_coordenada(lats), _reducir_coordenada(lons)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            yield lats, lons, np.where(cuenta > 0, suma / cuenta, np.nan).astype("float32")
+
+
+def _firma(ruta):
+    st = os.stat(ruta)
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+
+def ruta_piramide(ruta_origen, carpeta=CARPETA_PIRAMIDES):
+    return os.path.join(carpeta, os.path.splitext(os.path.basename(ruta_origen))[0] + ".piramide.nc")
+
+
+def construir_piramide(ruta_origen, carpeta=CARPETA_PIRAMIDES, min_lado=MIN_LADO):
+    """Escribe la pirámide de todas las variables (lat, lon) de ``ruta_origen``; devuelve su ruta.
+
+    Las variables se procesan una por una; si tienen eje ``time`` se reduce paso a paso.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    destino = ruta_piramide(ruta_origen, carpeta)
+    variables, coords, n_niveles = {}, {}, 0
+    with xr.open_dataset(ruta_origen) as ds:
+        for nombre, da in ds.data_vars.items():
+            try:
+                dim_lat = _nombre_dim(da, ("lat", "latitude"))
+                dim_lon = _nombre_dim(da, ("lon", "longitude"))
+            except KeyError:
+                continue  # variable sin ejes espaciales
+            otras = [d for d in da.dims if d not in (dim_lat, dim_lon)]
+            da = da.transpose(*otras, dim_lat, dim_lon)
+            lats, lons = da[dim_lat].values, da[dim_lon].values
+            pasos = range(da.sizes["time"]) if "time" in otras else [None]
+            por_nivel = {}
+            for t in pasos:
+                capa = (da.isel(time=t) if t is not None else da).values.astype("float32")
+                for k, (la, lo, medias) in enumerate(niveles_de_bloques(capa, lats, lons, min_lado), start=1):
+                    coords[f"lat_n{k}"], coords[f"lon_n{k}"] = la, lo
+                    por_nivel.setdefault(k, []).append(medias)
+            dims_extra = [d for d in otras if d != "time"]
+            for k, capas in por_nivel.items():
+                dims = (["time"] if "time" in otras else []) + dims_extra + [f"lat_n{k}", f"lon_n{k}"]
+                valores = np.stack(capas) if "time" in otras else capas[0]
+                variables[f"{nombre}_n{k}"] = (dims, valores)
+                n_niveles = max(n_niveles, k)
+            for d in otras:
+                coords[d] = ds[d].values
+
+    piramide = xr.Dataset(variables, coords=coords,
+                          attrs={"origen": os.path.basename(ruta_origen), "firma_origen": _firma(ruta_origen),
+                                 "niveles": n_niveles})
+    temporal = destino + ".tmp"
+    piramide.to_netcdf(temporal)
+    os.replace(temporal, destino)
+    return destino
+
+
+def asegurar_piramide(ruta_origen, carpeta=CARPETA_PIRAMIDES, min_lado=MIN_LADO):
+    """Ruta de la pirámide de ``ruta_origen``, construyéndola si falta o si el origen cambió."""
+    destino = ruta_piramide(ruta_origen, carpeta)
+    if os.path.exists(destino):
+        with xr.open_dataset(destino) as p:
+            if p.attrs.get("firma_origen") == _firma(ruta_origen):
+                return destino
+    print(f"Construyendo pirámide de {os.path.basename(ruta_origen)}...")
+    return construir_piramide(ruta_origen, carpeta, min_lado)
+
+
+def _recorte(valores, inicio, fin, margen=1):
+    """Índices [i0, i1) de las celdas de ``valores`` dentro de [inicio, fin], más ``margen`` celdas."""
+    dentro = np.flatnonzero((valores >= min(inicio, fin)) & (valores <= max(inicio, fin)))
+    if not len(dentro):
+        return 0, 0
+    return max(dentro[0] - margen, 0), min(dentro[-1] + 1 + margen, len(valores))
+
+
+class Piramide:
+    """Acceso por nivel a un ráster y su pirámide, a través de una ``CacheDatasets``.
+
+    Con ``ruta_piramide=None`` (pirámide aún en construcción) solo ofrece el nivel 0.
+    """
+
+    def __init__(self, ruta_origen, ruta_piramide, cache):
+        self.ruta_origen = ruta_origen
+        self.ruta_piramide = ruta_piramide
+        self.cache = cache
+
+    def _ruta(self, nivel):
+        return self.ruta_origen if nivel == 0 else self.ruta_piramide
+
+    def _dataset(self, nivel):
+        return self.cache.obtener(self._ruta(nivel))
+
+    def _nombres(self, var, nivel):
+        if nivel == 0:
+            da = self._dataset(0)[var]
+            return var, _nombre_dim(da, ("lat", "latitude")), _nombre_dim(da, ("lon", "longitude"))
+        return f"{var}_n{nivel}", f"lat_n{nivel}", f"lon_n{nivel}"
+
+    def resoluciones(self, var):
+        """Paso (grados) de lat y lon en cada nivel disponible para ``var``, empezando en el 0."""
+        salida = []
+        niveles = int(self._dataset(1).attrs.get("niveles", 0)) if self.ruta_piramide else 0
+        for nivel in range(niveles + 1):
+            nombre, dim_lat, dim_lon = self._nombres(var, nivel)
+            ds = self._dataset(nivel)
+            if nombre not in ds:
+                break
+            lats, lons = ds[dim_lat].values, ds[dim_lon].values
+            salida.append((abs(float(lats[1] - lats[0])) if len(lats) > 1 else 180.0,
+                           abs(float(lons[1] - lons[0])) if len(lons) > 1 else 360.0))
+        return salida
+
+    def elegir_nivel(self, var, x_range=None, y_range=None, ancho_px=800, alto_px=400):
+        """Nivel más grueso con al menos una celda por píxel en la vista (0 si ninguno lo cumple)."""
+        ancho = abs(x_range[1] - x_range[0]) if x_range else 360.0
+        alto = abs(y_range[1] - y_range[0]) if y_range else 180.0
+        elegido = 0
+        for nivel, (dlat, dlon) in enumerate(self.resoluciones(var)):
+            if ancho / dlon >= ancho_px and alto / dlat >= alto_px:
+                elegido = nivel
+        return elegido
+
+    def _en_cache(self, da):
+        """Si la capa 2D de ``da`` es lo bastante pequeña para guardarla completa."""
+        return da.size // da.sizes.get("time", 1) <= MAX_CELDAS_CAPA
+
+    def capa(self, var, t_index=None, nivel=0, x_range=None, y_range=None):
+        """Capa de ``var`` en ``nivel`` recortada a la vista y cargada en memoria."""
+        nombre, dim_lat, dim_lon = self._nombres(var, nivel)
+        with self.cache.usar(self._ruta(nivel)) as ds:
+            da = ds[nombre]
+            if self._en_cache(da):
+                da = self.cache.capa(self._ruta(nivel), nombre, t_index)
+            elif t_index is not None and "time" in da.dims:
+                da = da.isel(time=t_index)
+            recorte = {}
+            if y_range and None not in y_range:
+                recorte[dim_lat] = slice(*_recorte(da[dim_lat].values, *y_range))
+            if x_range and None not in x_range:
+                recorte[dim_lon] = slice(*_recorte(da[dim_lon].values, *x_range))
+            da = da.isel(recorte).load()
+        return da.rename({d: n for d, n in ((dim_lat, "lat"), (dim_lon, "lon")) if d != n})
+
+    def precargar(self, var, t_index, nivel=0):
+        """Lee en segundo plano la capa ``t_index`` de ``nivel`` si existe y va a la caché de capas."""
+        nombre, _, _ = self._nombres(var, nivel)
+        da = self._dataset(nivel)[nombre]
+        if "time" in da.dims and 0 <= t_index < da.sizes["time"] and self._en_cache(da):
+            self.cache.precargar(self._ruta(nivel), nombre, t_index)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cache_datasets import listar_nc
+
+    parser = argparse.ArgumentParser(description="Precalcula las pirámides de resúmenes de una carpeta de .nc.")
+    parser.add_argument("carpeta", help="Carpeta con los .nc a resumir")
+    parser.add_argument("--salida", default=CARPETA_PIRAMIDES)
+    parser.add_argument("--min-lado", type=int, default=MIN_LADO)
+    args = parser.parse_args()
+
+    for archivo in listar_nc(args.carpeta):
+        ruta = asegurar_piramide(os.path.join(args.carpeta, archivo), args.salida, args.min_lado)
+        print(f"✅ {archivo} → {ruta}")
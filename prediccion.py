@@ -1,54 +1,68 @@
-import pandas as pd
-import joblib
+import os
+import time
 import numpy as np
 
+from instrumentacion import etapa
+
 # --- Replicar la preparación de datos mínima (solo la necesaria para las FEATURES) ---
-# Importa solo las herramientas que necesitas para cargar y preparar los nuevos datos.
 # Por simplicidad, se omite la lógica de interpolación/proyección aquí, asumiendo que 
 # los nuevos datos ya están en el formato de df_ml (lon, lat, Profundidad, Temp_Media, Cloro_Media, id_tiburon)
 # Si tus nuevos datos no están en ese formato, debes incluir la lógica de preprocesamiento de la Parte 1.
 
-# Nombre del archivo del modelo guardado
+# Nombres de los archivos del modelo guardado
+# El artefacto compacto (.tibm) se carga solo con NumPy; si no existe se usa el pipeline joblib.
+ARTIFACT_FILENAME = 'modelo_trayectoria_lineal.tibm'
 MODEL_FILENAME = 'modelo_trayectoria_lineal.joblib'
 
 # --- 1. Cargar el Modelo ---
-try:
-    modelo_cargado = joblib.load(MODEL_FILENAME)
-    print(f"✅ Modelo {MODEL_FILENAME} cargado.")
-except FileNotFoundError:
-    print(f"❌ ERROR: El archivo del modelo {MODEL_FILENAME} no se encuentra.")
-    exit()
+inicio = time.perf_counter()
+if os.path.exists(ARTIFACT_FILENAME):
+    with etapa("carga_modelo", archivo=ARTIFACT_FILENAME):
+        from artefacto_modelo import ModeloCompacto
+        modelo_cargado = ModeloCompacto(ARTIFACT_FILENAME)
+    archivo_cargado = ARTIFACT_FILENAME
+else:
+    try:
+        with etapa("carga_modelo", archivo=MODEL_FILENAME):
+            import joblib
+            modelo_cargado = joblib.load(MODEL_FILENAME)
+        archivo_cargado = MODEL_FILENAME
+    except FileNotFoundError:
+        print(f"❌ ERROR: No se encuentra {ARTIFACT_FILENAME} ni {MODEL_FILENAME}.")
+        exit()
+print(f"✅ Modelo {archivo_cargado} cargado en {(time.perf_counter() - inicio) * 1000:.1f} ms.")
 
 # --- 2. Preparar los Nuevos Datos de Predicción (Ejemplo Simulado) ---
 
 # Supongamos que tienes un nuevo tiburón (TIBURON_12) en esta posición y condiciones.
 # El modelo SOLO necesita las FEATURES que usaste para entrenar.
-nuevos_datos = pd.DataFrame({
+nuevos_datos = {
     'lon': [-71.5], 
     'lat': [41.2],
     'Profundidad': [2],
-    'Temp_Media': [15.5],  # O el valor imputado si no hay match ambiental
-    'Cloro_Media': [0.5], # O el valor imputado si no hay match ambiental
+    'Temp_Media': [15.5],  # O NaN si no hay match ambiental (se imputa con la media de entrenamiento)
+    'Cloro_Media': [0.5], # O NaN si no hay match ambiental (se imputa con la media de entrenamiento)
     'id_tiburon': ['TIBURON_12']
-})
+}
 
-# NOTA IMPORTANTE: Si la columna 'id_tiburon' es nueva (ej. 'TIBURON_12'), 
-# el OneHotEncoder lo ignorará automáticamente gracias a 'handle_unknown="ignore"', 
-# y usará la predicción promedio de la población entrenada.
+# Las columnas (y su orden) salen del propio modelo: con USAR_RASGOS también incluyen los rasgos.
+# Las que no vengan en los datos nuevos van como NaN y se imputan con la media de entrenamiento.
+from artefacto_modelo import features_del_modelo, predecir_arreglo
 
-# Asegúrate de que las columnas estén en el orden correcto si tu modelo lo requiere
-FEATURES = ['lon', 'lat', 'Temp_Media', 'Cloro_Media']
-X_new = nuevos_datos[FEATURES]
+FEATURES = features_del_modelo(modelo_cargado)
+filas = len(nuevos_datos['lon'])
+X_new = np.column_stack([nuevos_datos.get(f, [np.nan] * filas) for f in FEATURES]).astype(float)
 
 # --- 3. Predecir ---
 print("\n--- Iniciando Predicción ---")
-# El pipeline cargado automáticamente aplica la imputación y la estandarización.
-predicciones = modelo_cargado.predict(X_new)
+# Tanto el artefacto como el pipeline aplican la imputación y la estandarización.
+with etapa("prediccion", filas_entrada=len(X_new)):
+    predicciones = predecir_arreglo(modelo_cargado, X_new, FEATURES)
 
 # --- 4. Mostrar Resultados ---
 lon_futura_pred = predicciones[0][0]
 lat_futura_pred = predicciones[0][1]
 
 print("\n--- Resultados de la Predicción (Siguiente Posición) ---")
-print(f"Posición Actual: Longitud {nuevos_datos['lon'].iloc[0]:.4f}, Latitud {nuevos_datos['lat'].iloc[0]:.4f}")
-print(f"Posición Predicha: Longitud {lon_futura_pred:.4f}, Latitud {lat_futura_pred:.4f}")
\ No newline at end of file
+print(f"Posición Actual: Longitud {nuevos_datos['lon'][0]:.4f}, Latitud {nuevos_datos['lat'][0]:.4f}")
+print(f"Posición Predicha: Longitud {lon_futura_pred:.4f}, Latitud {lat_futura_pred:.4f}")
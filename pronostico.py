@@ -0,0 +1,79 @@
+import numpy as np
+
+from artefacto_modelo import features_del_modelo, predecir_arreglo
+
+# Pronóstico autorregresivo de varios pasos para muchos tiburones a la vez.
+# En cada paso se muestrea el ambiente en las posiciones predichas y se hace una
+# única llamada a ``predict`` para todos los tiburones: el bucle es sobre pasos,
+# nunca sobre tiburones.
+
+
+def _normalizar(lon, lat):
+    return (lon + 180.0) % 360.0 - 180.0, np.clip(lat, -90.0, 90.0)
+
+
+def paso_modelo(modelo, lon, lat, year, muestreador=None):
+    """Un paso del modelo para todas las posiciones: muestrea el ambiente y predice en lote."""
+    features = features_del_modelo(modelo)
+    X = np.full((len(lon), len(features)), np.nan)
+    X[:, features.index("lon")] = lon
+    X[:, features.index("lat")] = lat
+    if muestreador is not None:
+        valores, _ = muestreador.muestrear(lat, lon, year)
+        for v, muestra in valores.items():
+            if v in features:
+                X[:, features.index(v)] = muestra
+    Y = predecir_arreglo(modelo, X, features)
+    return _normalizar(Y[:, 0], Y[:, 1])
+
+
+def pronosticar(modelo, lon0, lat0, pasos, year=None, muestreador=None):
+    """Avanza el modelo ``pasos`` veces desde (``lon0``, ``lat0``) para todos los tiburones.
+
+    ``year`` (escalar o un valor por tiburón) selecciona la capa ambiental que se
+    muestrea en cada paso; sin ``muestreador`` el ambiente queda en NaN y lo imputa
+    el pipeline. Devuelve un arreglo float32 de forma (n_tiburones, pasos + 1, 2)
+    con (lon, lat); el índice 0 del segundo eje es la posición inicial.
+    """
+    lon = np.asarray(lon0, dtype="float64").copy()
+    lat = np.asarray(lat0, dtype="float64").copy()
+    year = np.broadcast_to(np.asarray(year if year is not None else 0, dtype="int64"), lon.shape)
+    trayectoria = np.empty((len(lon), pasos + 1, 2), dtype="float32")
+    trayectoria[:, 0, 0], trayectoria[:, 0, 1] = lon, lat
+    for k in range(1, pasos + 1):
+        lon, lat = paso_modelo(modelo, lon, lat, year, muestreador)
+        trayectoria[:, k, 0], trayectoria[:, k, 1] = lon, lat
+    return trayectoria
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import pandas as pd
+
+    from almacen_ambiental import bbox_de_puntos, cargar_almacen
+    from artefacto_modelo import cargar_modelo
+    from muestreo_puntos import construir_muestreador
+
+    parser = argparse.ArgumentParser(description="Pronóstico de N pasos de 6 h para muchos tiburones.")
+    parser.add_argument("posiciones", help="CSV con id_tiburon, lon, lat y year de la posición inicial")
+    parser.add_argument("--pasos", type=int, default=20)
+    parser.add_argument("--modelo", default="modelo_trayectoria_lineal.joblib", help="Pipeline .joblib o artefacto .tibm")
+    parser.add_argument("--almacen", default="datos_modelo")
+    parser.add_argument("--salida", default="pronostico.npz")
+    args = parser.parse_args()
+
+    inicio = pd.read_csv(args.posiciones)
+    modelo = cargar_modelo(args.modelo)
+    try:
+        # El margen cubre lo que puede desplazarse un tiburón durante el pronóstico
+        df_env = cargar_almacen(args.almacen, años=inicio["year"].unique(),
+                                bbox=bbox_de_puntos(inicio["lat"], inicio["lon"], margen=10.0))
+        muestreador = construir_muestreador(df_env, ["Temp_Media", "Cloro_Media"])
+    except FileNotFoundError:
+        print("ADVERTENCIA: Almacén ambiental no encontrado. El ambiente se imputará en cada paso.")
+        muestreador = None
+
+    trayectorias = pronosticar(modelo, inicio["lon"], inicio["lat"], args.pasos, inicio["year"], muestreador)
+    np.savez_compressed(args.salida, trayectorias=trayectorias, id_tiburon=inicio["id_tiburon"].astype(str).to_numpy())
+    print(f"✅ Pronóstico de {args.pasos} pasos para {len(inicio)} tiburones guardado en {args.salida}")
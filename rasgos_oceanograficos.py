@@ -0,0 +1,134 @@
+import os
+
+import netCDF4
+import numpy as np
+import xarray as xr
+from scipy.ndimage import uniform_filter
+
+from cubo_temporal import TROZO, ExtractorCubo
+from muestreo_puntos import MuestreadorRejilla
+
+# Rasgos oceanográficos precalculados sobre las capas del cubo ambiental.
+# Los frentes térmicos y los bordes de afloramientos de clorofila se ven como
+# gradientes y anomalías locales, no en el valor de una sola celda. Por cada paso
+# del cubo (año o fecha) se calculan, con filtros vectorizados sobre toda la
+# rejilla (costo O(celdas) por paso, sin importar cuántos puntos se muestreen):
+#   - Grad_*: magnitud del gradiente espacial por km,
+#   - Anom_*: valor menos la media del vecindario de ``VENTANA`` × ``VENTANA`` celdas,
+#   - Desv_*: desviación estándar en ese vecindario.
+# Todos ignoran NaN (tierra, nubes). La clorofila se trata en log10 porque se
+# distribuye de forma log-normal. Las capas se guardan en un NetCDF con la misma
+# rejilla y eje temporal que el cubo, así que se muestrean igual que él.
+
+ARCHIVO_RASGOS = "rasgos_ambientales.nc"
+VENTANA = 5  # celdas por lado del vecindario (≈ 45 km en la rejilla de 1/12°)
+KM_POR_GRADO = 111.32
+ORIGENES = {"Temp": "Temp_Media", "Cloro": "Cloro_Media"}
+RASGOS = [f"{tipo}_{nombre}" for tipo in ("Grad", "Anom", "Desv") for nombre in ORIGENES]
+
+
+def media_vecindario(valores, ventana=VENTANA, periodico_lon=True):
+    """Media y varianza de cada vecindario ``ventana × ventana`` ignorando NaN (NaN si no hay datos)."""
+    validos = np.isfinite(valores)
+    x = np.where(validos, valores, 0.0).astype("float64")
+    modo = ("nearest", "wrap" if periodico_lon else "nearest")
+    n = uniform_filter(validos.astype("float64"), ventana, mode=modo)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = uniform_filter(x, ventana, mode=modo) / n
+        varianza = uniform_filter(x * x, ventana, mode=modo) / n - media ** 2
+    media[n <= 0] = np.nan
+    return media, np.maximum(varianza, 0.0)
+
+
+def magnitud_gradiente(valores, lats, dlat, dlon):
+    """|∇valores| por km en una rejilla regular lat/lon (la distancia en x se corrige por cos(lat))."""
+    d_lat, d_lon = np.gradient(valores.astype("float64"))
+    dy = abs(dlat) * KM_POR_GRADO
+    dx = np.maximum(abs(dlon) * KM_POR_GRADO * np.cos(np.radians(lats)), 1e-6)[:, None]
+    return np.hypot(d_lat / dy, d_lon / dx)
+
+
+def rasgos_de_capa(capas, lats, dlat, dlon, ventana=VENTANA, periodico_lon=True):
+    """Calcula todos los ``RASGOS`` de un paso a partir de ``{"Temp_Media": 2D, "Cloro_Media": 2D}``."""
+    salida = {}
+    for nombre, variable in ORIGENES.items():
+        valores = capas[variable].astype("float64")
+        if nombre == "Cloro":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                valores = np.log10(np.where(valores > 0, valores, np.nan))
+        media, varianza = media_vecindario(valores, ventana, periodico_lon)
+        validos = np.isfinite(valores)
+        # Los huecos se rellenan con la media del vecindario para no perder el gradiente en los bordes
+        gradiente = magnitud_gradiente(np.where(validos, valores, media), lats, dlat, dlon)
+        salida[f"Grad_{nombre}"] = np.where(validos, gradiente, np.nan)
+        salida[f"Anom_{nombre}"] = valores - media
+        salida[f"Desv_{nombre}"] = np.where(validos, np.sqrt(varianza), np.nan)
+    return salida
+
+
+def calcular_rasgos(ruta_cubo, ruta_salida=ARCHIVO_RASGOS, ventana=VENTANA, trozo=TROZO):
+    """Escribe las capas de rasgos de ``ruta_cubo`` (``cubo_ambiental.nc`` o ``cubo_temporal.nc``).
+
+    Se lee y procesa un bloque de pasos a la vez; la salida conserva el eje temporal
+    del cubo (``year`` o ``time``) y, si existe, el fin de periodo ``time_fin``.
+    Devuelve el número de pasos escritos.
+    """
+    with xr.open_dataset(ruta_cubo, decode_times=False) as cubo:
+        eje = "time" if "time" in cubo.dims else "year"
+        lats, lons = cubo["lat"].values, cubo["lon"].values
+        dlat, dlon = float(lats[1] - lats[0]), float(lons[1] - lons[0])
+        periodico_lon = abs(abs(dlon) * len(lons) - 360) < abs(dlon)
+        n_t = cubo.sizes[eje]
+        ct, ci, cj = min(trozo[0], n_t), min(trozo[1], len(lats)), min(trozo[2], len(lons))
+
+        temporal = ruta_salida + ".tmp"
+        with netCDF4.Dataset(temporal, "w") as nc:
+            nc.createDimension(eje, n_t)
+            nc.createDimension("lat", len(lats))
+            nc.createDimension("lon", len(lons))
+            for nombre in [eje, "time_fin"] if "time_fin" in cubo else [eje]:
+                var = nc.createVariable(nombre, cubo[nombre].dtype, (eje,))
+                var.setncatts({k: v for k, v in cubo[nombre].attrs.items() if k != "_FillValue"})
+                var[:] = cubo[nombre].values
+            nc.createVariable("lat", "f8", ("lat",))[:] = lats
+            nc.createVariable("lon", "f8", ("lon",))[:] = lons
+            nc.setncattr("ventana", ventana)
+            for nombre in RASGOS:
+                nc.createVariable(nombre, "f4", (eje, "lat", "lon"), zlib=True, complevel=1, shuffle=True,
+                                  chunksizes=(ct, ci, cj), fill_value=np.float32(np.nan))
+
+            for k0 in range(0, n_t, ct):
+                k1 = min(k0 + ct, n_t)
+                bloque = {v: cubo[v].isel({eje: slice(k0, k1)}).transpose(eje, "lat", "lon").values
+                          for v in ORIGENES.values()}
+                salida = {nombre: np.empty((k1 - k0, len(lats), len(lons)), dtype="float32") for nombre in RASGOS}
+                for k in range(k1 - k0):
+                    rasgos = rasgos_de_capa({v: bloque[v][k] for v in bloque}, lats, dlat, dlon, ventana,
+                                            periodico_lon)
+                    for nombre, valores in rasgos.items():
+                        salida[nombre][k] = valores
+                for nombre, valores in salida.items():
+                    nc[nombre][k0:k1] = valores
+    os.replace(temporal, ruta_salida)
+    return n_t
+
+
+def muestreador_rasgos(ruta=ARCHIVO_RASGOS):
+    """Muestreador de las capas de rasgos: por fecha si tienen eje ``time``, por año si no."""
+    with xr.open_dataset(ruta, decode_times=False) as ds:
+        if "time" not in ds.dims:
+            return MuestreadorRejilla.desde_cubo(ds.load(), RASGOS)
+    return ExtractorCubo(ruta, RASGOS)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Calcula las capas de frentes y gradientes de un cubo ambiental.")
+    parser.add_argument("cubo", help="cubo_temporal.nc o cubo_ambiental.nc")
+    parser.add_argument("--salida", default=ARCHIVO_RASGOS)
+    parser.add_argument("--ventana", type=int, default=VENTANA)
+    args = parser.parse_args()
+
+    pasos = calcular_rasgos(args.cubo, args.salida, args.ventana)
+    print(f"✅ {len(RASGOS)} capas de rasgos × {pasos} pasos guardadas en {args.salida}")
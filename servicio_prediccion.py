@@ -0,0 +1,240 @@
+import argparse
+import io
+import json
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from artefacto_modelo import cargar_modelo, features_del_modelo, predecir_arreglo
+
+# Servicio de predicción persistente.
+# El pipeline se carga una sola vez; las peticiones que llegan casi a la vez se
+# agrupan en un micro-lote y se resuelven con una única llamada a ``predict``.
+#
+#   python servicio_prediccion.py --puerto 8000
+#   curl -X POST localhost:8000/predecir -d '{"filas": [{"lon": -71.5, "lat": 41.2, "Temp_Media": 15.5, "Cloro_Media": 0.5}]}'
+#   curl -X POST localhost:8000/lote --data-binary @posiciones.csv
+#   curl localhost:8000/estadisticas
+#
+# También puede usarse sin servidor para un archivo masivo:
+#   python servicio_prediccion.py --archivo posiciones.csv --salida predicciones.csv
+
+MODEL_FILENAME = 'modelo_trayectoria_lineal.joblib'
+TARGETS = ['lon_futura', 'lat_futura']
+
+
+class _Peticion:
+    def __init__(self, X):
+        self.X = X
+        self.resultado = None
+        self.error = None
+        self.lista = threading.Event()
+
+
+class Estadisticas:
+    """Latencias por petición (ventana deslizante) y filas por segundo desde el arranque."""
+
+    def __init__(self, ventana=10_000):
+        self.latencias = deque(maxlen=ventana)
+        self.filas = 0
+        self.lotes = 0
+        self.inicio = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def registrar_lote(self, filas):
+        with self._lock:
+            self.filas += filas
+            self.lotes += 1
+
+    def registrar_latencia(self, segundos):
+        with self._lock:
+            self.latencias.append(segundos)
+
+    def resumen(self):
+        with self._lock:
+            lat = np.asarray(self.latencias) * 1000
+            transcurrido = time.perf_counter() - self.inicio
+            return {
+                "peticiones": len(lat),
+                "lotes": self.lotes,
+                "filas": self.filas,
+                "p50_ms": float(np.percentile(lat, 50)) if len(lat) else None,
+                "p99_ms": float(np.percentile(lat, 99)) if len(lat) else None,
+                "filas_por_s": self.filas / transcurrido if transcurrido else 0.0,
+            }
+
+
+class PredictorPorLotes:
+    """Agrupa peticiones concurrentes en micro-lotes para una sola llamada a ``predict``."""
+
+    def __init__(self, modelo, max_filas=4096, max_espera_ms=2.0):
+        self.modelo = modelo
+        self.features = features_del_modelo(modelo)  # columnas de entrada, tomadas del modelo
+        self.max_filas = max_filas
+        self.max_espera = max_espera_ms / 1000
+        self.estadisticas = Estadisticas()
+        self._cola = queue.Queue()
+        threading.Thread(target=self._bucle, daemon=True).start()
+
+    def predecir(self, X):
+        """Predice ``X`` (arreglo n × len(features)) esperando a que su micro-lote se resuelva.
+
+        Las filas de forma incorrecta o con valores infinitos se rechazan con ``ValueError``
+        antes de encolarse, para no hacer fallar el micro-lote de otros clientes (NaN sí
+        se acepta: se imputa con la media de entrenamiento).
+        """
+        inicio = time.perf_counter()
+        X = np.asarray(X, dtype="float64")
+        if X.ndim == 1 and len(X) == len(self.features):
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != len(self.features):
+            raise ValueError(f"Se esperaban filas de {len(self.features)} columnas {self.features}, "
+                             f"no un arreglo de forma {X.shape}.")
+        if np.isinf(X).any():
+            raise ValueError("Las filas contienen valores infinitos.")
+        peticion = _Peticion(X)
+        self._cola.put(peticion)
+        peticion.lista.wait()
+        self.estadisticas.registrar_latencia(time.perf_counter() - inicio)
+        if peticion.error is not None:
+            raise peticion.error
+        return peticion.resultado
+
+    def _bucle(self):
+        while True:
+            lote = [self._cola.get()]
+            filas = len(lote[0].X)
+            limite = time.perf_counter() + self.max_espera
+            while filas < self.max_filas:
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    break
+                try:
+                    peticion = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                lote.append(peticion)
+                filas += len(peticion.X)
+            self._resolver(lote)
+
+    def _resolver(self, lote):
+        try:
+            X = np.concatenate([p.X for p in lote])
+            Y = predecir_arreglo(self.modelo, X, self.features)
+            self.estadisticas.registrar_lote(len(X))
+            inicio = 0
+            for p in lote:
+                p.resultado = Y[inicio:inicio + len(p.X)]
+                inicio += len(p.X)
+        except Exception:
+            # Una petición inválida no debe tumbar las demás: se repite una por una
+            for p in lote:
+                try:
+                    p.resultado = predecir_arreglo(self.modelo, p.X, self.features)
+                    self.estadisticas.registrar_lote(len(p.X))
+                except Exception as e:
+                    p.error = e
+        finally:
+            for p in lote:
+                p.lista.set()
+
+
+def predecir_archivo(modelo, entrada, salida, filas_por_bloque=1_000_000):
+    """Añade ``lon_futura``/``lat_futura`` a todas las posiciones de un CSV, por bloques."""
+    total = 0
+    features = features_del_modelo(modelo)
+    for k, df in enumerate(pd.read_csv(entrada, chunksize=filas_por_bloque)):
+        Y = predecir_arreglo(modelo, df[features].to_numpy(dtype="float64"), features)
+        df[TARGETS[0]], df[TARGETS[1]] = Y[:, 0], Y[:, 1]
+        df.to_csv(salida, mode="a" if k else "w", header=not k, index=False)
+        total += len(df)
+    return total
+
+
+def _crear_manejador(predictor):
+    class Manejador(BaseHTTPRequestHandler):
+        def _responder(self, codigo, cuerpo, tipo="application/json"):
+            datos = cuerpo.encode("utf-8") if isinstance(cuerpo, str) else cuerpo
+            self.send_response(codigo)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def _leer(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_GET(self):
+            if self.path == "/estadisticas":
+                self._responder(200, json.dumps(predictor.estadisticas.resumen()))
+            else:
+                self._responder(404, json.dumps({"error": "ruta no encontrada"}))
+
+        def do_POST(self):
+            try:
+                if self.path == "/predecir":
+                    datos = json.loads(self._leer())
+                    filas = datos["filas"] if isinstance(datos, dict) else datos
+                    X = [[np.nan if f.get(c) is None else f[c] for c in predictor.features] for f in filas]
+                    Y = predictor.predecir(X)
+                    self._responder(200, json.dumps({"predicciones": Y.tolist()}))
+                elif self.path == "/lote":
+                    df = pd.read_csv(io.BytesIO(self._leer()))
+                    Y = predictor.predecir(df[predictor.features].to_numpy(dtype="float64"))
+                    df[TARGETS[0]], df[TARGETS[1]] = Y[:, 0], Y[:, 1]
+                    self._responder(200, df.to_csv(index=False), "text/csv")
+                else:
+                    self._responder(404, json.dumps({"error": "ruta no encontrada"}))
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                # Cuerpo mal formado (p. ej. "filas" que no son objetos): el cliente siempre recibe respuesta
+                self._responder(400, json.dumps({"error": f"{type(e).__name__}: {e}"}))
+            except Exception as e:
+                self._responder(500, json.dumps({"error": f"{type(e).__name__}: {e}"}))
+
+        def log_message(self, *args):
+            pass  # el registro por petición dominaría la latencia
+
+    return Manejador
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio de predicción de trayectorias por micro-lotes.")
+    parser.add_argument("--modelo", default=MODEL_FILENAME, help="Pipeline .joblib o artefacto compacto .tibm")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8000)
+    parser.add_argument("--max-filas", type=int, default=4096, help="Filas máximas por micro-lote")
+    parser.add_argument("--max-espera-ms", type=float, default=2.0, help="Espera máxima para completar un micro-lote")
+    parser.add_argument("--archivo", help="CSV de posiciones a predecir sin levantar el servidor")
+    parser.add_argument("--salida", default="predicciones.csv")
+    args = parser.parse_args()
+
+    try:
+        modelo = cargar_modelo(args.modelo)
+    except FileNotFoundError:
+        print(f"❌ ERROR: El archivo del modelo {args.modelo} no se encuentra.")
+        return
+    print(f"✅ Modelo {args.modelo} cargado.")
+
+    if args.archivo:
+        inicio = time.perf_counter()
+        total = predecir_archivo(modelo, args.archivo, args.salida)
+        seg = time.perf_counter() - inicio
+        print(f"✅ {total} predicciones guardadas en {args.salida} ({total / max(seg, 1e-9):.0f} filas/s)")
+        return
+
+    predictor = PredictorPorLotes(modelo, args.max_filas, args.max_espera_ms)
+    servidor = ThreadingHTTPServer((args.host, args.puerto), _crear_manejador(predictor))
+    print(f"🦈 Servicio de predicción escuchando en http://{args.host}:{args.puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEstadísticas finales:", predictor.estadisticas.resumen())
+
+
+if __name__ == "__main__":
+    main()
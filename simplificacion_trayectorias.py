@@ -0,0 +1,85 @@
+import numpy as np
+
+# Simplificación de trayectorias por niveles de detalle para el visualizador.
+# Cada nivel ajusta los puntos a una rejilla de ``tolerancia`` grados: de cada
+# tramo consecutivo de un tiburón dentro de la misma celda se conserva el primer
+# punto y cada punto cuya clase de profundidad cambia respecto al anterior (así
+# ni los cambios de profundidad ni los regresos, p. ej. 3→2→3, se pierden) y
+# siempre el primero y el último de cada tiburón. En los niveles más gruesos que
+# ``TOLERANCIA_PROFUNDIDAD`` (donde un tramo de 6 h mide menos de un píxel) solo se
+# conserva el primer punto de cada tramo, para que la flota quepa en el presupuesto.
+# Todo se hace con operaciones vectorizadas sobre el DataFrame completo, sin
+# bucles por tiburón.
+# Al dibujar se elige el nivel cuya tolerancia se parece al tamaño de un píxel
+# y, si aun así hay demasiados vértices visibles, uno más grueso: el navegador
+# recibe un número acotado de vértices (en el nivel más grueso, unos pocos por
+# tiburón) en lugar de todos los puntos cada 6 h de la flota.
+
+TOLERANCIAS_GRADOS = (0.0, 0.02, 0.1, 0.5, 2.0, 8.0)  # 0 = trayectoria completa
+MAX_VERTICES = 20_000
+TOLERANCIA_PROFUNDIDAD = 0.5  # grados; por encima no se conservan los cambios de profundidad
+
+
+def simplificar(df, tolerancia):
+    """Vértices de ``df`` (ordenado por ``id_tiburon`` y tiempo) a ``tolerancia`` grados."""
+    if tolerancia <= 0 or df.empty:
+        return df.reset_index(drop=True)
+    ids = df["id_tiburon"].to_numpy()
+    celda_x = np.floor(df["lon"].to_numpy() / tolerancia).astype("int64")
+    celda_y = np.floor(df["lat"].to_numpy() / tolerancia).astype("int64")
+
+    nuevo_tiburon = np.r_[True, ids[1:] != ids[:-1]]
+    ultimo = np.r_[nuevo_tiburon[1:], True]
+    cambia_celda = nuevo_tiburon | np.r_[True, (celda_x[1:] != celda_x[:-1]) | (celda_y[1:] != celda_y[:-1])]
+    conservar = cambia_celda | ultimo
+    if tolerancia <= TOLERANCIA_PROFUNDIDAD:
+        # Solo se eliminan repeticiones consecutivas de la misma clase de profundidad
+        clase = df["Profundidad"].to_numpy()
+        conservar |= np.r_[True, clase[1:] != clase[:-1]]
+    return df[conservar].reset_index(drop=True)
+
+
+def niveles_de_detalle(df, tolerancias=TOLERANCIAS_GRADOS):
+    """Precalcula ``{tolerancia: vértices}`` para cada tolerancia (de fina a gruesa)."""
+    return {tol: simplificar(df, tol) for tol in sorted(tolerancias)}
+
+
+def recortar_vista(df, x_range=None, y_range=None):
+    """Vértices dentro de la vista más su vecino anterior y posterior (para no cortar segmentos)."""
+    dentro = np.ones(len(df), dtype=bool)
+    if x_range and None not in x_range:
+        dentro &= df["lon"].between(min(x_range), max(x_range)).to_numpy()
+    if y_range and None not in y_range:
+        dentro &= df["lat"].between(min(y_range), max(y_range)).to_numpy()
+    ids = df["id_tiburon"].to_numpy()
+    mismo = ids[1:] == ids[:-1]
+    visible = dentro.copy()
+    visible[1:] |= dentro[:-1] & mismo
+    visible[:-1] |= dentro[1:] & mismo
+    return df[visible]
+
+
+def elegir_nivel(niveles, x_range=None, y_range=None, ancho_px=800, max_vertices=MAX_VERTICES):
+    """Devuelve ``(tolerancia, vértices visibles)`` del nivel adecuado para la vista."""
+    ancho = abs(x_range[1] - x_range[0]) if x_range and None not in x_range else 360.0
+    grados_por_px = ancho / ancho_px
+    tolerancias = sorted(niveles)
+    # Nivel más grueso que no supera el tamaño de un píxel...
+    i = max([j for j, tol in enumerate(tolerancias) if tol <= grados_por_px] or [0])
+    visibles = recortar_vista(niveles[tolerancias[i]], x_range, y_range)
+    # ...o uno más grueso si la flota entera no cabe en el presupuesto de vértices
+    while len(visibles) > max_vertices and i + 1 < len(tolerancias):
+        i += 1
+        visibles = recortar_vista(niveles[tolerancias[i]], x_range, y_range)
+    return tolerancias[i], visibles
+
+
+def trozos(df):
+    """Parte ``df`` en tramos continuos (por tiburón y por huecos del recorte) para ``hv.Path``."""
+    if df.empty:
+        return []
+    ids = df["id_tiburon"].to_numpy()
+    indice = df.index.to_numpy()
+    cortes = np.flatnonzero((ids[1:] != ids[:-1]) | (np.diff(indice) != 1)) + 1
+    limites = np.r_[0, cortes, len(df)]
+    return [df.iloc[a:b] for a, b in zip(limites[:-1], limites[1:])]
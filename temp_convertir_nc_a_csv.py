@@ -1,54 +1,28 @@
-import xarray as xr
-import pandas as pd
-import os
-import re
-
-# === CONFIGURACIÓN ===
-carpeta = r"C:\Users\TuUsuario\Desktop\nasa\TuCarpetaConLosDatos"  # 🔹 Ruta donde están los .nc
-archivo_salida = "temperatura_superficial.csv"
-
-def extraer_año(nombre_archivo):
-    match = re.search(r"20\d{2}", nombre_archivo)
-    return int(match.group()) if match else None
-
-# === PROCESAMIENTO ===
-datos_combinados = []
-
-for archivo in os.listdir(carpeta):
-    if archivo.endswith(".nc"):
-        ruta = os.path.join(carpeta, archivo)
-        print(f"\nProcesando: {archivo}")
-        ds = xr.open_dataset(ruta)
-
-        da = ds["sst"]
-
-        # Aplicar máscara para eliminar valores de relleno (_FillValue)
-        fill = da.attrs.get("_FillValue", None)
-        if fill is not None:
-            da = da.where(da != fill)
-
-        # Convertir a DataFrame
-        df = da.to_dataframe().reset_index()
-        df["year"] = extraer_año(archivo)
-
-        # Renombrar columnas
-        df = df.rename(columns={
-            "lat": "latitude",
-            "lon": "longitude",
-            "sst": "temperature"
-        })
-
-        # Mantener solo datos válidos
-        df = df.dropna(subset=["temperature"])
-        df = df[["latitude", "longitude", "temperature", "year"]]
-
-        print(f"  → {len(df)} puntos válidos")
-        datos_combinados.append(df)
-
-# === COMBINAR TODOS LOS AÑOS ===
-if datos_combinados:
-    df_final = pd.concat(datos_combinados, ignore_index=True)
-    df_final.to_csv(archivo_salida, index=False)
-    print(f"\n✅ CSV generado con {len(df_final)} registros: {archivo_salida}")
-else:
-    print("❌ No se obtuvieron datos válidos de temperatura.")
+from conversion_nc import convertir_carpeta_paralelo, unir_fragmentos
+from instrumentacion import etapa
+
+# === CONFIGURACIÓN ===
+carpeta = r"C:\Users\TuUsuario\Desktop\nasa\TuCarpetaConLosDatos"  # 🔹 Ruta donde están los .nc
+archivo_salida = "temperatura_superficial.csv"  # Usa extensión .parquet para salida columnar
+tam_bloque = (512, 512)  # Celdas lat × lon leídas a la vez (controla la memoria pico)
+carpeta_fragmentos = "fragmentos_temperatura"  # Un fragmento por archivo .nc + manifiesto.json para reanudar
+procesos = None  # Número de procesos en paralelo (None = todos los núcleos)
+
+# === PROCESAMIENTO PARALELO POR BLOQUES ===
+# Cada proceso convierte un archivo .nc por bloques a su propio fragmento.
+# Los archivos ya registrados en el manifiesto (mismo tamaño y fecha) se saltan,
+# así que se puede interrumpir y volver a lanzar sin perder trabajo.
+if __name__ == "__main__":
+    with etapa("conversion_nc", carpeta=carpeta) as r:
+        manifiesto = convertir_carpeta_paralelo(carpeta, carpeta_fragmentos, "sst", "temperature",
+                                                procesos=procesos, tam_bloque=tam_bloque)
+        r.anotar(archivos=len(manifiesto), filas_entrada=sum(e["celdas"] for e in manifiesto.values()),
+                 filas_salida=sum(e["puntos"] for e in manifiesto.values()))
+    with etapa("union_fragmentos", salida=archivo_salida) as r:
+        total = unir_fragmentos(carpeta_fragmentos, archivo_salida)
+        r.anotar(filas_salida=total)
+
+    if total:
+        print(f"\n✅ Archivo generado con {total} registros: {archivo_salida}")
+    else:
+        print("❌ No se obtuvieron datos válidos de temperatura.")
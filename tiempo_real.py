@@ -0,0 +1,243 @@
+import csv
+import math
+import socket
+import time
+
+import numpy as np
+import pandas as pd
+
+from filtro_argos import pesos_de_clase
+from trayectorias import COLUMNAS_TRAYECTORIA, PASO_6H, transformador
+
+# Ingesta incremental de posiciones en tiempo real.
+# Cada tiburón tiene un estado pequeño (última marca y próximo instante de la
+# rejilla de 6 h). Al llegar una marca nueva solo se interpolan los puntos de la
+# rejilla que caen entre la marca anterior y la nueva, con el mismo criterio que
+# ``trayectorias.remuestrear_trayectorias`` (lineal en EPSG:3857, profundidad por
+# vecino más cercano), así que el trabajo por marca es constante. Los puntos
+# previos a la primera profundidad conocida esperan en un búfer acotado a
+# ``MAX_SIN_PROFUNDIDAD``: de un tiburón que nunca la reporta se descartan los más viejos.
+
+COLUMNAS_MARCA = ["id_tiburon", "date", "lat", "lon", "lc"]
+MAX_SIN_PROFUNDIDAD = 4 * 30  # puntos (30 días a 6 h) retenidos esperando una profundidad
+
+
+class EstadoTiburon:
+    """Estado incremental de un tiburón: solo guarda la cola necesaria para interpolar."""
+
+    def __init__(self, id_tiburon, paso=PASO_6H, crs_metrico="EPSG:3857"):
+        self.id_tiburon = id_tiburon
+        self.paso = float(paso)
+        self._transformer = transformador("EPSG:4326", crs_metrico)
+        self.inicio = None  # fecha de la primera marca (t_s = 0)
+        self.year = None
+        self.ultima = None  # (t_s, x, y, profundidad) de la última marca aceptada
+        self.profundidad = np.nan  # última profundidad conocida (equivale al ffill)
+        self.siguiente = 0.0  # próximo t_s de la rejilla por emitir
+        self.marcas = 0
+        self._sin_profundidad = []  # puntos interpolados antes de conocer alguna profundidad
+        self.descartados_sin_profundidad = 0
+
+    def agregar(self, fechas, lats, lons, lcs):
+        """Agrega una o varias marcas (en orden cronológico) y devuelve los puntos completados.
+
+        Devuelve un DataFrame con las mismas columnas que ``remuestrear_trayectorias``.
+        Las marcas con fecha anterior o igual a la última aceptada se ignoran.
+        """
+        fechas = pd.to_datetime(pd.Series(fechas)).reset_index(drop=True)
+        profundidades = pd.to_numeric(pd.Series(lcs), errors="coerce").to_numpy(dtype="float64")
+        xs, ys = self._transformer.transform(np.asarray(lons, dtype="float64"), np.asarray(lats, dtype="float64"))
+        xs, ys = np.atleast_1d(xs), np.atleast_1d(ys)
+
+        salida = []
+        for k in range(len(fechas)):
+            if self.inicio is None:
+                self.inicio = fechas[k]
+                self.year = self.inicio.year
+            t = (fechas[k] - self.inicio).total_seconds()
+            z = profundidades[k]
+            if self.ultima is not None and t <= self.ultima[0]:
+                continue
+            if not np.isnan(z):
+                if np.isnan(self.profundidad):
+                    # Primera profundidad conocida: equivale al bfill de lo anterior
+                    if self.ultima is not None:
+                        self.ultima = self.ultima[:3] + (z,)
+                    for t_p, x_p, y_p, _ in self._sin_profundidad:
+                        salida.append((t_p, x_p, y_p, np.full(len(t_p), z)))
+                    self._sin_profundidad = []
+                self.profundidad = z
+            actual = (t, xs[k], ys[k], self.profundidad)
+            if self.ultima is not None:
+                puntos = self._interpolar(self.ultima, actual)
+                if puntos is not None and np.isnan(self.profundidad):
+                    self._retener_sin_profundidad(puntos)
+                elif puntos is not None:
+                    salida.append(puntos)
+            self.ultima = actual
+            self.marcas += 1
+
+        if not salida:
+            return _vacio()
+        t_new, x, y, z = (np.concatenate(c) for c in zip(*salida))
+        lon, lat = self._transformer.transform(x, y, direction="INVERSE")
+        return pd.DataFrame({
+            "t_s": t_new,
+            "lon": lon,
+            "lat": lat,
+            "Profundidad": np.clip(np.round(z).astype(int), 0, 3),
+            "id_tiburon": self.id_tiburon,
+            "year": self.year,
+            "fecha": self.inicio + pd.to_timedelta(t_new, unit="s"),
+        })
+
+    def _retener_sin_profundidad(self, puntos):
+        """Guarda ``puntos`` hasta conocer una profundidad, conservando solo los ``MAX_SIN_PROFUNDIDAD`` últimos."""
+        self._sin_profundidad.append(puntos)
+        exceso = sum(len(p[0]) for p in self._sin_profundidad) - MAX_SIN_PROFUNDIDAD
+        while exceso > 0:
+            t_p, x_p, y_p, z_p = self._sin_profundidad[0]
+            quitar = min(exceso, len(t_p))
+            if quitar == len(t_p):
+                self._sin_profundidad.pop(0)
+            else:
+                self._sin_profundidad[0] = (t_p[quitar:], x_p[quitar:], y_p[quitar:], z_p[quitar:])
+            self.descartados_sin_profundidad += quitar
+            exceso -= quitar
+
+    def _interpolar(self, previa, actual):
+        """Puntos de la rejilla en [t_previa, t_actual) interpolados entre dos marcas."""
+        t0, x0, y0, z0 = previa
+        t1, x1, y1, z1 = actual
+        n = max(0, math.ceil((t1 - self.siguiente) / self.paso))
+        if n == 0:
+            return None
+        t_new = self.siguiente + self.paso * np.arange(n)
+        self.siguiente += self.paso * n
+        w = (t_new - t0) / (t1 - t0)
+        z = np.where((t_new - t0) <= (t1 - t_new), z0, z1)
+        return t_new, x0 + w * (x1 - x0), y0 + w * (y1 - y0), z
+
+
+def _vacio():
+    return pd.DataFrame(columns=COLUMNAS_TRAYECTORIA)
+
+
+class IngestorTiempoReal:
+    """Reparte marcas entre estados por tiburón y une el ambiente a los puntos emitidos."""
+
+    def __init__(self, muestreador=None, paso=PASO_6H):
+        self.muestreador = muestreador
+        self.paso = paso
+        self.estados = {}
+        self.descartadas = 0
+
+    def procesar(self, marcas):
+        """Procesa un lote de marcas (DataFrame con ``COLUMNAS_MARCA``) y devuelve los puntos nuevos."""
+        # Las marcas de clase inválida (Z) se descartan igual que en el remuestreo por lotes; el
+        # filtro de velocidad necesita las marcas siguientes y solo se aplica en ``trayectorias``
+        validas = pesos_de_clase(marcas["lc"]) > 0
+        self.descartadas += int((~validas).sum())
+        marcas = marcas[validas]
+        salida = []
+        for shark_id, grupo in marcas.groupby("id_tiburon", sort=False):
+            estado = self.estados.get(shark_id)
+            if estado is None:
+                estado = self.estados[shark_id] = EstadoTiburon(shark_id, self.paso)
+            salida.append(estado.agregar(grupo["date"], grupo["lat"], grupo["lon"], grupo["lc"]))
+        salida = [s for s in salida if not s.empty]
+        puntos = pd.concat(salida, ignore_index=True) if salida else _vacio()
+        if self.muestreador is not None and not puntos.empty:
+            columna_tiempo = getattr(self.muestreador, "columna_tiempo", "year")
+            valores, _ = self.muestreador.muestrear(puntos["lat"].to_numpy(), puntos["lon"].to_numpy(),
+                                                    puntos[columna_tiempo].to_numpy())
+            for v, muestra in valores.items():
+                puntos[v] = muestra
+        return puntos
+
+
+def _a_lote(filas):
+    return pd.DataFrame(filas, columns=COLUMNAS_MARCA)
+
+
+def flujo_desde_archivo(ruta, seguir=False, tam_lote=100, espera=1.0):
+    """Genera lotes de marcas desde un CSV (id_tiburon,date,lat,lon,lc).
+
+    Con ``seguir=True`` se comporta como ``tail -f``: espera nuevas líneas al final.
+    """
+    with open(ruta, newline="", encoding="utf-8") as f:
+        if not f.readline().startswith("id_tiburon"):
+            f.seek(0)
+        filas = []
+        while True:
+            posicion = f.tell()
+            linea = f.readline()
+            if linea and not linea.endswith("\n") and seguir:
+                # Línea todavía incompleta: se vuelve a leer cuando termine de escribirse
+                f.seek(posicion)
+                linea = ""
+            if linea:
+                if linea.strip():
+                    filas.append(next(csv.reader([linea])))
+                if len(filas) >= tam_lote:
+                    yield _a_lote(filas)
+                    filas = []
+                continue
+            if filas:
+                yield _a_lote(filas)
+                filas = []
+            if not seguir:
+                return
+            time.sleep(espera)
+
+
+def flujo_desde_socket(host="127.0.0.1", puerto=9999, tam_lote=100):
+    """Genera lotes de marcas recibidas como líneas CSV por un socket TCP (sustituto del enlace satelital)."""
+    with socket.create_connection((host, puerto)) as conexion, conexion.makefile("r", encoding="utf-8") as f:
+        filas = []
+        for linea in f:
+            if not linea.strip():
+                continue  # líneas vacías o de keep-alive
+            filas.append(next(csv.reader([linea.strip()])))
+            if len(filas) >= tam_lote:
+                yield _a_lote(filas)
+                filas = []
+        if filas:
+            yield _a_lote(filas)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from almacen_ambiental import cargar_almacen
+    from muestreo_puntos import construir_muestreador
+
+    parser = argparse.ArgumentParser(description="Ingesta incremental de marcas de tiburones.")
+    parser.add_argument("--archivo", help="CSV de marcas (id_tiburon,date,lat,lon,lc)")
+    parser.add_argument("--seguir", action="store_true", help="Esperar nuevas líneas al final del archivo")
+    parser.add_argument("--socket", help="host:puerto de un servidor que envía líneas CSV")
+    parser.add_argument("--almacen", default="datos_modelo", help="Almacén ambiental para unir Temp/Cloro")
+    parser.add_argument("--salida", default="puntos_tiempo_real.csv")
+    args = parser.parse_args()
+
+    try:
+        muestreador = construir_muestreador(cargar_almacen(args.almacen), ["Temp_Media", "Cloro_Media"])
+    except FileNotFoundError:
+        print("ADVERTENCIA: Almacén ambiental no encontrado. Los puntos se emitirán sin ambiente.")
+        muestreador = None
+
+    if args.socket:
+        host, puerto = args.socket.rsplit(":", 1)
+        flujo = flujo_desde_socket(host, int(puerto))
+    else:
+        flujo = flujo_desde_archivo(args.archivo, seguir=args.seguir)
+
+    ingestor = IngestorTiempoReal(muestreador)
+    escritos = 0
+    for lote in flujo:
+        puntos = ingestor.procesar(lote)
+        if puntos.empty:
+            continue
+        puntos.to_csv(args.salida, mode="a" if escritos else "w", header=not escritos, index=False)
+        escritos += len(puntos)
+        print(f"  +{len(puntos)} puntos de 6 h ({escritos} en total, {len(ingestor.estados)} tiburones)")
@@ -0,0 +1,137 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+
+from filtro_argos import VELOCIDAD_MAX_MS, filtrar_marcas, resumen_reporte
+
+# Motor de remuestreo de trayectorias para muchos tiburones a la vez.
+# Todas las marcas se procesan como un único arreglo ordenado por (tiburón, tiempo):
+# a cada tiburón se le suma un desplazamiento de tiempo para que el eje global sea
+# monótono y una sola llamada vectorizada interpole todos los grupos juntos.
+
+PASO_6H = 6 * 3600  # segundos
+COLUMNAS_TRAYECTORIA = ["t_s", "lon", "lat", "Profundidad", "id_tiburon", "year", "fecha"]
+
+
+@lru_cache(maxsize=None)
+def transformador(crs_origen="EPSG:4326", crs_destino="EPSG:3857"):
+    """Transformer de pyproj reutilizado entre llamadas (crearlo es costoso)."""
+    return Transformer.from_crs(crs_origen, crs_destino, always_xy=True)
+
+
+def cargar_marcas(rutas, ids=None):
+    """Lee varios CSV de marcas (date, lat, lon, lc) en un único DataFrame con ``id_tiburon``.
+
+    Los archivos que no existen o no se pueden leer se reportan y se saltan.
+    """
+    ids = ids or [f"TIBURON_{i + 1}" for i in range(len(rutas))]
+    partes = []
+    for shark_id, ruta in zip(ids, rutas):
+        try:
+            df = pd.read_csv(ruta, usecols=["date", "lat", "lon", "lc"])
+        except FileNotFoundError:
+            print(f"ADVERTENCIA: Archivo de tiburón {shark_id} ({ruta}) no encontrado. Saltando.")
+            continue
+        except Exception as e:
+            print(f"ERROR procesando tiburón {shark_id}: {e}. Saltando.")
+            continue
+        df["id_tiburon"] = shark_id
+        partes.append(df)
+    if not partes:
+        return pd.DataFrame(columns=["date", "lat", "lon", "lc", "id_tiburon"])
+    return pd.concat(partes, ignore_index=True)
+
+
+def _interpolar(t_consulta, t, valores, tipo):
+    """Interpola sobre un eje ``t`` creciente; ``tipo`` es ``linear``, ``nearest`` o ``previous``."""
+    if tipo == "linear":
+        return np.interp(t_consulta, t, valores)
+    derecha = np.clip(np.searchsorted(t, t_consulta, side="right"), 1, len(t) - 1)
+    izquierda = derecha - 1
+    if tipo == "previous":
+        return valores[izquierda]
+    if tipo == "nearest":
+        # Igual que interp1d(kind="nearest"): en el punto medio exacto gana el anterior
+        usar_izq = (t_consulta - t[izquierda]) <= (t[derecha] - t_consulta)
+        return np.where(usar_izq, valores[izquierda], valores[derecha])
+    raise ValueError(f"Tipo de interpolación no soportado: {tipo}")
+
+
+def remuestrear_trayectorias(df, paso=PASO_6H, tipo_posicion="linear", tipo_profundidad="nearest",
+                             crs_metrico="EPSG:3857", velocidad_max=VELOCIDAD_MAX_MS):
+    """Remuestrea todas las marcas de ``df`` a una rejilla temporal de ``paso`` segundos.
+
+    ``df`` debe tener ``id_tiburon``, ``date``, ``lat``, ``lon`` y ``lc``. Antes de
+    interpolar se descartan las marcas de clase inválida y las que implican velocidades
+    mayores que ``velocidad_max`` m/s (``filtro_argos``; ``None`` desactiva el filtro).
+    Las posiciones se interpolan en el CRS métrico ``crs_metrico`` y la profundidad
+    (``lc`` numérico, 0-3) con ``tipo_profundidad``. Devuelve un DataFrame con ``t_s``,
+    ``lon``, ``lat``, ``Profundidad``, ``id_tiburon``, ``year`` (año de la primera marca
+    de cada tiburón) y ``fecha`` (instante absoluto del punto: primera marca + ``t_s``).
+    """
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNAS_TRAYECTORIA)
+    if velocidad_max is not None:
+        df, reporte = filtrar_marcas(df, velocidad_max)
+        print(resumen_reporte(reporte))
+
+    df = pd.DataFrame({
+        "id_tiburon": df["id_tiburon"].to_numpy(),
+        "date": pd.to_datetime(df["date"]),
+        "lat": df["lat"].to_numpy(dtype="float64"),
+        "lon": df["lon"].to_numpy(dtype="float64"),
+        # lc numérico -> profundidad 0-3; códigos A/B -> NaN (Z ya se descartó)
+        "depth": pd.to_numeric(df["lc"], errors="coerce"),
+    })
+    # Los tiburones quedan en el orden en que se leyeron (no alfabético: TIBURON_2 antes que TIBURON_10)
+    df["orden"] = pd.Categorical(df["id_tiburon"], categories=pd.unique(df["id_tiburon"])).codes
+    df = df.sort_values(["orden", "date"], kind="stable").drop(columns="orden").reset_index(drop=True)
+    inicio = df.groupby("id_tiburon", sort=False)["date"].transform("first")
+    df["t_s"] = (df["date"] - inicio).dt.total_seconds()
+    df = df.drop_duplicates(subset=["id_tiburon", "t_s"]).reset_index(drop=True)
+    df["depth"] = df.groupby("id_tiburon", sort=False)["depth"].ffill()
+    df["depth"] = df.groupby("id_tiburon", sort=False)["depth"].bfill()
+
+    # Tiburones con menos de dos marcas o sin ninguna profundidad no se pueden interpolar
+    resumen = df.groupby("id_tiburon", sort=False).agg(n=("t_s", "size"), t_max=("t_s", "max"),
+                                                       con_prof=("depth", "count"), inicio=("date", "first"))
+    descartados = resumen.index[(resumen["n"] < 2) | (resumen["con_prof"] == 0)]
+    for shark_id in descartados:
+        print(f"ERROR procesando tiburón {shark_id}: marcas insuficientes para interpolar. Saltando.")
+    if len(descartados):
+        resumen = resumen.drop(descartados)
+        df = df[df["id_tiburon"].isin(resumen.index)].reset_index(drop=True)
+    if resumen.empty:
+        return pd.DataFrame(columns=COLUMNAS_TRAYECTORIA)
+
+    transformer = transformador("EPSG:4326", crs_metrico)
+    x, y = transformer.transform(df["lon"].to_numpy(), df["lat"].to_numpy())
+
+    # Eje temporal global: cada tiburón se desplaza para que no se solape con el anterior
+    codigo = pd.Categorical(df["id_tiburon"], categories=resumen.index).codes
+    desplazamiento = float(resumen["t_max"].max()) + 2 * paso
+    t_global = df["t_s"].to_numpy() + codigo * desplazamiento
+
+    # Rejilla de salida: np.arange(0, t_max, paso) para cada tiburón
+    n_nuevos = np.ceil(resumen["t_max"].to_numpy() / paso).astype("int64")
+    grupo_nuevo = np.repeat(np.arange(len(resumen)), n_nuevos)
+    primero = np.repeat(np.cumsum(n_nuevos) - n_nuevos, n_nuevos)
+    t_nuevo = (np.arange(n_nuevos.sum()) - primero) * float(paso)
+    t_consulta = t_nuevo + grupo_nuevo * desplazamiento
+
+    x_new = _interpolar(t_consulta, t_global, x, tipo_posicion)
+    y_new = _interpolar(t_consulta, t_global, y, tipo_posicion)
+    z_new = _interpolar(t_consulta, t_global, df["depth"].to_numpy(dtype="float64"), tipo_profundidad)
+    lon_new, lat_new = transformer.transform(x_new, y_new, direction="INVERSE")
+
+    return pd.DataFrame({
+        "t_s": t_nuevo,
+        "lon": lon_new,
+        "lat": lat_new,
+        "Profundidad": np.clip(np.round(z_new).astype(int), 0, 3),
+        "id_tiburon": resumen.index.to_numpy()[grupo_nuevo],
+        "year": resumen["inicio"].dt.year.to_numpy()[grupo_nuevo],
+        "fecha": resumen["inicio"].to_numpy()[grupo_nuevo] + pd.to_timedelta(t_nuevo, unit="s").to_numpy(),
+    })
@@ -1,69 +1,75 @@
-import xarray as xr
 import hvplot.xarray
 import geoviews as gv
 import panel as pn
-import pandas as pd
-import numpy as np
 import holoviews as hv
 import os
-from pyproj import Transformer
-from scipy.interpolate import interp1d
+import threading
+
+from cache_datasets import CacheDatasets, listar_nc
+from piramide_rasters import CARPETA_PIRAMIDES, Piramide, asegurar_piramide
+from simplificacion_trayectorias import elegir_nivel, niveles_de_detalle, trozos
+from trayectorias import cargar_marcas, remuestrear_trayectorias
 
 pn.extension('tabulator', 'plotly')
 
-# === 1. Datos del tiburón ===
-shark_file = "C:/Users/User/Downloads/NASA/data_challenge/tiburon/160424_2013_132346pnas_atn.csv"
-df = pd.read_csv(shark_file)
-df["date"] = pd.to_datetime(df["date"])
-df = df.sort_values("date").reset_index(drop=True)
+# === 1. Datos de los tiburones ===
+shark_folder = "C:/Users/User/Downloads/NASA/data_challenge/tiburon"
+shark_files = sorted(f for f in os.listdir(shark_folder) if f.endswith(".csv"))
+# Remuestreo cada 6h con el motor compartido de trayectorias
+# (lc -> profundidad 0-3, A/B -> NaN; interpolación en coordenadas métricas)
+df_traj = remuestrear_trayectorias(cargar_marcas([os.path.join(shark_folder, f) for f in shark_files]))
+# Trayectorias simplificadas a varias tolerancias (se calculan una sola vez)
+niveles_traj = niveles_de_detalle(df_traj)
 
-# Interpretar profundidad (lc -> 0-3, A/B -> NaN)
-def parse_depth(x):
-    try:
-        return int(x)
-    except:
-        return np.nan
+# === 2. Datos de NASA ===
+data_types = {
+    "Temperatura": "C:/Users/User/Downloads/nasa/SeaTemps2025",
+    "Clorofila": "C:/Users/User/Downloads/nasa/SeaChlorophyll2025",
+    "Probabilidad de forrajeo": "probabilidad_forrajeo"  # Rásteres generados por ensamble.py
+}
 
-df["depth"] = df["lc"].apply(parse_depth)
+type_widget = pn.widgets.Select(name="Tipo de dato", options=list(data_types.keys()), value="Temperatura")
 
-# Transformar lon/lat a coordenadas métricas para interpolación
-transformer = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
-df["x"], df["y"] = transformer.transform(df["lon"].values, df["lat"].values)
-df["t_s"] = (df["date"] - df["date"].iloc[0]).dt.total_seconds()
+# Los .nc se abren al seleccionarlos por primera vez (no todos al arrancar).
+# Como mucho quedan 8 abiertos; el menos usado se cierra al abrir otro.
+datasets = CacheDatasets(max_abiertos=8, max_capas=16)
 
-uniq = df.drop_duplicates(subset="t_s")
-t = uniq["t_s"].values
-depth_filled = uniq["depth"].ffill().bfill()
+def load_files(folder):
+    return listar_nc(folder)
 
-fx = interp1d(t, uniq["x"], kind="linear", fill_value="extrapolate")
-fy = interp1d(t, uniq["y"], kind="linear", fill_value="extrapolate")
-fz = interp1d(t, depth_filled, kind="nearest", fill_value="extrapolate")
+def ruta_archivo(nombre):
+    return os.path.join(data_types[type_widget.value], nombre)
 
-# Interpolación cada 6h
-t_new = np.arange(t.min(), t.max(), 6*3600)
-x_new, y_new, z_new = fx(t_new), fy(t_new), fz(t_new)
-z_new = np.round(z_new).astype(int)
-z_new = np.clip(z_new, 0, 3)
+# Pirámide (resúmenes 2×, 4×, 8×...; ver piramide_rasters.py) de cada archivo ya visto.
+# Se resuelve una vez al cambiar de archivo, en un hilo: mientras se construye por
+# primera vez el mapa se dibuja desde el archivo original (nivel 0).
+piramides = {}
 
-# Convertir de nuevo a lon/lat
-lon_new, lat_new = transformer.transform(x_new, y_new, direction="INVERSE")
+def resolver_piramide(ruta, carpeta):
+    if ruta in piramides:
+        return
+    piramides[ruta] = Piramide(ruta, None, datasets)
 
-# === 2. Datos de NASA ===
-data_types = {
-    "Temperatura": "C:/Users/User/Downloads/nasa/SeaTemps2025",
-    "Clorofila": "C:/Users/User/Downloads/nasa/SeaChlorophyll2025"
-}
+    def construir():
+        piramides[ruta] = Piramide(ruta, asegurar_piramide(ruta, carpeta), datasets)
 
-type_widget = pn.widgets.Select(name="Tipo de dato", options=list(data_types.keys()), value="Temperatura")
+    threading.Thread(target=construir, daemon=True).start()
 
-def load_files(folder):
-    nc_files = sorted([f for f in os.listdir(folder) if f.endswith(".nc")])
-    datasets = {f: xr.open_dataset(os.path.join(folder, f)) for f in nc_files}
-    return nc_files, datasets
+def piramide_actual():
+    ruta = ruta_archivo(file_widget.value)
+    resolver_piramide(ruta, os.path.join(CARPETA_PIRAMIDES, type_widget.value))  # no-op si ya se resolvió
+    return piramides[ruta]
+
+def precargar_siguiente(var=None, t_index=None):
+    # Mientras se mira el archivo actual, un hilo abre el siguiente (y lee su capa)
+    i = nc_files.index(file_widget.value)
+    if i + 1 < len(nc_files):
+        datasets.precargar(ruta_archivo(nc_files[i + 1]), var, t_index)
 
-nc_files, datasets = load_files(data_types[type_widget.value])
+nc_files = load_files(data_types[type_widget.value])
 file_widget = pn.widgets.Select(name="Archivo", options=nc_files, value=nc_files[0])
-var_widget = pn.widgets.Select(name="Variable", options=list(datasets[file_widget.value].data_vars))
+resolver_piramide(ruta_archivo(file_widget.value), os.path.join(CARPETA_PIRAMIDES, type_widget.value))
+var_widget = pn.widgets.Select(name="Variable", options=list(datasets.obtener(ruta_archivo(file_widget.value)).data_vars))
 
 def create_time_widget(ds):
     if "time" in ds.dims:
@@ -75,22 +81,23 @@ def create_time_widget(ds):
     else:
         return None
 
-time_widget = create_time_widget(datasets[file_widget.value])
+time_widget = create_time_widget(datasets.obtener(ruta_archivo(file_widget.value)))
 
 # --- Actualización de archivos cuando cambia tipo de dato ---
 def update_files(event):
-    global nc_files, datasets, time_widget
+    global nc_files, time_widget
     folder = data_types[type_widget.value]
-    nc_files, datasets = load_files(folder)
+    nc_files = load_files(folder)
     file_widget.options = nc_files
     file_widget.value = nc_files[0]
-    time_widget = create_time_widget(datasets[file_widget.value])
+    time_widget = create_time_widget(datasets.obtener(ruta_archivo(file_widget.value)))
 
 type_widget.param.watch(update_files, 'value')
 
 # --- Actualización de variables cuando cambia archivo ---
 def update_widgets(event):
-    ds = datasets[event.new]
+    resolver_piramide(ruta_archivo(event.new), os.path.join(CARPETA_PIRAMIDES, type_widget.value))
+    ds = datasets.obtener(ruta_archivo(event.new))
     var_widget.options = list(ds.data_vars)
     var_widget.value = list(ds.data_vars)[0]
     global time_widget
@@ -100,15 +107,19 @@ file_widget.param.watch(update_widgets, 'value')
 
 # --- Obtener dataset ---
 def get_dataset():
-    return datasets[file_widget.value]
+    return datasets.obtener(ruta_archivo(file_widget.value))
+
+
+# Tamaño aproximado del mapa en píxeles: se usa el nivel más grueso de la pirámide
+# que todavía tiene al menos una celda por píxel en la vista actual.
+ANCHO_PX, ALTO_PX = 800, 400
 
 
 # === FUNCIÓN PRINCIPAL DE VISUALIZACIÓN ===
 def vista_func(var, t_index=0):
-    ds = get_dataset()
-    da = ds[var]
-    if "time" in da.dims:
-        da = da.isel(time=t_index)
+    piramide = piramide_actual()
+    # Los recortes de la pirámide son pequeños: basta con abrir el siguiente archivo de antemano
+    precargar_siguiente()
 
     # === Configurar límites de color para clorofila ===
     clim = None
@@ -116,35 +127,50 @@ def vista_func(var, t_index=0):
         clim = (0, 1)
 
     # === Mapa base ===
-    base = da.hvplot.quadmesh(
-        x="lon", y="lat", rasterize=True, cmap="viridis",
-        geo=True, coastline=True, projection="PlateCarree",
-        clim=clim,
-        title=f"{var} ({type_widget.value}) + Trayectoria del tiburón"
-    )
-
-    # === Trayectoria del tiburón ===
-    shark_df = pd.DataFrame({
-        'lon': lon_new,
-        'lat': lat_new,
-        'Profundidad': z_new
-    })
-
-    # Línea coloreada por profundidad
-    shark_path = hv.Path(shark_df, kdims=['lon', 'lat'], vdims=['Profundidad']).opts(
-        color='Profundidad', cmap=['blue', 'green', 'orange', 'red'],
-        line_width=3, tools=['hover'], colorbar=True
-    )
-
-    # Puntos individuales
-    shark_points = hv.Scatter(
-        shark_df, kdims=['lon'], vdims=['lat', 'Profundidad']
-    ).opts(
-        color='Profundidad', cmap=['blue', 'green', 'orange', 'red'],
-        size=5, alpha=0.8, marker='o', tools=['hover']
-    )
-
-    return base * shark_path * shark_points
+    # Se redibuja con cada zoom/desplazamiento: solo se lee el recorte visible
+    # del nivel adecuado, en lugar de rasterizar la rejilla completa cada vez.
+    def capa_visible(x_range, y_range):
+        nivel = piramide.elegir_nivel(var, x_range, y_range, ANCHO_PX, ALTO_PX)
+        da = piramide.capa(var, t_index, nivel, x_range, y_range)
+        # Mientras se mira este instante, un hilo lee el siguiente del mismo nivel
+        piramide.precargar(var, t_index + 1, nivel)
+        if "id_tiburon" in da.dims:
+            # Probabilidad por tiburón -> ocupación esperada (suma sobre tiburones)
+            da = da.sum("id_tiburon")
+        # El recorte ya está al nivel de la vista; rasterizarlo aquí (una vez por redibujado)
+        # envía al navegador una imagen de ANCHO_PX × ALTO_PX en vez de un polígono por celda
+        return da.hvplot.quadmesh(
+            x="lon", y="lat", cmap="viridis", rasterize=True, dynamic=False,
+            geo=True, coastline=True, projection="PlateCarree",
+            clim=clim, width=ANCHO_PX, height=ALTO_PX,
+            title=f"{var} ({type_widget.value}) + Trayectorias de los tiburones"
+        )
+
+    rango = hv.streams.RangeXY()
+    base = hv.DynamicMap(capa_visible, streams=[rango])
+
+    # === Trayectorias de los tiburones ===
+    # Todos los tiburones a la vez, con el nivel de detalle que corresponde al zoom
+    # (ver simplificacion_trayectorias.py): el número de vértices queda acotado.
+    def tiburones_visibles(x_range, y_range):
+        _, shark_df = elegir_nivel(niveles_traj, x_range, y_range, ANCHO_PX)
+
+        # Línea coloreada por profundidad
+        shark_path = hv.Path(trozos(shark_df), kdims=['lon', 'lat'], vdims=['Profundidad', 'id_tiburon']).opts(
+            color='Profundidad', cmap=['blue', 'green', 'orange', 'red'],
+            line_width=3, tools=['hover'], colorbar=True
+        )
+
+        # Puntos individuales
+        shark_points = hv.Scatter(
+            shark_df, kdims=['lon'], vdims=['lat', 'Profundidad', 'id_tiburon']
+        ).opts(
+            color='Profundidad', cmap=['blue', 'green', 'orange', 'red'],
+            size=5, alpha=0.8, marker='o', tools=['hover']
+        )
+        return shark_path * shark_points
+
+    return base * hv.DynamicMap(tiburones_visibles, streams=[rango])
 
 
 # === Bind de widgets ===
@@ -167,7 +193,7 @@ legend_text = """
 
 # === LAYOUT FINAL ===
 app = pn.Column(
-    "# 🌎 Visualizador NASA + Trayectoria del tiburón",
+    "# 🌎 Visualizador NASA + Trayectorias de los tiburones",
     *widgets,
     vista,
     pn.pane.Markdown(legend_text)
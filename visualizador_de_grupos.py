@@ -1,6 +1,14 @@
+from functools import lru_cache
+
+import datashader as ds
+import holoviews as hv
+import numpy as np
 import pandas as pd
 import hvplot.pandas
 import panel as pn
+from holoviews.util.transform import lon_lat_to_easting_northing
+
+from hotspots import AcumuladorHotspots
 
 pn.extension()
 
@@ -11,6 +19,49 @@ tib = pd.read_csv("DatosDeTiburones.csv")
 df = df.dropna(subset=["temperature", "chlorophyll"])
 tib = tib.dropna(subset=["latitude", "longitude"])
 
+# Filas de cada año, calculadas una sola vez (antes se filtraba todo df en cada
+# movimiento del deslizador). Cada año se extrae y proyecta a Web Mercator la
+# primera vez que se pide y queda en caché; así el mapa de teselas no tiene que
+# reproyectar millones de puntos en cada redibujado.
+filas_por_año = df.groupby("year").indices
+tib_por_año = tib.groupby("year").indices
+
+
+def _a_mercator(datos, columnas):
+    x, y = lon_lat_to_easting_northing(datos["longitude"].values, datos["latitude"].values)
+    return pd.DataFrame({"x": x, "y": y, **{c: datos[c].values for c in columnas}})
+
+
+@lru_cache(maxsize=None)
+def datos_del_año(año):
+    return _a_mercator(df.iloc[filas_por_año.get(año, [])], ["temperature", "chlorophyll"])
+
+
+@lru_cache(maxsize=None)
+def tiburones_del_año(año):
+    return _a_mercator(tib.iloc[tib_por_año.get(año, [])], ["id", "species", "year"])
+
+
+# Hotspots: densidad de avistamientos por año y especie (KDE por convolución FFT),
+# calculada una sola vez para todos los años; al mover los widgets solo se suman
+# las especies elegidas
+acumulador = AcumuladorHotspots()
+acumulador.agregar(tib.rename(columns={"latitude": "lat", "longitude": "lon", "species": "especie"}))
+hotspots = acumulador.densidades()
+hx, _ = lon_lat_to_easting_northing(hotspots["lon"].values, np.zeros(hotspots.sizes["lon"]))
+_, hy = lon_lat_to_easting_northing(np.zeros(hotspots.sizes["lat"]), hotspots["lat"].values)
+
+
+@lru_cache(maxsize=None)
+def hotspots_del_año(año, especies):
+    if año not in hotspots["year"].values:
+        return None
+    especies = [e for e in especies if e in hotspots["especie"].values]
+    densidad = hotspots["densidad"].sel(year=año, especie=especies).sum("especie").values
+    # Las celdas casi vacías se dejan transparentes para que se vea el mapa base
+    return np.where(densidad > 0.01 * densidad.max(), densidad, np.nan) if densidad.max() > 0 else None
+
+
 # === 2. Widgets ===
 año_widget = pn.widgets.IntSlider(
     name="Año", start=int(df["year"].min()), end=int(df["year"].max()), step=1, value=int(df["year"].min())
@@ -21,12 +72,14 @@ variable_widget = pn.widgets.Select(
 especie_widget = pn.widgets.MultiSelect(
     name="Especie de tiburón", options=tib["species"].unique().tolist(), value=tib["species"].unique().tolist()
 )
+hotspots_widget = pn.widgets.Checkbox(name="Mostrar hotspots", value=True)
 
 # === 3. Función de actualización ===
-@pn.depends(año=año_widget, variable=variable_widget, especie=especie_widget)
-def vista_mapa(año, variable, especie):
-    datos_año = df[df["year"] == año]
-    tib_año = tib[(tib["year"] == año) & (tib["species"].isin(especie))]
+@pn.depends(año=año_widget, variable=variable_widget, especie=especie_widget, ver_hotspots=hotspots_widget)
+def vista_mapa(año, variable, especie, ver_hotspots):
+    datos_año = datos_del_año(año)
+    tib_año = tiburones_del_año(año)
+    tib_año = tib_año[tib_año["species"].isin(especie)]
 
     # Limitar color para clorofila y temperatura
     if variable == "chlorophyll":
@@ -39,12 +92,15 @@ def vista_mapa(año, variable, especie):
         clim = None
         cmap = "viridis"
 
-    # Capa oceánica
+    # Capa oceánica: datashader agrega los puntos en el servidor (media por píxel)
+    # y se vuelve a agregar al hacer zoom, así el navegador recibe una imagen de
+    # tamaño fijo sin importar cuántos puntos haya
     mapa = datos_año.hvplot.points(
-        x="longitude",
-        y="latitude",
+        x="x",
+        y="y",
         c=variable,
-        geo=True,
+        rasterize=True,
+        aggregator=ds.mean(variable),
         tiles="OSM",
         colorbar=True,
         cmap=cmap,
@@ -54,11 +110,10 @@ def vista_mapa(año, variable, especie):
         clim=clim  # ✅ aplicar límite de color
     )
 
-    # Tiburones
+    # Tiburones (pocos puntos: se dibujan como marcadores vectoriales con hover)
     tib_plot = tib_año.hvplot.points(
-        x="longitude",
-        y="latitude",
-        geo=True,
+        x="x",
+        y="y",
         color="red",
         size=10,
         marker="triangle",
@@ -66,13 +121,20 @@ def vista_mapa(año, variable, especie):
         hover_cols=["id", "species", "year"]
     )
 
-    return mapa * tib_plot
+    capas = mapa
+    densidad = hotspots_del_año(año, tuple(especie)) if ver_hotspots else None
+    if densidad is not None:
+        capas = capas * hv.QuadMesh((hx, hy, densidad), vdims="densidad").opts(
+            cmap="hot_r", alpha=0.5, tools=["hover"]
+        )
+
+    return capas * tib_plot
 
 
 # === 4. Layout ===
 app = pn.Column(
     "# 🦈 Tiburones y Datos Oceánicos",
-    pn.Row(año_widget, variable_widget, especie_widget),
+    pn.Row(año_widget, variable_widget, especie_widget, hotspots_widget),
     vista_mapa
 )
 